@@ -0,0 +1,91 @@
+"""
+Benchmark of serialization of list responses
+
+Compares default FastAPI path (validation against response_model, conversion to python objects and json module),
+the same path with orjson and compiled TypeAdapter that dumps JSON bytes directly.
+Applications are built in memory, so only serialization is measured.
+
+Run: python -m benchmarks.serialization --applications 500 --ratings 5 --repeat 20
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+# all models have to be imported, so relationships between them can be configured
+from src.applications.models import Application, Rating
+from src.auth.models import RefreshToken  # noqa: F401
+from src.applications.schemas import ApplicationFull
+from src.comments.models import Comment
+from src.enums import AccountType, RatingGrade
+from src.responses import ORJSONResponse, dump, serializer
+from src.reviews.models import Review
+from src.users.models import User
+
+
+def build_applications(amount: int, ratings: int, comments: int) -> list[Application]:
+    user = User(id=1, username="startup", email="startup@example.com", account_type=AccountType.startup,
+                description="Startup that makes applications")
+    now = datetime.datetime(2024, 1, 1)
+    applications = []
+    for i in range(amount):
+        application = Application(id=i, name=f"Application {i}", description="description " * 30, date_created=now,
+                                  hide_reviews=False, user=user, rating_count=ratings, rating_sum=4 * ratings,
+                                  rating_grade_1=0, rating_grade_2=0, rating_grade_3=0, rating_grade_4=ratings,
+                                  rating_grade_5=0)
+        for j in range(ratings):
+            review = Review(id=i * ratings + j, title="Review", body="body " * 50, date_created=now,
+                            votes_positive=3, votes_negative=1,
+                            comments=[Comment(id=k, text="comment " * 10, votes_positive=1, votes_negative=0)
+                                      for k in range(comments)])
+            application.ratings.append(Rating(id=i * ratings + j, grade=RatingGrade.grade_4, review=review))
+        applications.append(application)
+    return applications
+
+
+async def default_path(field, applications, response_class) -> bytes:
+    content = await serialize_response(field=field, response_content=applications)
+    return response_class(content).body
+
+
+def measure(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=500)
+    parser.add_argument("--ratings", type=int, default=5, help="ratings with reviews of every application")
+    parser.add_argument("--comments", type=int, default=2, help="comments of every review")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    applications = build_applications(args.applications, args.ratings, args.comments)
+    field = create_model_field("Response_get_applications", list[ApplicationFull], mode="serialization")
+    adapter = serializer(list[ApplicationFull])
+    paths = {
+        "default": lambda: asyncio.run(default_path(field, applications, JSONResponse)),
+        "default_orjson": lambda: asyncio.run(default_path(field, applications, ORJSONResponse)),
+        "type_adapter": lambda: dump(adapter, applications),
+    }
+    assert json.loads(paths["default"]()) == json.loads(paths["type_adapter"]())
+    results = {name: measure(function, args.repeat) for name, function in paths.items()}
+    print(json.dumps({
+        "applications": args.applications,
+        "seconds": results,
+        "speedup": {name: results["default"] / seconds for name, seconds in results.items()},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 
+from src.cache import PrincipalCache, ResponseCache, MemoryBackend, SharedStoreBackend
+from src.hashing import PasswordHasher
+from src.metrics import RequestMetrics
 from src.settings import DevelopmentConfig, ProductionConfig, BaseConfig
 
 load_dotenv()
@@ -17,6 +20,26 @@ else:
     config = BaseConfig()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    pwd_context,
+    executor_type=config.PASSWORD_HASHER_EXECUTOR,
+    max_workers=config.PASSWORD_HASHER_WORKERS,
+    max_queue_size=config.PASSWORD_HASHER_QUEUE_SIZE
+)
+principal_cache = PrincipalCache(max_size=config.PRINCIPAL_CACHE_SIZE, ttl=config.PRINCIPAL_CACHE_TTL_SECONDS)
+
+if config.RESPONSE_CACHE_BACKEND == "shared":
+    # redis is needed only for shared cache, so it is not required by default
+    from redis.asyncio import Redis
+    response_cache_backend = SharedStoreBackend(Redis.from_url(config.RESPONSE_CACHE_URL),
+                                                ttl=config.RESPONSE_CACHE_TTL_SECONDS)
+else:
+    response_cache_backend = MemoryBackend(max_size=config.RESPONSE_CACHE_SIZE, ttl=config.RESPONSE_CACHE_TTL_SECONDS,
+                                           max_bytes=config.RESPONSE_CACHE_MAX_BYTES)
+response_cache = ResponseCache(response_cache_backend, enabled=config.RESPONSE_CACHE_ENABLED)
+request_metrics = RequestMetrics(statement_budget=config.SQL_STATEMENT_BUDGET,
+                                 repeated_statement_limit=config.SQL_REPEATED_STATEMENT_LIMIT,
+                                 budget_mode=config.SQL_BUDGET_MODE)
 
 scopes = {
     "me": "Get info about current user",
@@ -1,42 +1,71 @@
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, Security, Body, Path
-from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, Security, Body, Path, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.applications.schemas import ApplicationBase, ApplicationUpdate
-from src.applications import service
-from src.dependencies import get_db
-from src.users import models as user_models
+from src.applications.schemas import ApplicationBase, ApplicationUpdate, ApplicationFull
+from src.applications import service, models
+from src.fields import Selection, sparse_fields, loading_plan
+from src import conditional
+from src.dependencies import get_db, get_read_db
 from src.auth.dependencies import get_current_user
+from src.auth.schemas import Principal
 
 
-async def get_application_by_id(db: Annotated[Session, Depends(get_db)], application_id: Annotated[int, Path()]):
-    application = service.get(db, application_id)
+async def get_application_by_id(db: Annotated[AsyncSession, Depends(get_db)], application_id: Annotated[int, Path()]):
+    application = await service.get(db, application_id)
     if not application:
         raise HTTPException(404, detail=f"Application with id {application_id} is not exists")
     return application
 
 
-async def create_application(db: Annotated[Session, Depends(get_db)],
+application_fields = sparse_fields(ApplicationFull)
+
+
+async def check_application_modified(
+        request: Request,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        application_id: Annotated[int, Path()]) -> dict:
+    version = await service.get_version(db, application_id)
+    if not version:
+        raise HTTPException(404, detail=f"Application with id {application_id} is not exists")
+    return conditional.check(request, tuple(version))
+
+
+async def get_sparse_application_by_id(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        application_id: Annotated[int, Path()],
+        selection: Annotated[Selection | None, Depends(application_fields)],
+        validators: Annotated[dict, Depends(check_application_modified)]):
+    """
+    Load application with selected fields, unchanged application is answered with 304 before it is loaded
+    """
+    application = await service.get(db, application_id, loading_plan(models.Application, selection))
+    if not application:
+        raise HTTPException(404, detail=f"Application with id {application_id} is not exists")
+    return application
+
+
+async def create_application(db: Annotated[AsyncSession, Depends(get_db)],
                        application_data: Annotated[ApplicationBase, Body()],
-                       current_user: Annotated[user_models.User, Security(get_current_user, scopes=["manage-applications"])]):
-    if service.exists(db, application_data.name, application_data.description):
+                       current_user: Annotated[Principal, Security(get_current_user, scopes=["manage-applications"])]):
+    if await service.exists(db, application_data.name, application_data.description):
         raise HTTPException(400, detail="Application with this name and description already exists")
-    application = service.create(db, application_data, current_user.id)
+    application = await service.create(db, application_data, current_user.id)
     return application
 
 
 async def update_application(
-        db: Annotated[Session, Depends(get_db)],
+        db: Annotated[AsyncSession, Depends(get_db)],
         application_data: Annotated[ApplicationUpdate, Body()],
         application_id: Annotated[int, Path()],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["manage-applications"])]):
-    if service.exists(db, application_data.name, application_data.description):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["manage-applications"])]):
+    if await service.exists(db, application_data.name, application_data.description):
         raise HTTPException(400, detail="Application with this name and description already exists")
-    application = service.get(db, application_id)
+    application = await service.get(db, application_id)
     if not application:
         raise HTTPException(404, detail=f"Application with id {application_id} does not exist")
     if application.user_id != current_user.id:
         raise HTTPException(401, detail="Application was created by another user")
-    application = service.update(db, application_data, application_id)
+    application = await service.update(db, application_data, application_id)
     return application
@@ -1,13 +1,13 @@
 import datetime
-from sqlalchemy import ForeignKey, String, Enum
+from sqlalchemy import ForeignKey, String, Enum, Index, false
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
-from src.database.core import Base
+from src.database.core import Base, Versioned
 from src.enums import RatingGrade
 from src.reviews.models import Review
 
 
-class Application(Base):
+class Application(Versioned, Base):
     """
     Application that need to be tested by users.
     Startups place their applications on the forum, and testers write reviews for that
@@ -16,20 +16,53 @@ class Application(Base):
     :param date_created: date when application was placed on forum
     :param hide_reviews: if true, only startups will be able to read the reviews
     :param deleted: if true it mean that user deleted application
+    :param rating_count: amount of ratings that are not deleted
+    :param rating_sum: sum of grades of ratings that are not deleted
+    :param rating_grade_1: amount of ratings with grade 1, the same for other grades
     """
     __tablename__ = "applications"
+    __table_args__ = (
+        # keyset pagination of applications of specific user
+        Index("ix_applications_user_id_id", "user_id", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(nullable=False)
+    name: Mapped[str] = mapped_column(nullable=False, index=True)
     description: Mapped[str] = mapped_column(String(1000))
     date_created: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now())
     hide_reviews: Mapped[bool] = mapped_column()
     deleted: Mapped[bool] = mapped_column(default=False)
+    rating_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    rating_sum: Mapped[int] = mapped_column(default=0, server_default="0")
+    rating_grade_1: Mapped[int] = mapped_column(default=0, server_default="0")
+    rating_grade_2: Mapped[int] = mapped_column(default=0, server_default="0")
+    rating_grade_3: Mapped[int] = mapped_column(default=0, server_default="0")
+    rating_grade_4: Mapped[int] = mapped_column(default=0, server_default="0")
+    rating_grade_5: Mapped[int] = mapped_column(default=0, server_default="0")
     # TODO: adding logo
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     user: Mapped["User"] = relationship(back_populates="applications")
 
     ratings: Mapped[list["Rating"]] = relationship(back_populates="application")
 
+    # columns that properties are computed from, sparse loading plans load them instead of properties
+    property_columns = {
+        "rating_average": ("rating_count", "rating_sum"),
+        "rating_histogram": tuple(f"rating_{grade.name}" for grade in RatingGrade),
+    }
+
+    @property
+    def rating_average(self) -> float | None:
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_histogram(self) -> dict[str, int]:
+        return {grade.value: getattr(self, f"rating_{grade.name}") for grade in RatingGrade}
+
+
+# keyset pagination of applications that are not deleted
+Index("ix_applications_active_id", Application.id,
+      postgresql_where=Application.deleted == false(), sqlite_where=Application.deleted == false())
+
 
 class Rating(Base):
     """
@@ -48,5 +81,5 @@ class Rating(Base):
     review_id: Mapped[int] = mapped_column(ForeignKey("reviews.id"), nullable=True)
     review: Mapped["Review"] = relationship(back_populates="rating")
 
-    application_id: Mapped[int] = mapped_column(ForeignKey("applications.id"))
+    application_id: Mapped[int] = mapped_column(ForeignKey("applications.id"), index=True)
     application: Mapped[Application] = relationship(back_populates="ratings")
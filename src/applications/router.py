@@ -1,31 +1,78 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Security, Depends, Query, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Security, Depends, Query, Body, Path, Request, File, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import config, response_cache
 from src.applications import models
+from src.cache import row_tags, table_tag
+from src.comments.models import Comment
+from src.reviews.models import Review
 from src.users import models as user_models
 from src.applications import service
-from src.applications.dependencies import get_application_by_id, create_application, update_application
+from src.applications.dependencies import (get_application_by_id, get_sparse_application_by_id, create_application,
+                                           update_application, application_fields, check_application_modified)
 from src.auth.dependencies import get_current_user
-from src.applications.schemas import ApplicationFull, ApplicationSearch, RatingFull, RatingCreate
-from src.dependencies import get_db
+from src.auth.schemas import Principal
+from src.batch import BatchItem, batch_ids, respond_batch
+from src.applications.schemas import ApplicationFull, ApplicationSearch, RatingFull, RatingCreate, ApplicationImportResult
+from src.applications.upload import upload_rows
+from src.dependencies import get_db, get_read_db, tree_sql_budget
+from src.fields import Selection, loading_plan, respond
+from src.responses import serializer, json_response
 
 router = APIRouter(prefix="/applications", tags=["Applications"])
 
+ratings_serializer = serializer(list[RatingFull])
+import_serializer = serializer(list[ApplicationImportResult])
 
-@router.get("/", response_model=list[ApplicationFull])
+
+@router.get("/", response_model=list[ApplicationFull], dependencies=[Depends(tree_sql_budget)])
 async def get_applications(
-        db: Annotated[Session, Depends(get_db)],
+        request: Request,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
         search_pattern: Annotated[ApplicationSearch, Query()],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
-    return service.get_all(db, search_pattern)
-
-
-@router.get("/{application_id}", response_model=ApplicationFull)
+        selection: Annotated[Selection | None, Depends(application_fields)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Get page of applications, cursor for the next page is returned in 'X-Next-Cursor' header
+    Fields of response can be limited with 'fields' and 'expand' parameters
+    Responses are cached until any application, review, comment or user is changed
+    """
+    entry = response_cache.entry(request, current_user.account_type.value)
+    if cached := await entry.get():
+        return cached
+    applications, next_cursor = await service.get_all(db, search_pattern, loading_plan(models.Application, selection))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    response = respond(ApplicationFull, selection, applications, many=True, headers=headers)
+    return await entry.store(response, [table_tag(table) for table in (models.Application, Review, Comment, user_models.User)])
+
+
+@router.get("/batch", response_model=list[BatchItem[ApplicationFull]], dependencies=[Depends(tree_sql_budget)])
+async def get_applications_by_ids(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        ids: Annotated[list[int], Depends(batch_ids)],
+        selection: Annotated[Selection | None, Depends(application_fields)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Get applications by comma separated ids with one query, items are returned in requested order
+    Fields of response can be limited with 'fields' and 'expand' parameters
+    """
+    applications = await service.get_many(db, ids, loading_plan(models.Application, selection))
+    return respond_batch(ApplicationFull, selection, ids, applications)
+
+
+@router.get("/{application_id}", response_model=ApplicationFull, dependencies=[Depends(tree_sql_budget)])
 async def get_application(
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])],
-        application: Annotated[models.Application, Depends(get_application_by_id)]):
-    return application
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])],
+        application: Annotated[models.Application, Depends(get_sparse_application_by_id)],
+        selection: Annotated[Selection | None, Depends(application_fields)],
+        validators: Annotated[dict, Depends(check_application_modified)]):
+    """
+    Fields of response can be limited with 'fields' and 'expand' parameters
+    Response has ETag and Last-Modified, request with If-None-Match or If-Modified-Since is answered with 304
+    if application, its reviews and comments didn't change
+    """
+    return respond(ApplicationFull, selection, application, headers=validators)
 
 
 @router.post("/", response_model=ApplicationFull, status_code=201)
@@ -34,21 +81,46 @@ async def create_application_route(
     return application
 
 
+@router.post("/import", response_model=list[ApplicationImportResult])
+async def import_applications(
+        db: Annotated[AsyncSession, Depends(get_db)],
+        file: Annotated[UploadFile, File(description="JSON array or CSV with header")],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["manage-applications"])]):
+    """
+    Create applications from uploaded file, fields of rows are the same as fields of created application
+    Result of every row is returned: created with id, invalid with errors, duplicate of previous row in file
+    or already existing application with the same name and description
+    """
+    report = await service.import_applications(db, upload_rows(file), current_user.id, config.IMPORT_CHUNK_SIZE)
+    return json_response(import_serializer, report)
+
+
 @router.post("/{application_id}/rating", response_model=RatingFull, status_code=201)
 async def create_rating(
-        db: Annotated[Session, Depends(get_db)],
+        db: Annotated[AsyncSession, Depends(get_db)],
         application: Annotated[models.Application, Depends(get_application_by_id)],
         rating_data: Annotated[RatingCreate, Body()],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
-    return service.rate(db, rating_data, application.id)
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    return await service.rate(db, rating_data, application.id)
 
 
-@router.get("/{application_id}/rating", response_model=list[RatingFull])
+@router.get("/{application_id}/rating", response_model=list[RatingFull], dependencies=[Depends(tree_sql_budget)])
 async def get_all_ratings_of_application(
-        db: Annotated[Session, Depends(get_db)],
-        application: Annotated[models.Application, Depends(get_application_by_id)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
-    return application.ratings
+        request: Request,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        application_id: Annotated[int, Path()],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Responses are cached until application or any of its reviews and their comments is changed
+    """
+    entry = response_cache.entry(request, current_user.account_type.value)
+    if cached := await entry.get():
+        return cached
+    application = await get_application_by_id(db, application_id)
+    reviews = [rating.review for rating in application.ratings if rating.review]
+    tags = [*row_tags(models.Application, [application.id]), *row_tags(Review, [review.id for review in reviews]),
+            *row_tags(Comment, [comment.id for review in reviews for comment in review.comments])]
+    return await entry.store(json_response(ratings_serializer, application.ratings), tags)
 
 
 @router.patch("/{application_id}", response_model=ApplicationFull)
@@ -59,6 +131,6 @@ async def update_application_route(
 
 @router.delete("/{application_id}", status_code=204)
 async def delete_application(
-        db: Annotated[Session, Depends(get_db)],
+        db: Annotated[AsyncSession, Depends(get_db)],
         application: Annotated[models.Application, Depends(get_application_by_id)]):
-    service.delete(db, application.id)
+    await service.delete(db, application.id)
@@ -1,8 +1,8 @@
 import datetime
 
-from pydantic import BaseModel, constr
+from pydantic import BaseModel, constr, conint
 
-from src.enums import RatingGrade
+from src.enums import ImportStatus, RatingGrade
 from src.reviews.schemas import ReviewFull, ReviewBase
 from src.users.schemas import UserFull
 
@@ -32,6 +32,9 @@ class ApplicationFull(ApplicationBase):
     id: int
     user: UserFull
     ratings: list[RatingFull]
+    rating_count: int
+    rating_average: float | None = None
+    rating_histogram: dict[str, int]
 
 
 class ApplicationUpdateBase(BaseModel):
@@ -45,3 +48,13 @@ class ApplicationUpdate(ApplicationUpdateBase):
 
 class ApplicationSearch(ApplicationUpdateBase):
     user_id: int | None = None
+    search: constr(max_length=200) | None = None
+    limit: conint(ge=1) | None = None
+    after: str | None = None
+
+
+class ApplicationImportResult(BaseModel):
+    row: int
+    status: ImportStatus
+    id: int | None = None
+    errors: list[str] | None = None
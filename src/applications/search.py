@@ -0,0 +1,81 @@
+"""
+Full-text search of applications by name and description
+
+Postgres keeps weighted tsvector in generated column 'search_vector' with GIN index.
+SQLite keeps FTS5 table 'applications_fts' that is synchronized with applications by triggers.
+In both cases index is updated by database itself during create and update of application.
+Other databases fall back to LIKE filters by every term without ranking.
+"""
+import re
+
+from sqlalchemy import DDL, Select, event, func, literal, literal_column, table, column, or_
+
+from src.applications.models import Application
+
+POSTGRES_DDL = [
+    "ALTER TABLE applications ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX ix_applications_search_vector ON applications USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE applications_fts USING fts5("
+    "name, description, content='applications', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER applications_fts_insert AFTER INSERT ON applications BEGIN "
+    "INSERT INTO applications_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER applications_fts_delete AFTER DELETE ON applications BEGIN "
+    "INSERT INTO applications_fts(applications_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER applications_fts_update AFTER UPDATE OF name, description ON applications BEGIN "
+    "INSERT INTO applications_fts(applications_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO applications_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+]
+
+SQLITE_DROP_DDL = ["DROP TABLE IF EXISTS applications_fts"]
+
+applications_fts = table("applications_fts", column("rowid"))
+
+# Index is created together with table, for example by create_all in tests
+for statement in POSTGRES_DDL:
+    event.listen(Application.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DDL:
+    event.listen(Application.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in SQLITE_DROP_DDL:
+    event.listen(Application.__table__, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def terms(search: str) -> list[str]:
+    return re.findall(r"\w+", search)
+
+
+def apply(query: Select, dialect: str, search: str) -> tuple[Select, object]:
+    """
+    Filter applications by full-text search
+    :param query: select of applications
+    :param dialect: name of database dialect, full-text index is used for postgresql and sqlite
+    :param search: text from user
+    :return: filtered query and expression of relevance, the bigger the more relevant
+    """
+    words = terms(search)
+    if dialect == "postgresql":
+        # config is rendered as literal, asyncpg would cast bound parameter to varchar instead of regconfig
+        ts_query = func.plainto_tsquery(literal_column("'english'::regconfig"), " ".join(words))
+        search_vector = literal_column("applications.search_vector")
+        rank = func.ts_rank(search_vector, ts_query)
+        return query.filter(search_vector.op("@@")(ts_query)), rank
+    if dialect == "sqlite":
+        # Every term is quoted, so user can't break FTS5 query syntax
+        match = " ".join(f'"{word}"' for word in words)
+        fts = literal_column("applications_fts")
+        query = (query
+                 .join(applications_fts, applications_fts.c.rowid == Application.id)
+                 .filter(fts.op("MATCH")(match)))
+        # bm25 is smaller for more relevant rows
+        return query, -func.bm25(fts)
+    # every term has to be in name or description, all matched rows are equally relevant
+    query = query.filter(*(or_(Application.name.icontains(word, autoescape=True),
+                               Application.description.icontains(word, autoescape=True))
+                           for word in words))
+    return query, literal(0)
@@ -1,31 +1,122 @@
-from sqlalchemy.orm import Session
+from collections.abc import AsyncIterator
 
-from src.applications import models
-from src.applications.schemas import ApplicationSearch, ApplicationBase, ApplicationUpdate, RatingCreate
+from pydantic import ValidationError
+from sqlalchemy import select, func, case, false, insert, delete as sql_delete, update as sql_update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, joinedload, raiseload
 
+from src import response_cache
+from src.applications import models, search
+from src.cache import row_tags, table_tag
+from src.pagination import paginate, split_page
+from src.enums import ImportStatus, RatingGrade
+from src.applications.schemas import (ApplicationSearch, ApplicationBase, ApplicationUpdate, RatingCreate,
+                                      ApplicationImportResult)
+from src.applications.upload import RowError
+from src.comments.models import Comment, CommentVotes
+from src.jobs.service import enqueue
+from src.reviews.models import ReviewVotes
+from src.reviews.service import review_full_options, comments_version_columns
+from src.users.models import User
 
-def get_all(db: Session,
-            queryset: ApplicationSearch):
-    query = db.query(models.Application).filter_by(deleted=False)
+
+def rating_full_options():
+    """
+    Loading plan of RatingFull
+    Relationships that are not in plan raise on access instead of emitting lazy query
+    """
+    return (
+        selectinload(models.Rating.review).options(*review_full_options()),
+        raiseload("*", sql_only=True)
+    )
+
+
+def application_full_options():
+    """
+    Loading plan of ApplicationFull
+    AsyncSession can't load relationships lazily, so whole tree is loaded with the query:
+    user is joined because it is one row per application, collections are loaded with one query per level
+    """
+    return (
+        joinedload(models.Application.user).raiseload("*", sql_only=True),
+        selectinload(models.Application.ratings).options(*rating_full_options()),
+        raiseload("*", sql_only=True)
+    )
+
+
+async def get_all(db: AsyncSession,
+                  queryset: ApplicationSearch,
+                  options: tuple | None = None):
+    """
+    Get one page of applications that match search
+    If full-text search is used applications are ordered by relevance
+    :param db: session to interact with db
+    :param queryset: search filters and pagination parameters
+    :param options: loading plan, by default plan of ApplicationFull
+    :return: applications of page and cursor for the next page
+    """
+    # literal false matches predicate of partial index ix_applications_active_id
+    query = (select(models.Application)
+             .filter(models.Application.deleted == false())
+             .options(*(options or application_full_options())))
     if queryset.name:
         query = query.filter(models.Application.name.like(f"%{queryset.name}%"))
     if queryset.description:
         query = query.filter(models.Application.description.like(f"%{queryset.description}%"))
     if queryset.user_id:
         query = query.filter_by(user_id=queryset.user_id)
-    return query.all()
+    if queryset.search and search.terms(queryset.search):
+        query, rank = search.apply(query, db.get_bind().dialect.name, queryset.search)
+        query = paginate(query.add_columns(rank.label("rank")), models.Application.id, queryset.limit, queryset.after, rank=rank)
+        return split_page((await db.execute(query)).all(), queryset.limit, ranked=True)
+    query = paginate(query, models.Application.id, queryset.limit, queryset.after)
+    return split_page((await db.scalars(query)).all(), queryset.limit)
 
 
-def exists(db: Session, name: str, description: str):
-    app = db.query(models.Application).filter_by(name=name, description=description).all()
+async def exists(db: AsyncSession, name: str, description: str):
+    app = (await db.scalars(select(models.Application)
+                            .filter_by(name=name, description=description, deleted=False))).all()
     return bool(app)
 
 
-def get(db: Session, application_id: int) -> models.Application:
-    return db.query(models.Application).filter_by(id=application_id).first()
+async def get(db: AsyncSession, application_id: int, options: tuple | None = None) -> models.Application:
+    query = (select(models.Application)
+             .filter_by(id=application_id, deleted=False)
+             .options(*(options or application_full_options()))
+             .execution_options(populate_existing=True))
+    return await db.scalar(query)
 
 
-def create(db: Session, application: ApplicationBase, user_id: int):
+async def get_many(db: AsyncSession, application_ids: list[int], options: tuple | None = None) -> list[models.Application]:
+    """
+    Select applications by ids with one query, order of ids is not kept
+    """
+    query = (select(models.Application)
+             .filter(models.Application.id.in_(set(application_ids)), models.Application.deleted == false())
+             .options(*(options or application_full_options())))
+    return (await db.scalars(query)).all()
+
+
+async def get_version(db: AsyncSession, application_id: int) -> tuple | None:
+    """
+    Select versions of application, its owner, its reviews and their comments without loading them
+    Rows of comments multiply reviews in join, but aggregates still change with every change of them
+    :return: versions and times of change or None if application doesn't exist
+    """
+    query = (select(models.Application.version, models.Application.updated_at,
+                    func.max(User.version), func.max(User.updated_at),
+                    func.count(models.Rating.id), func.sum(models.Review.version), func.max(models.Review.updated_at),
+                    *comments_version_columns())
+             .join(User, User.id == models.Application.user_id)
+             .outerjoin(models.Rating, models.Rating.application_id == models.Application.id)
+             .outerjoin(models.Review, models.Review.id == models.Rating.review_id)
+             .outerjoin(Comment, Comment.review_id == models.Review.id)
+             .where(models.Application.id == application_id, models.Application.deleted == false())
+             .group_by(models.Application.id))
+    return (await db.execute(query)).first()
+
+
+async def create(db: AsyncSession, application: ApplicationBase, user_id: int):
     new_application = models.Application(
         name=application.name,
         description=application.description,
@@ -33,38 +124,197 @@ def create(db: Session, application: ApplicationBase, user_id: int):
         hide_reviews=application.hide_reviews,
         user_id=user_id)
     db.add(new_application)
-    db.commit()
-    return new_application
+    await db.commit()
+    await response_cache.invalidate_rows(models.Application, new_application.id)
+    return await get(db, new_application.id)
+
 
+async def import_applications(db: AsyncSession, rows: AsyncIterator[dict | RowError], user_id: int,
+                              chunk_size: int) -> list[ApplicationImportResult]:
+    """
+    Validate rows and create applications that don't exist yet
+    Rows are inserted by chunks, every chunk is one transaction, so imported chunks stay if later one fails
+    :param db: session to interact with db
+    :param rows: parsed rows of upload
+    :param user_id: owner of created applications
+    :param chunk_size: amount of rows in one transaction
+    :return: result of every row in order of rows
+    """
+    report = []
+    # the same application can be only once in upload
+    seen = set()
+    chunk: list[tuple[int, ApplicationBase]] = []
+    row = 0
+    async for data in rows:
+        if isinstance(data, RowError):
+            report.append(ApplicationImportResult(row=row, status=ImportStatus.invalid, errors=[data]))
+        else:
+            try:
+                application = ApplicationBase.model_validate(data)
+            except ValidationError as error:
+                errors = [f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" for detail in error.errors()]
+                report.append(ApplicationImportResult(row=row, status=ImportStatus.invalid, errors=errors))
+            else:
+                key = (application.name, application.description)
+                if key in seen:
+                    report.append(ApplicationImportResult(row=row, status=ImportStatus.duplicate))
+                else:
+                    seen.add(key)
+                    chunk.append((row, application))
+        row += 1
+        if len(chunk) >= chunk_size:
+            report.extend(await import_chunk(db, chunk, user_id))
+            chunk = []
+    if chunk:
+        report.extend(await import_chunk(db, chunk, user_id))
+    return sorted(report, key=lambda result: result.row)
 
-def update(db: Session, application_data: ApplicationUpdate, application_id: int):
-    application = get(db, application_id)
+
+async def import_chunk(db: AsyncSession, chunk: list[tuple[int, ApplicationBase]],
+                       user_id: int) -> list[ApplicationImportResult]:
+    """
+    Insert applications of chunk that don't exist in one transaction
+    Existing applications are found with one query by indexed name, new ones are inserted with executemany
+    """
+    names = {application.name for _, application in chunk}
+    existing = set((await db.execute(
+        select(models.Application.name, models.Application.description)
+        .filter(models.Application.name.in_(names), models.Application.deleted == false())
+    )).all())
+    report = []
+    new = []
+    for row, application in chunk:
+        if (application.name, application.description) in existing:
+            report.append(ApplicationImportResult(row=row, status=ImportStatus.exists))
+        else:
+            new.append((row, application))
+    if not new:
+        return report
+    ids = await db.scalars(
+        insert(models.Application).returning(models.Application.id, sort_by_parameter_order=True),
+        [dict(application.model_dump(), user_id=user_id) for _, application in new]
+    )
+    report.extend(ApplicationImportResult(row=row, status=ImportStatus.created, id=application_id)
+                  for (row, _), application_id in zip(new, ids))
+    await db.commit()
+    await response_cache.invalidate(table_tag(models.Application))
+    return report
+
+
+async def update(db: AsyncSession, application_data: ApplicationUpdate, application_id: int):
+    application = await get(db, application_id)
     if application_data.name:
         application.name = application_data.name
     if application_data.description:
         application.description = application_data.description
     if application_data.hide_reviews:
         application.hide_reviews = application_data.hide_reviews
+    application.bump_version()
     db.add(application)
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate_rows(models.Application, application_id)
     return application
 
 
-def delete(db: Session, application_id: int):
-    application = get(db, application_id)
-    db.delete(application)
-    db.commit()
+async def delete(db: AsyncSession, application_id: int):
+    """
+    Mark application deleted, so it is hidden at once, its rows are deleted later by job
+    """
+    await db.execute(
+        sql_update(models.Application)
+        .filter_by(id=application_id)
+        .values(deleted=True, **models.Application.bump())
+        .execution_options(synchronize_session=False)
+    )
+    enqueue(db, "applications.purge", {"application_id": application_id})
+    await db.commit()
+    await response_cache.invalidate_rows(models.Application, application_id)
 
 
-def rate(db: Session, rating_data: RatingCreate, application_id: int):
-    application = get(db, application_id)
+async def purge(db: AsyncSession, application_id: int):
+    """
+    Delete application that is marked deleted together with its ratings, their reviews,
+    comments of reviews and votes, so no rows are left without application
+    Rows are deleted in one transaction from children to parents, purged application is skipped,
+    so purge can be repeated
+    """
+    deleted = select(models.Application.id).filter_by(id=application_id, deleted=True)
+    review_ids = (await db.scalars(
+        select(models.Rating.review_id)
+        .filter(models.Rating.application_id.in_(deleted), models.Rating.review_id.is_not(None))
+    )).all()
+    comments = select(Comment.id).filter(Comment.review_id.in_(review_ids))
+    await db.execute(sql_delete(CommentVotes).filter(CommentVotes.comment_id.in_(comments)))
+    await db.execute(sql_delete(Comment).filter(Comment.review_id.in_(review_ids)))
+    await db.execute(sql_delete(ReviewVotes).filter(ReviewVotes.review_id.in_(review_ids)))
+    await db.execute(sql_delete(models.Rating).filter(models.Rating.application_id.in_(deleted)))
+    await db.execute(sql_delete(models.Review).filter(models.Review.id.in_(review_ids)))
+    await db.execute(sql_delete(models.Application).filter_by(id=application_id, deleted=True))
+    await db.commit()
+    await response_cache.invalidate(*row_tags(models.Review, review_ids))
 
+
+async def rate(db: AsyncSession, rating_data: RatingCreate, application_id: int):
     review = models.Review(title=rating_data.review.title,
                            user_id=rating_data.user_id,
                            body=rating_data.review.body) if rating_data.review else None
-    rating = models.Rating(grade=rating_data.grade, user_id=rating_data.user_id)
-    rating.application = application
+    rating = models.Rating(grade=rating_data.grade, user_id=rating_data.user_id, application_id=application_id)
     rating.review = review
     db.add(rating)
-    db.commit()
-    return rating
\ No newline at end of file
+    await count_rating(db, application_id, rating_data.grade)
+    await db.commit()
+    await response_cache.invalidate_rows(models.Application, application_id)
+    query = (select(models.Rating)
+             .filter_by(id=rating.id)
+             .options(*rating_full_options())
+             .execution_options(populate_existing=True))
+    return await db.scalar(query)
+
+
+async def count_rating(db: AsyncSession, application_id: int, grade: RatingGrade, delta: int = 1):
+    """
+    Change rating aggregates of application in the database, so concurrent ratings are not lost
+    :param db: session to interact with db
+    :param application_id: id of rated application
+    :param grade: grade of added or removed rating
+    :param delta: 1 when rating is added, -1 when rating is deleted
+    """
+    grade_column = getattr(models.Application, f"rating_{grade.name}")
+    await db.execute(
+        sql_update(models.Application)
+        .filter_by(id=application_id)
+        .values({
+            models.Application.rating_count: models.Application.rating_count + delta,
+            models.Application.rating_sum: models.Application.rating_sum + delta * int(grade.value),
+            grade_column: grade_column + delta,
+            **models.Application.bump()
+        })
+    )
+
+
+async def reconcile_ratings(db: AsyncSession) -> int:
+    """
+    Recount rating aggregates of all applications from ratings that are not deleted
+    :return: amount of updated applications
+    """
+    def ratings_query(value, *conditions):
+        return (select(value)
+                .where(models.Rating.application_id == models.Application.id, models.Rating.deleted.is_(False),
+                       *conditions)
+                .scalar_subquery())
+
+    grade_value = case(*[(models.Rating.grade == grade, int(grade.value)) for grade in RatingGrade])
+    values = {
+        "rating_count": ratings_query(func.count(models.Rating.id)),
+        "rating_sum": ratings_query(func.coalesce(func.sum(grade_value), 0)),
+    }
+    for grade in RatingGrade:
+        values[f"rating_{grade.name}"] = ratings_query(func.count(models.Rating.id), models.Rating.grade == grade)
+    result = await db.execute(
+        sql_update(models.Application)
+        .values(**values, **models.Application.bump())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await response_cache.invalidate(table_tag(models.Application))
+    return result.rowcount
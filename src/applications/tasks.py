@@ -0,0 +1,9 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.applications import service
+from src.jobs.runner import job_runner
+
+
+@job_runner.handler("applications.purge")
+async def purge_application(db: AsyncSession, application_id: int):
+    await service.purge(db, application_id)
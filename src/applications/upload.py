@@ -0,0 +1,139 @@
+"""
+Streaming parsers of uploaded applications
+
+Upload is read by chunks and rows are yielded as soon as they are complete, so memory doesn't depend on size of file.
+JSON upload is an array of objects, CSV upload has header with names of fields.
+Row that can't be parsed is yielded as RowError, so it is reported together with invalid rows.
+Row that is not complete after MAX_ROW_SIZE characters is malformed, it is reported and the rest of upload is skipped,
+because the next rows can't be found reliably after it.
+"""
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+
+from fastapi import HTTPException, UploadFile
+
+CHUNK_SIZE = 64 * 1024
+# in characters, fields of application are much shorter
+MAX_ROW_SIZE = 64 * 1024
+
+
+class RowError(str):
+    """
+    Description of row that can't be parsed
+    """
+
+
+async def text_chunks(file: UploadFile) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(400, detail="Upload has to be encoded in UTF-8")
+
+
+def complete_records(lines: list[str]) -> tuple[list[str], list[str]]:
+    """
+    Split lines of CSV into lines of complete records and the rest
+    Line break ends record only if it is not inside quotes, quotes inside fields are escaped by doubling them,
+    so record is complete when it has even amount of quotes
+    """
+    complete_until = 0
+    quotes = 0
+    for number, line in enumerate(lines, 1):
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            complete_until = number
+    return lines[:complete_until], lines[complete_until:]
+
+
+async def csv_rows(file: UploadFile) -> AsyncIterator[dict | RowError]:
+    """
+    Rows of CSV as dicts by names from header, empty fields are skipped, so defaults of schema are used
+    """
+    header = None
+
+    def parse(records: list[str]) -> list[dict | RowError]:
+        nonlocal header
+        rows = []
+        for values in csv.reader(records):
+            if not values:
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+            elif len(values) != len(header):
+                rows.append(RowError(f"Row has {len(values)} fields, header has {len(header)}"))
+            else:
+                rows.append({name: value for name, value in zip(header, values) if value != ""})
+        return rows
+
+    pending = ""
+    async for text in text_chunks(file):
+        parts = (pending + text).split("\n")
+        # the last line can continue in the next chunk
+        records, rest = complete_records([part + "\n" for part in parts[:-1]])
+        pending = "".join(rest) + parts[-1]
+        for row in parse(records):
+            yield row
+        if len(pending) > MAX_ROW_SIZE:
+            yield RowError(f"Row is longer than {MAX_ROW_SIZE} characters, quotes may be not closed")
+            return
+    # the last record may have no line break
+    records, rest = complete_records([pending])
+    for row in parse(records):
+        yield row
+    if "".join(rest).strip():
+        yield RowError("Row is not complete, quotes are not closed")
+
+
+async def json_rows(file: UploadFile) -> AsyncIterator[dict | RowError]:
+    """
+    Items of JSON array, every item is decoded as soon as it is received
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    opened = closed = False
+    async for text in text_chunks(file):
+        buffer += text
+        while buffer := buffer.lstrip():
+            if not opened:
+                if buffer[0] != "[":
+                    raise HTTPException(400, detail="JSON upload has to be an array")
+                opened, buffer = True, buffer[1:]
+            elif closed:
+                yield RowError("Invalid JSON after the last parsed row")
+                return
+            elif buffer[0] == "]":
+                closed, buffer = True, buffer[1:]
+            elif buffer[0] == ",":
+                buffer = buffer[1:]
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError as error:
+                    # item is not received completely yet, complete item that is longer than limit is not expected
+                    if len(buffer) > MAX_ROW_SIZE:
+                        yield RowError(f"Invalid JSON at row, {error.msg}")
+                        return
+                    break
+                buffer = buffer[end:]
+                yield item
+    if not opened:
+        raise HTTPException(400, detail="JSON upload has to be an array")
+    if not closed:
+        yield RowError("Invalid JSON after the last parsed row")
+
+
+def upload_rows(file: UploadFile) -> AsyncIterator[dict | RowError]:
+    """
+    Choose parser by content type or extension of uploaded file
+    """
+    filename = (file.filename or "").lower()
+    if file.content_type in ("text/csv", "application/csv") or filename.endswith(".csv"):
+        return csv_rows(file)
+    if file.content_type == "application/json" or filename.endswith(".json"):
+        return json_rows(file)
+    raise HTTPException(415, detail="Upload has to be JSON array or CSV")
@@ -6,24 +6,26 @@ from jwt.exceptions import InvalidTokenError
 from fastapi import HTTPException, Depends, Cookie
 from fastapi.security import SecurityScopes
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src import oauth_scheme, config
-from src.auth.schemas import TokenData
+from src import oauth_scheme, config, principal_cache
+from src.auth.schemas import Principal, TokenData
 from src.dependencies import get_db
-from src.users import service as user_service
 from src.auth import service
 
 
 async def get_current_user(security_scopes: SecurityScopes,
                      token: Annotated[str, Depends(oauth_scheme)],
-                     db: Annotated[Session, Depends(get_db)]):
+                     db: Annotated[AsyncSession, Depends(get_db)]) -> Principal:
     """
     Get current logged user using jwt token in headers
+    Resolved user is cached by user id and token iat, so repeated requests with the same token don't query db
+    Cached value is immutable snapshot of user, it is never attached to session of request
+    Scopes are not cached, they are checked from the token of every request
     :param security_scopes: scopes to manage what routes user can use
     :param db: session to interact with db
     :param token: jwt token from header 'Authorization'
-    :return: user from database
+    :return: snapshot of user
     """
     if security_scopes.scopes:
         authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
@@ -40,23 +42,28 @@ async def get_current_user(security_scopes: SecurityScopes,
         raise cred_exceptions
     except ValidationError:
         raise cred_exceptions
-    user = user_service.get(db, token_data.user_id)
-    if not user:
-        raise cred_exceptions
     # If it is not access token, raise an exception
     if token_data.token_type != config.ACCESS_TOKEN_TYPE:
         raise cred_exceptions
+    principal = principal_cache.get((token_data.user_id, token_data.iat))
+    if principal is None:
+        principal = await service.get_principal(db, token_data.user_id)
+        if principal is None:
+            raise cred_exceptions
+        principal_cache.set((token_data.user_id, token_data.iat), principal)
+    if principal.deleted:
+        raise cred_exceptions
     for scope in security_scopes.scopes:
-        if scope not in token_data.scopes:
+        if scope not in (token_data.scopes or []):
             raise HTTPException(
                 status_code=401,
                 detail="Not enough permissions",
                 headers={"WWW-Authenticate": authenticate_value},
             )
-    return user
+    return principal
 
 
-async def get_refresh_token(db: Annotated[Session, Depends(get_db)],
+async def get_refresh_token(db: Annotated[AsyncSession, Depends(get_db)],
                       refresh_token: Annotated[str | None, Cookie()] = None) -> dict:
     """
     Get refresh token from cookies, decode it and validate
@@ -73,7 +80,7 @@ async def get_refresh_token(db: Annotated[Session, Depends(get_db)],
         raise refresh_token_exception
     if decoded_refresh_token.get("token_type") != config.REFRESH_TOKEN_TYPE:
         raise refresh_token_exception
-    token_from_base = service.get_refresh_token_by_token_string(db, refresh_token)
+    token_from_base = await service.get_refresh_token_by_token_string(db, refresh_token)
     if not token_from_base:
         raise refresh_token_exception
     elif token_from_base.revoked:
@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import ForeignKey, TypeDecorator, DateTime
+from sqlalchemy import ForeignKey, TypeDecorator, DateTime, String, Index
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
 from src.database.core import Base
@@ -26,14 +26,17 @@ class TZDateTime(TypeDecorator):
 class RefreshToken(Base):
     """
     RefreshTokens is used for refreshing access_token
-    :param token: string variant of jwt token
+    :param token_hash: sha256 hex digest of jwt token, token itself is not stored
     :param created_at: date when token was created
     :param expires_at: date when token will have expired
     :param revoked: if true token can't be used anymore
     """
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_id_revoked", "user_id", "revoked"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    token: Mapped[str] = mapped_column()
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, index=True)
     created_at: Mapped[datetime.datetime] = mapped_column(TZDateTime())
     expires_at: Mapped[datetime.datetime] = mapped_column(TZDateTime())
     revoked: Mapped[bool] = mapped_column(default=False)
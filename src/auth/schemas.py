@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+from src.enums import AccountType
 
 
 class TokenSet(BaseModel):
@@ -13,3 +15,15 @@ class TokenData(BaseModel):
     scopes: list[str] | None = None
     exp: int
     iat: int
+
+
+class Principal(BaseModel):
+    """
+    Immutable snapshot of user that is resolved from access token
+    It is cached and shared between requests, so routes that need user from db load it in their own session
+    Scopes are not part of snapshot, they belong to access token and are checked for every request
+    """
+    model_config = ConfigDict(frozen=True)
+    id: int
+    account_type: AccountType
+    deleted: bool
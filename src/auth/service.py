@@ -1,15 +1,20 @@
+import asyncio
 import datetime
+import hashlib
+import time
+import uuid
 
 import jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src import models, config
 from src.auth import models
 from src.users import models as user_models
-from src.auth.schemas import TokenSet
+from src.auth.schemas import Principal, TokenSet
 
 
-def authenticate_user(db: Session, username: str, password: str, ):
+async def authenticate_user(db: AsyncSession, username: str, password: str, ):
     """
     Check if user exists and password is correct
     :param db: session to interact with db
@@ -17,8 +22,8 @@ def authenticate_user(db: Session, username: str, password: str, ):
     :param password: User password
     :return: User from base or None
     """
-    user = db.query(user_models.User).filter_by(username=username).first()
-    if user and user.check_password_hash(password):
+    user = (await db.scalars(select(user_models.User).filter_by(username=username))).first()
+    if user and await user.check_password_hash(password):
         return user
 
 
@@ -46,42 +51,105 @@ def create_access_token(data: dict, expires_at=datetime.timedelta(minutes=config
 
 
 def create_refresh_token(data: dict, expires_at=datetime.timedelta(days=config.REFRESH_TOKEN_EXPIRE_DAYS)):
-    return create_jwt(data, expires_at=expires_at)
+    # jti makes every refresh token unique even if it was created in the same second with the same data
+    return create_jwt({**data, "jti": uuid.uuid4().hex}, expires_at=expires_at)
+
+
+def hash_token(token: str) -> str:
+    """
+    Refresh tokens are stored as fixed-length digests, so lookup uses short unique index
+    and leaked table doesn't contain usable tokens
+    :param token: encoded jwt token
+    :return: sha256 hex digest of token
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def get_principal(db: AsyncSession, user_id: int) -> Principal | None:
+    """
+    Select only fields of user that are needed to authorize request
+    :return: snapshot of user or None if user doesn't exist
+    """
+    row = (await db.execute(
+        select(user_models.User.id, user_models.User.account_type, user_models.User.deleted).filter_by(id=user_id)
+    )).first()
+    if row is None:
+        return None
+    return Principal(id=row.id, account_type=row.account_type, deleted=row.deleted)
 
 
-def get_refresh_token_by_token_string(db: Session, token):
-    return db.query(models.RefreshToken).filter_by(token=token).first()
+async def get_refresh_token_by_token_string(db: AsyncSession, token):
+    return (await db.scalars(select(models.RefreshToken).filter_by(token_hash=hash_token(token)))).first()
 
 
-def save_refresh_token(
-        db: Session,
+async def revoke_refresh_tokens(db: AsyncSession, user_id: int):
+    """
+    Revoke all active refresh tokens of user with one UPDATE, changes are not committed
+    """
+    await db.execute(
+        update(models.RefreshToken)
+        .filter_by(user_id=user_id, revoked=False)
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def purge_refresh_tokens(db: AsyncSession, batch_size: int, max_rows_per_second: int) -> int:
+    """
+    Delete expired and revoked refresh tokens
+    Tokens are deleted in batches with commit after each of them, so locks are short,
+    and batches are slowed down to not delete more than max_rows_per_second
+    :param db: session to interact with db
+    :param batch_size: amount of tokens that are deleted in one transaction
+    :param max_rows_per_second: throughput limit
+    :return: amount of deleted tokens
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    purged = 0
+    while True:
+        started_at = time.monotonic()
+        batch = (select(models.RefreshToken.id)
+                 .where(or_(models.RefreshToken.expires_at <= now, models.RefreshToken.revoked.is_(True)))
+                 .limit(batch_size))
+        result = await db.execute(
+            delete(models.RefreshToken)
+            .where(models.RefreshToken.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            return purged
+        pause = result.rowcount / max_rows_per_second - (time.monotonic() - started_at)
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+
+async def save_refresh_token(
+        db: AsyncSession,
         refresh_token: str,
         user: user_models.User,
         refresh_token_expires_days: datetime.timedelta):
     """
-    Save refresh token in base
+    Save refresh token in base, all previous tokens of user are revoked
     :param db: session to interact with database
     :param refresh_token: refresh token that will be used to create access tokens
     :param user: User from base that wants to auth
     :param refresh_token_expires_days: time when refresh token will be expired
     :return: None
     """
-    existed_refresh_token = db.query(models.RefreshToken).filter_by(user_id=user.id,
-                                                                    revoked=False).first()
-    if existed_refresh_token:
-        existed_refresh_token.revoked = True
-        db.add(existed_refresh_token)
+    await revoke_refresh_tokens(db, user.id)
     new_refresh_token = models.RefreshToken(
-        token=refresh_token,
+        token_hash=hash_token(refresh_token),
         created_at=datetime.datetime.now(datetime.timezone.utc),
         expires_at=datetime.datetime.now(datetime.timezone.utc) + refresh_token_expires_days,
         user_id=user.id
     )
     db.add(new_refresh_token)
-    db.commit()
+    await db.commit()
 
 
-def create_token_set(db: Session, user: user_models.User, scopes: list[str]):
+async def create_token_set(db: AsyncSession, user: user_models.User, scopes: list[str]):
     """
     Create refresh and access token and return them as pydantic model
     :param scopes: permissions
@@ -95,5 +163,5 @@ def create_token_set(db: Session, user: user_models.User, scopes: list[str]):
     refresh_token = create_refresh_token(
         dict(token_type=config.REFRESH_TOKEN_TYPE, user_id=user.id, scopes=scopes)
     )
-    save_refresh_token(db, refresh_token, user, datetime.timedelta(config.REFRESH_TOKEN_EXPIRE_DAYS))
+    await save_refresh_token(db, refresh_token, user, datetime.timedelta(config.REFRESH_TOKEN_EXPIRE_DAYS))
     return TokenSet(access_token=access_token, refresh_token=refresh_token)
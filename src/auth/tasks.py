@@ -0,0 +1,29 @@
+import asyncio
+import logging
+
+from src import config
+from src.auth import service
+from src.database.core import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_refresh_tokens_periodically():
+    """
+    Purge expired and revoked refresh tokens every REFRESH_TOKEN_PURGE_INTERVAL_SECONDS
+    It is started in app lifespan, 0 interval disables purging
+    """
+    if config.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS <= 0:
+        return
+    while True:
+        await asyncio.sleep(config.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS)
+        try:
+            async with SessionLocal() as db:
+                purged = await service.purge_refresh_tokens(
+                    db,
+                    batch_size=config.REFRESH_TOKEN_PURGE_BATCH_SIZE,
+                    max_rows_per_second=config.REFRESH_TOKEN_PURGE_MAX_ROWS_PER_SECOND
+                )
+            logger.info("Purged %s refresh tokens", purged)
+        except Exception:
+            logger.exception("Purging of refresh tokens failed")
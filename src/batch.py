@@ -0,0 +1,57 @@
+"""
+Multi-get of rows by list of ids
+
+'ids' query parameter contains comma separated ids, for example ids=3,1,2.
+Rows are selected with one IN query, response has one item per requested id in the same order,
+item of id that doesn't exist has 'found' false and null 'item'.
+"""
+from typing import Annotated, Generic, TypeVar
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+from src import config
+from src.fields import Selection, sparse_schema
+from src.responses import JSONBytesResponse, json_response, serializer
+
+T = TypeVar("T")
+
+
+class BatchItem(BaseModel, Generic[T]):
+    id: int
+    found: bool
+    item: T | None = None
+
+
+def batch_ids(ids: Annotated[str, Query(description="Comma separated ids")]) -> list[int]:
+    """
+    Dependency that parses 'ids' query parameter
+    :return: ids in requested order, duplicates are kept
+    """
+    try:
+        parsed = [int(id_) for id_ in ids.split(",") if id_.strip()]
+    except ValueError:
+        raise HTTPException(400, detail="Ids have to be comma separated integers")
+    if not parsed:
+        raise HTTPException(400, detail="At least one id is required")
+    if len(parsed) > config.MAX_BATCH_SIZE:
+        raise HTTPException(400, detail=f"No more than {config.MAX_BATCH_SIZE} ids can be requested at once")
+    return parsed
+
+
+def in_request_order(ids: list[int], rows) -> list[dict]:
+    found = {row.id: row for row in rows}
+    return [{"id": id_, "found": id_ in found, "item": found.get(id_)} for id_ in ids]
+
+
+def respond_batch(schema: type[BaseModel], selection: Selection | None, ids: list[int], rows) -> JSONBytesResponse:
+    """
+    Serialize rows in order of requested ids with markers of ids that were not found
+    :param schema: full schema of row, items are serialized with selected fields only
+    :param selection: selection from sparse_fields dependency, None if all fields are returned
+    :param ids: requested ids
+    :param rows: rows selected by ids
+    :return: response with list of BatchItem
+    """
+    model = schema if selection is None else sparse_schema(schema, selection)
+    return json_response(serializer(list[BatchItem[model]]), in_request_order(ids, rows))
@@ -0,0 +1,449 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+from urllib.parse import urlencode
+
+import orjson
+from fastapi import Request, Response
+
+from src.metrics import labels, metric_lines
+from src.responses import JSONBytesResponse
+
+
+class TTLCache:
+    """
+    In-process LRU cache where every entry expires after ttl seconds
+    It is not shared between workers, so entries can be stale up to ttl after change made by another worker
+    :param max_size: max amount of entries, the least recently used entry is evicted when it is exceeded
+    :param ttl: lifetime of entry in seconds
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Hashable):
+        self.delete(key)
+        self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class PrincipalCache(TTLCache):
+    """
+    Cache of immutable snapshots of users resolved from access tokens
+    Key is user id and time when token was issued, so every token has its own entry
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        super().__init__(max_size, ttl)
+        self._keys_of_user: dict[int, set[Hashable]] = {}
+
+    def set(self, key: tuple[int, int], value: Any):
+        super().set(key, value)
+        if key in self._entries:
+            self._keys_of_user.setdefault(key[0], set()).add(key)
+
+    def delete(self, key: tuple[int, int]):
+        super().delete(key)
+        keys = self._keys_of_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_of_user[key[0]]
+
+    def clear(self):
+        super().clear()
+        self._keys_of_user.clear()
+
+    def invalidate_user(self, user_id: int):
+        """
+        Remove all cached tokens of user, must be called when user is changed or deleted
+        """
+        for key in list(self._keys_of_user.get(user_id, ())):
+            self.delete(key)
+
+
+class TaggedCache(TTLCache):
+    """
+    TTLCache of bytes that is limited by total size of values and can be invalidated by tags
+    :param max_bytes: max total size of values, the least recently used entries are evicted when it is exceeded
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_bytes: int):
+        super().__init__(max_size, ttl)
+        self.max_bytes = max_bytes
+        self.size_in_bytes = 0
+        self._tags_of_key: dict[Hashable, tuple[str, ...]] = {}
+        self._keys_of_tag: dict[str, set[Hashable]] = {}
+
+    def set(self, key: Hashable, value: bytes, tags: Iterable[str] = ()):
+        if len(value) > self.max_bytes:
+            return
+        self.delete(key)
+        super().set(key, value)
+        if key not in self._entries:
+            return
+        self.size_in_bytes += len(value)
+        self._tags_of_key[key] = tuple(tags)
+        for tag in self._tags_of_key[key]:
+            self._keys_of_tag.setdefault(tag, set()).add(key)
+        while self.size_in_bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def delete(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.size_in_bytes -= len(entry[1])
+        super().delete(key)
+        for tag in self._tags_of_key.pop(key, ()):
+            keys = self._keys_of_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_of_tag[tag]
+
+    def clear(self):
+        super().clear()
+        self.size_in_bytes = 0
+        self._tags_of_key.clear()
+        self._keys_of_tag.clear()
+
+    def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            for key in list(self._keys_of_tag.get(tag, ())):
+                self.delete(key)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "bytes": self.size_in_bytes, "max_bytes": self.max_bytes}
+
+
+class ResponseCacheBackend(ABC):
+    """
+    Storage of serialized responses, every entry has tags that are used for invalidation
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, tags: Iterable[str]):
+        ...
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        """
+        Remove all entries of cache
+        """
+
+    @abstractmethod
+    async def generation(self) -> int:
+        """
+        Counter of invalidations and clears that is seen by all workers that use the backend
+        """
+
+    def stats(self) -> dict:
+        """
+        Stats of storage that are known to process, backends in shared store have none
+        """
+        return {}
+
+
+class MemoryBackend(ResponseCacheBackend):
+    """
+    In-process backend, every worker has its own cache and invalidates only it
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_bytes: int):
+        self.cache = TaggedCache(max_size, ttl, max_bytes)
+        self._generation = 0
+
+    async def get(self, key: str) -> bytes | None:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str]):
+        self.cache.set(key, value, tags)
+
+    async def invalidate(self, tags: Iterable[str]):
+        self._generation += 1
+        self.cache.invalidate(tags)
+
+    async def clear(self):
+        self._generation += 1
+        self.cache.clear()
+
+    async def generation(self) -> int:
+        return self._generation
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class SharedStoreBackend(ResponseCacheBackend):
+    """
+    Backend in shared key-value store, so invalidation made by one worker is seen by all of them
+    Client has to support subset of redis commands: get, set with px, delete, incr, sadd, smembers and pexpire,
+    for example redis.asyncio.Redis or LocalStore. Memory of store is limited by store itself
+    :param client: client of store
+    :param ttl: lifetime of entry in seconds
+    :param prefix: prefix of keys, so cache can share store with other data
+    Every key of cache is also added to set of keys of prefix, so the cache can be cleared without scanning store
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "response-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    @property
+    def _keys_key(self) -> str:
+        return f"{self.prefix}keys"
+
+    @property
+    def _generation_key(self) -> str:
+        return f"{self.prefix}generation"
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str]):
+        ttl = int(self.ttl * 1000)
+        tags = tuple(tags)
+        await self.client.set(self.prefix + key, value, px=ttl)
+        for tag in tags:
+            # set of keys lives as long as the latest entry with the tag
+            await self.client.sadd(self._tag_key(tag), self.prefix + key)
+            await self.client.pexpire(self._tag_key(tag), ttl)
+        # set of keys of prefix lives as long as the latest entry too, so it holds every key that can still exist
+        await self.client.sadd(self._keys_key, self.prefix + key, *map(self._tag_key, tags))
+        await self.client.pexpire(self._keys_key, ttl)
+
+    async def invalidate(self, tags: Iterable[str]):
+        # generation is bumped before entries are deleted, so response that is built meanwhile is not stored
+        await self.client.incr(self._generation_key)
+        for tag in tags:
+            keys = await self.client.smembers(self._tag_key(tag))
+            await self.client.delete(self._tag_key(tag), *keys)
+
+    async def clear(self):
+        await self.client.incr(self._generation_key)
+        keys = await self.client.smembers(self._keys_key)
+        await self.client.delete(self._keys_key, *keys)
+
+    async def generation(self) -> int:
+        return int(await self.client.get(self._generation_key) or 0)
+
+
+class LocalStore:
+    """
+    In-process stand-in of shared store that implements commands used by SharedStoreBackend
+    """
+
+    def __init__(self):
+        self._values: dict[str, tuple[float | None, Any]] = {}
+
+    def _get(self, key: str):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> bytes | None:
+        return self._get(key)
+
+    async def set(self, key: str, value: bytes, px: int | None = None):
+        self._values[key] = (time.monotonic() + px / 1000 if px else None, value)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._values.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key: str) -> int:
+        value = int(self._get(key) or 0) + 1
+        expires_at = self._values.get(key, (None, None))[0]
+        self._values[key] = (expires_at, str(value).encode())
+        return value
+
+    async def sadd(self, key: str, *members: str):
+        members_set = self._get(key) or set()
+        members_set.update(members)
+        expires_at = self._values.get(key, (None, None))[0]
+        self._values[key] = (expires_at, members_set)
+
+    async def smembers(self, key: str) -> set:
+        return set(self._get(key) or ())
+
+    async def pexpire(self, key: str, px: int):
+        if self._get(key) is not None:
+            self._values[key] = (time.monotonic() + px / 1000, self._values[key][1])
+
+
+def table_tag(model) -> str:
+    """
+    Tag of responses that can embed any row of table, for example lists
+    """
+    return model.__tablename__
+
+
+def row_tags(model, ids: Iterable[int]) -> list[str]:
+    """
+    Tags of responses that embed specific rows
+    """
+    return [f"{model.__tablename__}:{id_}" for id_ in ids]
+
+
+class CacheEntry:
+    """
+    Lookup of one response in ResponseCache
+    Response that was built while any write invalidated cache is not stored, because it can miss that write.
+    Generation of invalidations is read from backend after miss and again before store, so writes of all workers
+    are seen. Invalidation that comes between the second read and store can still leave stale entry, it lives
+    until ttl of backend ends
+    :param bypass: if true cache is not used, for example by client that has to read its own writes
+    """
+
+    def __init__(self, cache: "ResponseCache", key: str, bypass: bool = False):
+        self.cache = cache
+        self.key = key
+        self.generation: int | None = None
+        self.enabled = cache.enabled and not bypass
+
+    async def get(self) -> JSONBytesResponse | None:
+        if not self.enabled:
+            return None
+        value = await self.cache.backend.get(self.key)
+        if value is None:
+            self.cache.misses += 1
+            self.generation = await self.cache.backend.generation()
+            return None
+        self.cache.hits += 1
+        headers, body = value.split(b"\n", 1)
+        return JSONBytesResponse(content=body, headers=orjson.loads(headers))
+
+    async def store(self, response: Response, tags: Iterable[str]) -> Response:
+        """
+        Store successful response under tags and return it
+        """
+        if (self.enabled and response.status_code == 200 and self.generation is not None
+                and self.generation == await self.cache.backend.generation()):
+            headers = {key: value for key, value in response.headers.items()
+                       if key not in ("content-length", "content-type")}
+            await self.cache.backend.set(self.key, orjson.dumps(headers) + b"\n" + response.body, tags)
+        return response
+
+
+class ResponseCache:
+    """
+    Read-through cache of serialized responses
+    Key is made from path, query parameters and visibility scope of user, services invalidate entries by tags
+    :param backend: storage of entries
+    :param enabled: if false nothing is stored
+    """
+
+    def __init__(self, backend: ResponseCacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def entry(self, request: Request, scope: str) -> CacheEntry:
+        """
+        :param request: request to cached route
+        :param scope: visibility scope of user, users with different scopes can see different responses
+        """
+        query = urlencode(sorted(request.query_params.multi_items()))
+        # entry stored from lagging replica could hide recent write from its author
+        bypass = getattr(request.state, "read_primary", False)
+        return CacheEntry(self, f"{scope}:{request.url.path}?{query}", bypass)
+
+    async def invalidate(self, *tags: str):
+        if self.enabled:
+            await self.backend.invalidate(tags)
+
+    async def invalidate_rows(self, model, *ids: int):
+        """
+        Invalidate responses that embed changed rows of model, including responses tagged by its table
+        """
+        await self.invalidate(table_tag(model), *row_tags(model, ids))
+
+    async def clear(self):
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {**self.backend.stats(), "hits": self.hits, "misses": self.misses}
+
+
+def cache_metric_lines(stats_by_cache: dict[str, dict]) -> list[str]:
+    """
+    Stats of caches in Prometheus text format
+    :param stats_by_cache: stats of caches by their names, keys that cache doesn't have are skipped
+    """
+    metrics = {
+        "hits": ("cache_hits_total", "counter", "Lookups that found entry"),
+        "misses": ("cache_misses_total", "counter", "Lookups that didn't find entry"),
+        "evictions": ("cache_evictions_total", "counter", "Entries that were evicted by limits of cache"),
+        "size": ("cache_entries", "gauge", "Entries in cache"),
+        "max_size": ("cache_max_entries", "gauge", "Max amount of entries"),
+        "bytes": ("cache_bytes", "gauge", "Total size of values in cache"),
+        "max_bytes": ("cache_max_bytes", "gauge", "Max total size of values"),
+    }
+    lines = []
+    for key, (name, metric_type, description) in metrics.items():
+        lines += metric_lines(name, metric_type, description,
+                              [f"{name}{labels(cache=cache)} {stats[key]}"
+                               for cache, stats in stats_by_cache.items() if key in stats])
+    return lines
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import sys
+
+from src import config
+from src.database.core import SessionLocal
+from src.database.explain import check_query_plans
+# all models have to be imported, so relationships between them can be configured
+from src.applications.models import Application, Rating
+from src.auth.models import RefreshToken
+from src.users.models import User
+from src.comments.models import Comment, CommentVotes
+from src.reviews.models import Review, ReviewVotes
+from src.applications import service as application_service
+from src.auth import service as auth_service
+from src.comments import service as comment_service
+from src.reviews import service as review_service
+
+
+async def reconcile_votes(args: argparse.Namespace):
+    """
+    Recount vote counters of reviews and comments and repair rows that drifted from votes
+    """
+    async with SessionLocal() as db:
+        reviews = await review_service.reconcile_votes(db)
+        comments = await comment_service.reconcile_votes(db)
+    print(f"Repaired vote counters of {reviews} reviews and {comments} comments")
+
+
+async def reconcile_ratings(args: argparse.Namespace):
+    """
+    Recount rating aggregates of applications from ratings
+    """
+    async with SessionLocal() as db:
+        applications = await application_service.reconcile_ratings(db)
+    print(f"Recounted ratings of {applications} applications")
+
+
+async def purge_refresh_tokens(args: argparse.Namespace):
+    """
+    Delete expired and revoked refresh tokens
+    """
+    async with SessionLocal() as db:
+        purged = await auth_service.purge_refresh_tokens(db, args.batch_size, args.max_rows_per_second)
+    print(f"Purged {purged} refresh tokens")
+
+
+async def check_plans(args: argparse.Namespace):
+    """
+    Fail if any of service queries uses sequential scan on seeded database
+    """
+    failures = await check_query_plans(args.database_uri, users=args.users, applications=args.applications,
+                                       ratings=args.ratings, comments=args.comments, votes=args.votes)
+    for statement, plan in failures:
+        print(statement, *plan, sep="\n    ", end="\n\n")
+    if failures:
+        sys.exit(f"{len(failures)} queries use sequential scan")
+    print("All queries use indexes")
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.commands", description="Maintenance commands of FeedCo API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reconcile_votes_parser = subparsers.add_parser("reconcile-votes", help="Repair vote counters of reviews and comments")
+    reconcile_votes_parser.set_defaults(handler=reconcile_votes)
+
+    reconcile_ratings_parser = subparsers.add_parser("reconcile-ratings", help="Recount rating aggregates of applications")
+    reconcile_ratings_parser.set_defaults(handler=reconcile_ratings)
+
+    purge_parser = subparsers.add_parser("purge-refresh-tokens", help="Delete expired and revoked refresh tokens")
+    purge_parser.add_argument("--batch-size", type=int, default=config.REFRESH_TOKEN_PURGE_BATCH_SIZE)
+    purge_parser.add_argument("--max-rows-per-second", type=int,
+                              default=config.REFRESH_TOKEN_PURGE_MAX_ROWS_PER_SECOND)
+    purge_parser.set_defaults(handler=purge_refresh_tokens)
+
+    plans_parser = subparsers.add_parser("check-query-plans", help="Check that service queries don't use sequential scans")
+    plans_parser.add_argument("--database-uri", default="sqlite://", help="uri of empty database, in-memory sqlite by default")
+    plans_parser.add_argument("--users", type=int, default=1000)
+    plans_parser.add_argument("--applications", type=int, default=2000)
+    plans_parser.add_argument("--ratings", type=int, default=10000)
+    plans_parser.add_argument("--comments", type=int, default=10000)
+    plans_parser.add_argument("--votes", type=int, default=20000)
+    plans_parser.set_defaults(handler=check_plans)
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,32 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, UniqueConstraint
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
-from src.database.core import Base
+from src.database.core import Base, Versioned
 
 
-class Comment(Base):
+class Comment(Versioned, Base):
     """
     Comments are used for discussing review
     Users can write comments under review
     :param text: text of comment
+    :param votes_positive: amount of positive votes, maintained by vote and unvote services
+    :param votes_negative: amount of negative votes, maintained by vote and unvote services
     """
     __tablename__ = "comments"
     id: Mapped[int] = mapped_column(primary_key=True)
     text: Mapped[str] = mapped_column()
+    votes_positive: Mapped[int] = mapped_column(default=0, server_default="0")
+    votes_negative: Mapped[int] = mapped_column(default=0, server_default="0")
 
     deleted: Mapped[bool] = mapped_column(default=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     user: Mapped["User"] = relationship(back_populates="comments")
 
-    review_id: Mapped[int] = mapped_column(ForeignKey("reviews.id"))
+    review_id: Mapped[int] = mapped_column(ForeignKey("reviews.id"), index=True)
     review: Mapped["Review"] = relationship(back_populates="comments")
 
     votes: Mapped[list["CommentVotes"]] = relationship(back_populates="comment")
 
-    @property
-    def votes_positive(self):
-        return len([vote for vote in self.votes if vote.vote_type is True])
-
-    @property
-    def votes_negative(self):
-        return len([vote for vote in self.votes if vote.vote_type is False])
-
 
 class CommentVotes(Base):
     """
@@ -38,6 +34,10 @@ class CommentVotes(Base):
     :param vote_type: if true user support
     """
     __tablename__ = "comment_votes"
+    __table_args__ = (
+        # user can vote only once for comment, index is also used for counting votes of comment
+        UniqueConstraint("comment_id", "user_id", name="uq_comment_votes_comment_id_user_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     vote_type: Mapped[bool] = mapped_column()
 
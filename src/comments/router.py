@@ -1,55 +1,75 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Security, Body
+from fastapi import APIRouter, Depends, HTTPException, Security, Body, Response
 
 from src.comments.schemas import CommentBase, CommentFull, VoteCreate
-from sqlalchemy.orm import Session
-from src.dependencies import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.dependencies import get_db, get_read_db
 from src.comments import service, models
-from src.users import models as user_models
 from src.auth.dependencies import get_current_user
-from src.comments.dependencies import get_comment_by_id, unvote_comment, vote_comment
+from src.auth.schemas import Principal
+from src.batch import BatchItem, batch_ids, respond_batch
+from src.comments.dependencies import (get_comment_by_id, get_modified_comment_by_id, check_comment_modified,
+                                      unvote_comment, vote_comment)
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
 
 
+@router.get("/batch", response_model=list[BatchItem[CommentFull]])
+async def get_comments_by_ids(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        ids: Annotated[list[int], Depends(batch_ids)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Get comments by comma separated ids with one query, items are returned in requested order
+    """
+    return respond_batch(CommentFull, None, ids, await service.get_many(db, ids))
+
+
 @router.get("/{comment_id}", response_model=CommentFull)
-async def get_comment_by_id(
-        comment: Annotated[models.Comment, Depends(get_comment_by_id)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+async def get_comment(
+        response: Response,
+        comment: Annotated[models.Comment, Depends(get_modified_comment_by_id)],
+        validators: Annotated[dict, Depends(check_comment_modified)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Response has ETag and Last-Modified, request with If-None-Match or If-Modified-Since is answered with 304
+    if comment didn't change
+    """
+    response.headers.update(validators)
     return comment
 
 
 @router.delete("/{comment_id}", status_code=204)
 async def delete_comment(
-        db: Annotated[Session, Depends(get_db)],
+        db: Annotated[AsyncSession, Depends(get_db)],
         comment: Annotated[models.Comment, Depends(get_comment_by_id)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=401, detail="Comment was created by another user")
-    service.delete(db, comment.id)
+    await service.delete(db, comment.id)
 
 
 @router.patch("/{comment_id}", response_model=CommentFull)
 async def update_comment(
-        db: Annotated[Session, Depends(get_db)],
+        db: Annotated[AsyncSession, Depends(get_db)],
         comment: Annotated[models.Comment, Depends(get_comment_by_id)],
         comment_data: Annotated[CommentBase, Body()],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=401, detail="Comment was created by another user")
-    return service.update(db, comment_data, comment.id)
+    return await service.update(db, comment_data, comment.id)
 
 
 @router.post("/{comment_id}/votes", response_model=VoteCreate, status_code=201)
 async def create_vote_on_comment(
         vote: Annotated[models.CommentVotes, Depends(vote_comment)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     return vote
 
 
 @router.delete("/{comment_id}/votes", status_code=204)
 async def delete_vote_on_comment(
         vote: Annotated[None, Depends(unvote_comment)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     return None
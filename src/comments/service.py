@@ -1,53 +1,86 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, false
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
 
+from src import response_cache
+from src.cache import row_tags, table_tag
 from src.comments import models
 from src.comments.schemas import CommentBase, CommentCreate, VoteCreate
+from src.reviews.models import Review
+from src.votes.counters import write_vote, delete_vote, reconcile_counters
 
 
-def create(db: Session, comment_data: CommentCreate, review_id):
+def comment_full_options():
+    """
+    Loading plan of CommentFull
+    Votes are counted in columns, so CommentFull needs no relationships and all of them raise on access
+    """
+    return (raiseload("*", sql_only=True),)
+
+
+async def create(db: AsyncSession, comment_data: CommentCreate, review_id):
     comment = models.Comment(text=comment_data.text, review_id=review_id, user_id=comment_data.user_id)
     db.add(comment)
-    db.commit()
-    return comment
+    await db.commit()
+    # new comment is embedded into responses with its review
+    await response_cache.invalidate(table_tag(models.Comment), *row_tags(Review, [review_id]))
+    return await get(db, comment.id)
+
+
+async def get(db: AsyncSession, comment_id: int):
+    query = select(models.Comment).filter_by(id=comment_id, deleted=False).options(*comment_full_options())
+    return await db.scalar(query)
+
+
+async def get_many(db: AsyncSession, comment_ids: list[int]) -> list[models.Comment]:
+    """
+    Select comments that are not deleted by ids with one query, order of ids is not kept
+    """
+    query = (select(models.Comment)
+             .filter(models.Comment.id.in_(set(comment_ids)), models.Comment.deleted == false())
+             .options(*comment_full_options()))
+    return (await db.scalars(query)).all()
 
 
-def get(db: Session, comment_id: int):
-    return db.query(models.Comment).filter_by(id=comment_id, deleted=False).first()
+async def get_version(db: AsyncSession, comment_id: int) -> tuple | None:
+    """
+    Select version of comment without loading it
+    :return: version and time of change or None if comment doesn't exist
+    """
+    query = (select(models.Comment.version, models.Comment.updated_at)
+             .filter_by(id=comment_id, deleted=False))
+    return (await db.execute(query)).first()
 
 
-def update(db: Session, comment_data: CommentBase, comment_id: int):
-    comment = get(db, comment_id)
+async def update(db: AsyncSession, comment_data: CommentBase, comment_id: int):
+    comment = await get(db, comment_id)
     if comment_data.text:
         comment.text = comment_data.text
+    comment.bump_version()
     db.add(comment)
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate_rows(models.Comment, comment_id)
     return comment
 
 
-def delete(db: Session, comment_id: int):
-    comment = get(db, comment_id)
+async def delete(db: AsyncSession, comment_id: int):
+    comment = await get(db, comment_id)
     comment.deleted = True
+    comment.bump_version()
     db.add(comment)
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate_rows(models.Comment, comment_id)
 
 
-def vote_exist(db: Session, votes_data: VoteCreate, comment_id: int) -> bool:
-    vote = db.query(models.CommentVotes).filter_by(user_id=votes_data.user_id, comment_id=comment_id).first()
-    return vote
+async def vote(db: AsyncSession, votes_data: VoteCreate, comment_id: int):
+    return await write_vote(db, models.Comment, models.CommentVotes, models.CommentVotes.comment_id,
+                            comment_id, votes_data)
 
 
-def vote(db: Session, votes_data: VoteCreate, comment_id: int):
-    vote = vote_exist(db, votes_data, comment_id)
-    if vote:
-        vote.vote_type = votes_data.vote_type
-    else:
-        vote = models.CommentVotes(vote_type=votes_data.vote_type, comment_id=comment_id, user_id=votes_data.user_id)
-    db.add(vote)
-    db.commit()
-    return vote
+async def unvote(db: AsyncSession, votes_data: VoteCreate, comment_id: int):
+    await delete_vote(db, models.Comment, models.CommentVotes, models.CommentVotes.comment_id,
+                      comment_id, votes_data.user_id)
 
 
-def unvote(db: Session, votes_data: VoteCreate, comment_id: int):
-    vote = vote_exist(db, votes_data, comment_id)
-    db.delete(vote)
-    db.commit()
+async def reconcile_votes(db: AsyncSession) -> int:
+    return await reconcile_counters(db, models.Comment, models.CommentVotes, models.CommentVotes.comment_id)
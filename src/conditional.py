@@ -0,0 +1,71 @@
+"""
+Conditional GET
+
+Versioned rows keep version and time of the last change. Route dependency selects only them
+for requested resource and its embedded rows, builds ETag and Last-Modified from them and answers 304
+when client has the current representation, so the resource itself is not loaded and serialized.
+"""
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import HTTPException, Request
+
+
+def make_etag(version: tuple, request: Request) -> str:
+    """
+    Weak ETag of representation, it depends on versions and on query, because query selects fields of response
+    """
+    digest = hashlib.sha1(repr((version, request.url.query)).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def last_modified(version: tuple) -> datetime.datetime | None:
+    """
+    The latest time of change among versioned rows, times are stored in UTC without timezone
+    """
+    times = [value for value in version if isinstance(value, datetime.datetime)]
+    if not times:
+        return None
+    return max(times).replace(tzinfo=datetime.timezone.utc, microsecond=0)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    # weak comparison, W/ prefix is ignored
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def modified_since(header: str, modified: datetime.datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return True
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return modified > since
+
+
+def check(request: Request, version: tuple) -> dict:
+    """
+    Answer 304 if representation that client has is current
+    If-None-Match takes precedence, If-Modified-Since is used only without it
+    :param request: request with conditional headers
+    :param version: versions and times of change of resource and its embedded rows
+    :return: validator headers for response with resource
+    """
+    etag = make_etag(version, request)
+    headers = {"ETag": etag}
+    modified = last_modified(version)
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    else:
+        not_modified = if_modified_since is not None and modified is not None \
+            and not modified_since(if_modified_since, modified)
+    if not_modified:
+        raise HTTPException(304, headers=headers)
+    return headers
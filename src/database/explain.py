@@ -0,0 +1,139 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.database.core import Base, get_async_uri
+from src.database.seed import seed
+from src.applications import service as application_service
+from src.applications.schemas import ApplicationSearch
+from src.auth import service as auth_service
+from src.comments import service as comment_service
+from src.comments.schemas import VoteCreate
+from src.reviews import service as review_service
+from src.users import service as user_service
+from src.users.schemas import UserSearch
+
+EXPLAIN_PREFIX = {
+    "postgresql": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+
+@contextmanager
+def record_statements(engine: Engine):
+    """
+    Collect statements and parameters that are executed by engine
+    :param engine: sync engine, for AsyncEngine it is engine.sync_engine
+    :return: list that is filled with (statement, parameters) pairs
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def is_sequential_scan(dialect: str, plan_line: str) -> bool:
+    if dialect == "postgresql":
+        return "Seq Scan" in plan_line
+    # sqlite marks full scan of table as "SCAN table", scans of index and FTS5 table contain USING or VIRTUAL TABLE
+    return (plan_line.startswith("SCAN ")
+            and "USING" not in plan_line
+            and "VIRTUAL TABLE" not in plan_line
+            and "CONSTANT ROW" not in plan_line)
+
+
+async def explain(connection: AsyncConnection, statement: str, parameters) -> list[str]:
+    dialect = connection.dialect.name
+    result = await connection.exec_driver_sql(EXPLAIN_PREFIX[dialect] + statement, parameters)
+    return [str(row[-1]) for row in result]
+
+
+async def run_service_queries(db: AsyncSession, data: dict):
+    """
+    Call services that are used by routes, so their statements can be recorded
+    """
+    user_id = data["users"][0]
+    application_id = data["applications"][0]
+    review_id = data["reviews"][0]
+    comment_id = data["comments"][0]
+
+    _, next_cursor = await application_service.get_all(db, ApplicationSearch(limit=10))
+    await application_service.get_all(db, ApplicationSearch(limit=10, after=next_cursor))
+    await application_service.get_all(db, ApplicationSearch(user_id=user_id))
+    await application_service.get_all(db, ApplicationSearch(search="weather music"))
+    application = await application_service.get(db, application_id)
+    await application_service.get_version(db, application_id)
+    await application_service.get_many(db, [application_id, application_id + 1])
+    await application_service.exists(db, application.name, application.description)
+
+    user = await user_service.get(db, user_id)
+    _, next_cursor = await user_service.get_all(db, UserSearch(limit=10))
+    await user_service.get_all(db, UserSearch(limit=10, after=next_cursor))
+    await user_service.exists(db, user.username, user.email)
+    await user_service.get_applications(db, user_id)
+
+    await auth_service.get_refresh_token_by_token_string(db, "token")
+
+    await review_service.get(db, review_id)
+    await review_service.get_version(db, review_id)
+    await review_service.get_many(db, [review_id, review_id + 1])
+    await review_service.vote(db, VoteCreate(vote_type=True, user_id=user_id), review_id)
+    await review_service.unvote(db, VoteCreate(vote_type=True, user_id=user_id), review_id)
+
+    await comment_service.get(db, comment_id)
+    await comment_service.get_version(db, comment_id)
+    await comment_service.get_many(db, [comment_id, comment_id + 1])
+    await comment_service.vote(db, VoteCreate(vote_type=True, user_id=user_id), comment_id)
+    await comment_service.unvote(db, VoteCreate(vote_type=True, user_id=user_id), comment_id)
+
+
+async def check_query_plans(database_uri: str, **volumes) -> list[tuple[str, list[str]]]:
+    """
+    Seed empty database, run service queries and explain every of them
+    In postgres sequential scans are disabled, so planner chooses them only if there is no suitable index
+    :param database_uri: uri of empty database, tables are created and dropped by checker
+    :param volumes: amounts of seeded rows, see seed
+    :return: statements that use sequential scan with their plans
+    """
+    engine = create_async_engine(get_async_uri(database_uri), poolclass=NullPool)
+    dialect = engine.dialect.name
+    if dialect not in EXPLAIN_PREFIX:
+        raise ValueError(f"Query plans can't be checked for {dialect}")
+    failures = []
+    async with engine.connect() as connection:
+        if await connection.run_sync(lambda sync_connection: inspect(sync_connection).get_table_names()):
+            raise ValueError("Database for checking query plans must be empty")
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.commit()
+        try:
+            db = AsyncSession(bind=connection, expire_on_commit=False)
+            data = await seed(db, **volumes)
+            if dialect == "postgresql":
+                await connection.exec_driver_sql("ANALYZE")
+                await connection.exec_driver_sql("SET enable_seqscan = off")
+            with record_statements(engine.sync_engine) as statements:
+                await run_service_queries(db, data)
+            checked = set()
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")) or statement in checked:
+                    continue
+                checked.add(statement)
+                plan = await explain(connection, statement, parameters)
+                if any(is_sequential_scan(dialect, line) for line in plan):
+                    failures.append((statement, plan))
+        finally:
+            await connection.rollback()
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.commit()
+    await engine.dispose()
+    return failures
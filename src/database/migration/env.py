@@ -27,6 +27,7 @@ from src.auth.models import RefreshToken
 from src.users.models import User
 from src.comments.models import Comment, CommentVotes
 from src.reviews.models import Review, ReviewVotes
+from src.jobs.models import Job
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
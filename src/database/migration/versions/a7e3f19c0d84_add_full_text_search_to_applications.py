@@ -0,0 +1,62 @@
+"""add full text search to applications
+
+Revision ID: a7e3f19c0d84
+Revises: 5d1c0a7f42b9
+Create Date: 2026-10-18 11:02:17.540361
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3f19c0d84'
+down_revision = '5d1c0a7f42b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # generated column is filled for existing rows and kept up to date by postgres itself
+        op.execute(
+            "ALTER TABLE applications ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED"
+        )
+        op.create_index('ix_applications_search_vector', 'applications', ['search_vector'],
+                        unique=False, postgresql_using='gin')
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE applications_fts USING fts5("
+            "name, description, content='applications', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER applications_fts_insert AFTER INSERT ON applications BEGIN "
+            "INSERT INTO applications_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER applications_fts_delete AFTER DELETE ON applications BEGIN "
+            "INSERT INTO applications_fts(applications_fts, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER applications_fts_update AFTER UPDATE OF name, description ON applications BEGIN "
+            "INSERT INTO applications_fts(applications_fts, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); "
+            "INSERT INTO applications_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+        op.execute("INSERT INTO applications_fts(applications_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.drop_index('ix_applications_search_vector', table_name='applications')
+        op.drop_column('applications', 'search_vector')
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS applications_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS applications_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS applications_fts_insert")
+        op.execute("DROP TABLE IF EXISTS applications_fts")
@@ -0,0 +1,56 @@
+"""store refresh tokens hashed
+
+Revision ID: f3a81c9d2e57
+Revises: e19f5b3a7c62
+Create Date: 2026-10-18 13:20:44.381920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.auth.service import hash_token
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a81c9d2e57'
+down_revision = 'e19f5b3a7c62'
+branch_labels = None
+depends_on = None
+
+
+refresh_tokens = sa.table(
+    'refresh_tokens',
+    sa.column('id', sa.Integer()),
+    sa.column('token', sa.String()),
+    sa.column('token_hash', sa.String(length=64)),
+)
+
+
+def upgrade() -> None:
+    op.add_column('refresh_tokens', sa.Column('token_hash', sa.String(length=64), nullable=True))
+    # digests are computed in python, so backfill works the same on every database
+    bind = op.get_bind()
+    tokens = bind.execute(sa.select(refresh_tokens.c.id, refresh_tokens.c.token)).all()
+    if tokens:
+        bind.execute(
+            refresh_tokens.update()
+            .where(refresh_tokens.c.id == sa.bindparam('token_id'))
+            .values(token_hash=sa.bindparam('digest')),
+            [{'token_id': token_id, 'digest': hash_token(token)} for token_id, token in tokens]
+        )
+    # sqlite can't alter columns, batch mode recreates table there and alters it in place on postgres
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.alter_column('token_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.drop_column('token')
+    op.create_index(op.f('ix_refresh_tokens_token_hash'), 'refresh_tokens', ['token_hash'], unique=True)
+    op.create_index('ix_refresh_tokens_user_id_revoked', 'refresh_tokens', ['user_id', 'revoked'], unique=False)
+
+
+def downgrade() -> None:
+    # tokens can't be restored from digests, so all of them are removed and users have to login again
+    op.execute("DELETE FROM refresh_tokens")
+    op.drop_index('ix_refresh_tokens_user_id_revoked', table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_token_hash'), table_name='refresh_tokens')
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.add_column(sa.Column('token', sa.String(), nullable=False))
+        batch_op.drop_column('token_hash')
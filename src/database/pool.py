@@ -0,0 +1,81 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.metrics import Histogram, histogram_lines, labels, metric_lines
+
+
+class PoolMetrics:
+    """
+    Counters of connection pool that are not tracked by pool itself
+    :param wait_time: time of getting connection from pool in seconds, including opening of new connection
+    :param timeouts: amount of checkouts that failed because pool was exhausted for pool timeout
+    """
+
+    def __init__(self):
+        self.wait_time = Histogram()
+        self.timeouts = 0
+
+
+def observed_pool(base: type[AsyncAdaptedQueuePool] = AsyncAdaptedQueuePool) -> type[AsyncAdaptedQueuePool]:
+    """
+    Make pool class that measures checkouts
+    Every engine needs its own class, because pool is recreated from its class when engine is disposed
+    and metrics have to survive that
+    """
+    class ObservedQueuePool(base):
+        metrics = PoolMetrics()
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                self.metrics.timeouts += 1
+                raise
+            finally:
+                self.metrics.wait_time.observe(time.perf_counter() - start)
+
+    return ObservedQueuePool
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """
+    Live state of connection pool of engine
+    Pool that is not made by observed_pool has only its class name in stats
+    :return: size, checked out and checked in connections, overflow, timeouts and wait time histogram
+    """
+    pool = engine.sync_engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+                     overflow=max(pool.overflow(), 0), max_overflow=pool._max_overflow)
+    metrics = getattr(pool, "metrics", None)
+    if isinstance(metrics, PoolMetrics):
+        stats.update(timeouts=metrics.timeouts, wait_time=metrics.wait_time.snapshot())
+    return stats
+
+
+def pool_metric_lines(stats_by_database: dict[str, dict]) -> list[str]:
+    """
+    Stats of pools in Prometheus text format
+    :param stats_by_database: stats from pool_stats by name of database, for example primary and replica
+    """
+    gauges = {"size": "Size of pool", "checked_out": "Connections that are in use",
+              "overflow": "Connections that are opened above size of pool"}
+    lines = []
+    for key, description in gauges.items():
+        lines += metric_lines(f"db_pool_{key}", "gauge", description,
+                              [f"db_pool_{key}{labels(database=database)} {stats[key]}"
+                               for database, stats in stats_by_database.items() if key in stats])
+    lines += metric_lines("db_pool_timeouts_total", "counter", "Checkouts that timed out",
+                          [f"db_pool_timeouts_total{labels(database=database)} {stats['timeouts']}"
+                           for database, stats in stats_by_database.items() if "timeouts" in stats])
+    wait_time = []
+    for database, stats in stats_by_database.items():
+        if "wait_time" in stats:
+            wait_time += histogram_lines("db_pool_wait_seconds", stats["wait_time"], database=database)
+    lines += metric_lines("db_pool_wait_seconds", "histogram", "Time of getting connection from pool", wait_time)
+    return lines
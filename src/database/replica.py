@@ -0,0 +1,54 @@
+"""
+Routing of reads to replica
+
+Safe requests read from replica, except requests of clients that wrote recently:
+response to successful write sets cookie with time until which the client reads from primary,
+so it reads its own writes while replica catches up.
+"""
+import time
+
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src import config
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+def read_primary_until(scope: Scope) -> float:
+    value = HTTPConnection(scope).cookies.get(READ_PRIMARY_COOKIE)
+    try:
+        return float(value) if value else 0
+    except ValueError:
+        return 0
+
+
+class ReadYourWritesMiddleware:
+    """
+    Mark requests that have to read from primary in 'read_primary' of request state
+    Does nothing if replica is not configured
+    :param sticky_seconds: how long client reads from primary after write
+    """
+
+    def __init__(self, app: ASGIApp, sticky_seconds: int):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not config.SQLALCHEMY_REPLICA_DATABASE_URI:
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] in SAFE_METHODS:
+            scope.setdefault("state", {})["read_primary"] = read_primary_until(scope) > time.time()
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (f"{READ_PRIMARY_COOKIE}={time.time() + self.sticky_seconds:.3f}; "
+                          f"Max-Age={self.sticky_seconds}; Path=/; HttpOnly; SameSite=lax")
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
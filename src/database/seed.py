@@ -0,0 +1,115 @@
+import random
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import pwd_context
+from src.applications.models import Application, Rating
+from src.comments.models import Comment, CommentVotes
+from src.enums import AccountType, RatingGrade
+from src.reviews.models import Review, ReviewVotes
+from src.users.models import User
+from src.applications import service as application_service
+from src.comments import service as comment_service
+from src.reviews import service as review_service
+
+WORDS = [
+    "weather", "calendar", "music", "fitness", "budget", "travel", "recipe", "chat", "notes", "photo",
+    "video", "game", "learning", "language", "shopping", "health", "sleep", "meditation", "news", "maps",
+]
+SEED_PASSWORD = "password"
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+async def insert_rows(db: AsyncSession, model, rows: list[dict], chunk_size: int) -> list[int]:
+    """
+    Insert rows with executemany in chunks
+    :return: ids of inserted rows in the same order
+    """
+    ids = []
+    for start in range(0, len(rows), chunk_size):
+        ids.extend(await db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True),
+                                    rows[start:start + chunk_size]))
+    return ids
+
+
+def unique_pairs(rng: random.Random, first: list[int], second: list[int], amount: int) -> list[tuple[int, int]]:
+    amount = min(amount, len(first) * len(second))
+    pairs = set()
+    while len(pairs) < amount:
+        pairs.add((rng.choice(first), rng.choice(second)))
+    return sorted(pairs)
+
+
+async def seed(db: AsyncSession, users: int = 100, applications: int = 200, ratings: int = 1000,
+               comments: int = 2000, votes: int = 5000, random_seed: int = 0, chunk_size: int = 1000) -> dict:
+    """
+    Fill database with synthetic data, the same random_seed gives the same dataset
+    Every rating has review, comments and votes are spread between reviews randomly
+    :param db: session to interact with db
+    :param users: amount of users, every second one is startup
+    :param applications: amount of applications
+    :param ratings: amount of ratings with reviews
+    :param comments: amount of comments
+    :param votes: amount of review votes and the same amount of comment votes
+    :param random_seed: seed of random generator
+    :param chunk_size: amount of rows in one INSERT
+    :return: dict with ids of created users, applications, reviews, comments and password of users
+    """
+    rng = random.Random(random_seed)
+    # usernames are unique, so every run has its own prefix
+    prefix = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+    password = pwd_context.hash(SEED_PASSWORD)
+
+    user_ids = await insert_rows(db, User, [
+        dict(username=f"{prefix}_user_{i}", email=f"{prefix}_user_{i}@example.com", password=password,
+             account_type=AccountType.startup if i % 2 == 0 else AccountType.tester, deleted=False)
+        for i in range(users)
+    ], chunk_size)
+    startup_ids = user_ids[::2]
+
+    application_ids = await insert_rows(db, Application, [
+        dict(name=f"{sentence(rng, 2)} {i}", description=sentence(rng, 40), hide_reviews=False, deleted=False,
+             user_id=rng.choice(startup_ids))
+        for i in range(applications)
+    ], chunk_size)
+
+    review_rows = [dict(title=sentence(rng, 4), body=sentence(rng, 30), deleted=False, user_id=rng.choice(user_ids))
+                   for _ in range(ratings)]
+    review_ids = await insert_rows(db, Review, review_rows, chunk_size)
+    await insert_rows(db, Rating, [
+        dict(grade=rng.choice(list(RatingGrade)), deleted=False, user_id=review["user_id"],
+             review_id=review_id, application_id=rng.choice(application_ids))
+        for review, review_id in zip(review_rows, review_ids)
+    ], chunk_size)
+
+    comment_ids = await insert_rows(db, Comment, [
+        dict(text=sentence(rng, 12), deleted=False, user_id=rng.choice(user_ids), review_id=rng.choice(review_ids))
+        for _ in range(comments)
+    ], chunk_size) if review_ids else []
+
+    await insert_rows(db, ReviewVotes, [
+        dict(review_id=review_id, user_id=user_id, vote_type=rng.random() < 0.7)
+        for review_id, user_id in unique_pairs(rng, review_ids, user_ids, votes)
+    ], chunk_size)
+    await insert_rows(db, CommentVotes, [
+        dict(comment_id=comment_id, user_id=user_id, vote_type=rng.random() < 0.7)
+        for comment_id, user_id in unique_pairs(rng, comment_ids, user_ids, votes)
+    ], chunk_size)
+    await db.commit()
+
+    # counters are calculated by database from inserted rows
+    await review_service.reconcile_votes(db)
+    await comment_service.reconcile_votes(db)
+    await application_service.reconcile_ratings(db)
+    return {
+        "users": user_ids,
+        "applications": application_ids,
+        "reviews": review_ids,
+        "comments": comment_ids,
+        "password": SEED_PASSWORD,
+    }
@@ -1,9 +1,39 @@
-from src.database.core import SessionLocal
+from typing import Annotated
+
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.core import SessionLocal, ReplicaSessionLocal
+from src.metrics import sql_budget
+
+# routes that load tree of applications, reviews and comments with one query per level,
+# amount of their statements doesn't depend on amount of rows
+tree_sql_budget = sql_budget(statements=8)
 
 
 async def get_db():
-    db = SessionLocal()
-    try:
-       yield db
-    finally:
-       db.close()
+    async with SessionLocal() as db:
+        yield db
+
+
+async def get_replica_db():
+    """
+    Session of replica or None if replica is not configured
+    """
+    if ReplicaSessionLocal is None:
+        yield None
+        return
+    async with ReplicaSessionLocal() as db:
+        yield db
+
+
+async def get_read_db(request: Request,
+                      db: Annotated[AsyncSession, Depends(get_db)],
+                      replica: Annotated[AsyncSession | None, Depends(get_replica_db)]) -> AsyncSession:
+    """
+    Session for routes that only read, it reads from replica unless client has to read its own recent writes
+    Sessions connect on the first query, so the session that is not used doesn't take connection
+    """
+    if replica is None or getattr(request.state, "read_primary", False):
+        return db
+    return replica
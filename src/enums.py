@@ -12,3 +12,35 @@ class RatingGrade(Enum):
 class AccountType(Enum):
     startup = "startup"
     tester = "tester"
+
+
+class VoteTarget(Enum):
+    review = "review"
+    comment = "comment"
+
+
+class VoteAction(Enum):
+    vote = "vote"
+    unvote = "unvote"
+
+
+class ImportStatus(Enum):
+    created = "created"
+    duplicate = "duplicate"
+    exists = "exists"
+    invalid = "invalid"
+
+
+class JobStatus(Enum):
+    pending = "pending"
+    running = "running"
+    failed = "failed"
+
+
+class VoteStatus(Enum):
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+    unchanged = "unchanged"
+    user_not_found = "user_not_found"
+    target_not_found = "target_not_found"
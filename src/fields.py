@@ -0,0 +1,170 @@
+"""
+Sparse fieldsets of responses
+
+'fields' selects fields of response, nested fields are separated by dot, for example fields=name,user.username
+'expand' selects relationships that are embedded, for example expand=user,ratings.review
+Relationship is returned only if it is selected by both of them, if parameter is not passed everything is selected,
+so without parameters the whole tree is returned. Empty 'expand=' returns no relationships.
+"""
+from functools import lru_cache
+from types import UnionType
+from typing import Annotated, Union, get_args, get_origin
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, TypeAdapter, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+
+from src.responses import JSONBytesResponse, json_response, serializer
+
+# pairs of field name and selection of nested schema, None for fields that are not relationships
+Selection = tuple[tuple[str, "Selection | None"], ...]
+
+
+def paths(value: str | None) -> list[tuple[str, ...]] | None:
+    if value is None:
+        return None
+    return [tuple(path.strip().split(".")) for path in value.split(",") if path.strip()]
+
+
+def nested_schema(annotation) -> type[BaseModel] | None:
+    """
+    Find schema of relationship in annotation like ReviewFull | None or list[RatingFull]
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for argument in get_args(annotation):
+        schema = nested_schema(argument)
+        if schema is not None:
+            return schema
+    return None
+
+
+def replace_schema(annotation, old: type[BaseModel], new: type[BaseModel]):
+    if annotation is old:
+        return new
+    arguments = get_args(annotation)
+    if not arguments:
+        return annotation
+    arguments = tuple(replace_schema(argument, old, new) for argument in arguments)
+    if get_origin(annotation) in (Union, UnionType):
+        return Union[arguments]
+    return get_origin(annotation)[arguments]
+
+
+def select(schema: type[BaseModel], fields: list[tuple[str, ...]] | None,
+           expand: list[tuple[str, ...]] | None) -> Selection:
+    """
+    Resolve requested paths against response schema
+    :param schema: full response schema
+    :param fields: selected paths, None if all fields are selected
+    :param expand: expanded relationships, None if all of them are expanded
+    :return: selection, id is always selected
+    """
+    unknown = {path[0] for path in (fields or []) + (expand or [])} - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(400, detail=f"Unknown fields of {schema.__name__}: {', '.join(sorted(unknown))}")
+    scalar = {name for name, field in schema.model_fields.items() if nested_schema(field.annotation) is None}
+    invalid = {".".join(path) for path in (fields or []) + (expand or []) if len(path) > 1 and path[0] in scalar}
+    if invalid:
+        raise HTTPException(400, detail=f"Fields of {schema.__name__} have no nested fields: "
+                                        f"{', '.join(sorted(invalid))}")
+    selection = []
+    for name, field in schema.model_fields.items():
+        if fields is not None and name != "id" and all(path[0] != name for path in fields):
+            continue
+        nested = nested_schema(field.annotation)
+        if nested is None:
+            selection.append((name, None))
+            continue
+        if expand is not None and all(path[0] != name for path in expand):
+            continue
+        nested_fields = None
+        if fields is not None and (name,) not in fields:
+            nested_fields = [path[1:] for path in fields if path[0] == name]
+        nested_expand = None if expand is None else [path[1:] for path in expand if path[0] == name and path[1:]]
+        selection.append((name, select(nested, nested_fields, nested_expand)))
+    return tuple(selection)
+
+
+def sparse_fields(schema: type[BaseModel]):
+    """
+    Make dependency that reads 'fields' and 'expand' query parameters for schema
+    :return: dependency that returns selection or None if response is not sparse
+    """
+    def dependency(fields: Annotated[str | None, Query()] = None,
+                   expand: Annotated[str | None, Query()] = None) -> Selection | None:
+        if fields is None and expand is None:
+            return None
+        return select(schema, paths(fields), paths(expand))
+    return dependency
+
+
+def loading_plan(model, selection: Selection | None) -> tuple | None:
+    """
+    Loader options that load only selected columns and relationships, others raise on access
+    Properties of model are loaded from columns listed in its 'property_columns',
+    if property is not listed there all columns are loaded
+    :param model: mapped class
+    :param selection: selection of response schema of model
+    :return: loader options or None if response is not sparse
+    """
+    if selection is None:
+        return None
+    mapper = inspect(model)
+    columns = {column.key for column in mapper.primary_key}
+    load_all_columns = False
+    options = []
+    for name, nested in selection:
+        if name in mapper.relationships:
+            relationship = mapper.relationships[name]
+            loader = selectinload if relationship.uselist else joinedload
+            options.append(loader(getattr(model, name)).options(*loading_plan(relationship.mapper.class_, nested)))
+            columns.update(mapper.get_property_by_column(column).key for column in relationship.local_columns)
+        elif name in mapper.column_attrs:
+            columns.add(name)
+        elif name in getattr(model, "property_columns", {}):
+            columns.update(model.property_columns[name])
+        else:
+            load_all_columns = True
+    if not load_all_columns:
+        options.append(load_only(*(getattr(model, column) for column in columns), raiseload=True))
+    return *options, raiseload("*", sql_only=True)
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: type[BaseModel], selection: Selection) -> type[BaseModel]:
+    """
+    Make schema with selected fields only, so validation doesn't touch attributes that were not loaded
+    """
+    fields = {}
+    for name, nested in selection:
+        field = schema.model_fields[name]
+        annotation = field.annotation
+        if nested is not None:
+            nested_full = nested_schema(annotation)
+            annotation = replace_schema(annotation, nested_full, sparse_schema(nested_full, nested))
+        fields[name] = (annotation, field)
+    return create_model(schema.__name__, **fields)
+
+
+def sparse_adapter(schema: type[BaseModel], selection: Selection | None, many: bool) -> TypeAdapter:
+    """
+    Get compiled serializer of response with selected fields, full schema is used if response is not sparse
+    """
+    model = schema if selection is None else sparse_schema(schema, selection)
+    return serializer(list[model] if many else model)
+
+
+def respond(schema: type[BaseModel], selection: Selection | None, content, many: bool = False,
+            headers: dict | None = None) -> JSONBytesResponse:
+    """
+    Serialize content with selected fields only
+    :param schema: full response schema, the same as response_model of route
+    :param selection: selection from sparse_fields dependency, None if all fields are returned
+    :param content: object or list of objects loaded with loading_plan
+    :param many: if true content is list
+    :param headers: headers of response
+    :return: response with serialized content
+    """
+    return json_response(sparse_adapter(schema, selection, many), content, headers)
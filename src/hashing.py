@@ -0,0 +1,121 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from src.metrics import Histogram, histogram_lines, metric_lines
+
+# Process workers can't receive CryptContext itself, so they rebuild it from its config once per process
+_worker_contexts: dict[str, CryptContext] = {}
+
+
+def _run(context: CryptContext | str, method: str, args: tuple, submitted_at: float):
+    """
+    Function that is executed inside of worker
+    :param context: CryptContext for threads or its string config for processes
+    :param method: name of CryptContext method, hash or verify
+    :param args: arguments for method
+    :param submitted_at: time.monotonic() when task was submitted, used to measure waiting in queue
+    :return: result of method and time that task spent in queue
+    """
+    waited = time.monotonic() - submitted_at
+    if isinstance(context, str):
+        if context not in _worker_contexts:
+            _worker_contexts[context] = CryptContext.from_string(context)
+        context = _worker_contexts[context]
+    return getattr(context, method)(*args), waited
+
+
+class PasswordHasher:
+    """
+    Runs CryptContext hashing and verification in a bounded pool of workers
+    bcrypt takes hundreds of milliseconds of CPU, so calling it directly inside of route blocks the event loop
+    :param context: CryptContext that is used for hashing
+    :param executor_type: "thread" or "process"
+    :param max_workers: amount of workers in pool
+    :param max_queue_size: amount of tasks that can wait for free worker, other tasks are rejected with 503
+    """
+
+    def __init__(self, context: CryptContext, executor_type: str = "thread", max_workers: int = 4,
+                 max_queue_size: int = 64):
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Unknown executor type {executor_type}")
+        self.context = context
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._executor: Executor | None = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time = Histogram()
+
+    @property
+    def executor(self) -> Executor:
+        # Pool is created lazily, so importing of application doesn't start workers
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hasher")
+        return self._executor
+
+    async def _submit(self, method: str, *args):
+        if self.in_flight >= self.max_workers + self.max_queue_size:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server is busy, try again later", headers={"Retry-After": "1"})
+        context = self.context.to_string() if self.executor_type == "process" else self.context
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited = await loop.run_in_executor(self.executor, _run, context, method, args, time.monotonic())
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        self.wait_time.observe(waited)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._submit("verify", password, password_hash)
+
+    def stats(self) -> dict:
+        """
+        Metrics of pool
+        :return: dict with amount of tasks in flight and waiting for worker, completed and rejected tasks
+        and histogram of time spent waiting for worker
+        """
+        return {
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_time": self.wait_time.snapshot(),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def hasher_metric_lines(stats: dict) -> list[str]:
+    """
+    Stats of PasswordHasher in Prometheus text format
+    """
+    return [
+        *metric_lines("password_hasher_in_flight", "gauge", "Hashing tasks that are running or waiting",
+                      [f"password_hasher_in_flight {stats['in_flight']}"]),
+        *metric_lines("password_hasher_queued", "gauge", "Hashing tasks that wait for free worker",
+                      [f"password_hasher_queued {stats['queued']}"]),
+        *metric_lines("password_hasher_completed_total", "counter", "Hashing tasks that were done",
+                      [f"password_hasher_completed_total {stats['completed']}"]),
+        *metric_lines("password_hasher_rejected_total", "counter", "Hashing tasks that were rejected with 503",
+                      [f"password_hasher_rejected_total {stats['rejected']}"]),
+        *metric_lines("password_hasher_wait_seconds", "histogram", "Time of waiting for free worker",
+                      histogram_lines("password_hasher_wait_seconds", stats["wait_time"])),
+    ]
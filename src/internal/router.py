@@ -0,0 +1,53 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import password_hasher, principal_cache, request_metrics, response_cache
+from src.cache import cache_metric_lines
+from src.database.core import engine, replica_engine
+from src.database.pool import pool_metric_lines, pool_stats
+from src.dependencies import get_db
+from src.hashing import hasher_metric_lines
+from src.jobs import service as jobs_service
+
+# internal routes are not documented and have to be closed from public traffic by proxy
+router = APIRouter(tags=["Internal"], include_in_schema=False)
+
+
+def database_pool_stats() -> dict:
+    stats = {"primary": pool_stats(engine)}
+    if replica_engine is not None:
+        stats["replica"] = pool_stats(replica_engine)
+    return stats
+
+
+@router.get("/internal/database/pool")
+async def get_pool_stats():
+    """
+    Live state of database connection pool
+    """
+    return database_pool_stats()
+
+
+@router.get("/internal/jobs")
+async def get_job_stats(db: Annotated[AsyncSession, Depends(get_db)]):
+    """
+    Amount of jobs by status, done jobs are deleted, so they are not counted
+    """
+    return await jobs_service.count_by_status(db)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Metrics of routes, database pools, password hasher and caches in Prometheus text format
+    """
+    lines = [
+        *pool_metric_lines(database_pool_stats()),
+        *hasher_metric_lines(password_hasher.stats()),
+        *cache_metric_lines({"principal": principal_cache.stats(), "response": response_cache.stats()}),
+    ]
+    text = request_metrics.render() + "\n".join(lines) + "\n"
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
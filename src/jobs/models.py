@@ -0,0 +1,37 @@
+import datetime
+
+from sqlalchemy import JSON, Enum, Index, String, Text
+from sqlalchemy.orm import mapped_column, Mapped
+
+from src.database.core import Base, utcnow
+from src.enums import JobStatus
+
+
+class Job(Base):
+    """
+    Deferred work that is done by workers of job runner
+    :param name: name of handler that does the job
+    :param payload: keyword arguments of handler
+    :param status: pending job waits for run_at, running job is leased by worker until locked_until,
+    failed job used all attempts and is kept for inspection, done jobs are deleted
+    :param attempts: amount of started attempts
+    :param max_attempts: job fails after this amount of attempts
+    :param run_at: time in UTC after which job can be started
+    :param locked_until: time in UTC after which running job is considered lost and can be started again
+    :param last_error: error of the last failed attempt
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # workers look for the oldest due jobs
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(100))
+    payload: Mapped[dict] = mapped_column(JSON)
+    status: Mapped[JobStatus] = mapped_column(Enum(JobStatus), default=JobStatus.pending)
+    attempts: Mapped[int] = mapped_column(default=0)
+    max_attempts: Mapped[int] = mapped_column()
+    run_at: Mapped[datetime.datetime] = mapped_column(default=utcnow)
+    locked_until: Mapped[datetime.datetime | None] = mapped_column()
+    created_at: Mapped[datetime.datetime] = mapped_column(default=utcnow)
+    last_error: Mapped[str | None] = mapped_column(Text)
@@ -0,0 +1,147 @@
+"""
+Runner of deferred jobs
+
+Services enqueue jobs with jobs.service.enqueue in their own transaction, so request answers without doing
+non-critical work and the job is saved only together with changes that need it.
+Workers are tasks of application process that lease due jobs from jobs table, so jobs survive restarts
+and are shared by workers of all processes. Failed jobs are retried with exponential backoff.
+Job is started again if worker was stopped after its work was committed, so handlers have to be idempotent.
+"""
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src import config
+from src.jobs import service
+from src.jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+HandlerFunction = Callable[..., Awaitable[None]]
+
+
+class JobHandler:
+    """
+    Function that does jobs with some name
+    :param function: coroutine function that takes session and payload of job as keyword arguments
+    :param concurrency: max amount of jobs of handler that are run by process at once, None if it is not limited
+    """
+
+    def __init__(self, function: HandlerFunction, concurrency: int | None = None):
+        self.function = function
+        self.concurrency = concurrency
+        self.running = 0
+
+    def has_capacity(self) -> bool:
+        return self.concurrency is None or self.running < self.concurrency
+
+
+class JobRunner:
+    """
+    Registry of job handlers and workers that run them
+    :param lease_seconds: max time of one attempt, job is considered lost and is started again after it
+    :param poll_interval: how long idle worker waits before looking for jobs again
+    :param retry_base_seconds: delay after the first failed attempt
+    :param retry_max_seconds: max delay between attempts
+    """
+
+    def __init__(self, lease_seconds: float, poll_interval: float, retry_base_seconds: float,
+                 retry_max_seconds: float):
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.handlers: dict[str, JobHandler] = {}
+        self.workers: list[asyncio.Task] = []
+        self.claim_lock: asyncio.Lock | None = None
+
+    def handler(self, name: str, concurrency: int | None = None):
+        """
+        Register decorated function as handler of jobs with name
+        """
+        def decorator(function: HandlerFunction) -> HandlerFunction:
+            self.handlers[name] = JobHandler(function, concurrency)
+            return function
+        return decorator
+
+    async def claim(self, session_maker: async_sessionmaker[AsyncSession]) -> Job | None:
+        """
+        Lease due job of handler that is not busy
+        """
+        names = [name for name, handler in self.handlers.items() if handler.has_capacity()]
+        if not names:
+            return None
+        async with session_maker() as db:
+            job = await service.claim(db, names, self.lease_seconds)
+        if job is not None:
+            self.handlers[job.name].running += 1
+        return job
+
+    async def run(self, session_maker: async_sessionmaker[AsyncSession], job: Job):
+        """
+        Run leased job, job is deleted when it is done or scheduled for retry when it fails
+        """
+        handler = self.handlers[job.name]
+        try:
+            async with session_maker() as db:
+                async with asyncio.timeout(self.lease_seconds):
+                    await handler.function(db, **job.payload)
+                await service.complete(db, job.id)
+        except Exception as error:
+            logger.exception("Job %s %s failed, attempt %s of %s", job.id, job.name, job.attempts, job.max_attempts)
+            # session of handler can be broken by error, so failure is saved by new one
+            async with session_maker() as db:
+                await service.retry(db, job, repr(error), self.retry_base_seconds, self.retry_max_seconds)
+        finally:
+            handler.running -= 1
+
+    async def run_pending(self, session_maker: async_sessionmaker[AsyncSession]) -> int:
+        """
+        Run due jobs one by one until there are no due jobs, for tests and commands
+        :return: amount of started jobs
+        """
+        started = 0
+        while job := await self.claim(session_maker):
+            await self.run(session_maker, job)
+            started += 1
+        return started
+
+    async def work(self, session_maker: async_sessionmaker[AsyncSession]):
+        while True:
+            try:
+                # handlers of process are checked for capacity and leased by one worker at once
+                async with self.claim_lock:
+                    job = await self.claim(session_maker)
+                if job is not None:
+                    await self.run(session_maker, job)
+                    continue
+            except Exception:
+                # job that was leased stays running until its lease ends, then it is started again
+                logger.exception("Worker of jobs failed")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self, session_maker: async_sessionmaker[AsyncSession], workers: int):
+        """
+        Start workers in running event loop, it is done in app lifespan
+        """
+        self.claim_lock = asyncio.Lock()
+        self.workers = [asyncio.create_task(self.work(session_maker)) for _ in range(workers)]
+
+    async def stop(self):
+        """
+        Cancel workers, jobs that were interrupted are started again when their lease ends
+        """
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+
+job_runner = JobRunner(
+    lease_seconds=config.JOBS_LEASE_SECONDS,
+    poll_interval=config.JOBS_POLL_INTERVAL_SECONDS,
+    retry_base_seconds=config.JOBS_RETRY_BASE_SECONDS,
+    retry_max_seconds=config.JOBS_RETRY_MAX_SECONDS
+)
@@ -0,0 +1,94 @@
+import datetime
+
+from sqlalchemy import select, update, delete, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import config
+from src.database.core import utcnow
+from src.enums import JobStatus
+from src.jobs.models import Job
+
+
+def enqueue(db: AsyncSession, name: str, payload: dict, delay_seconds: float = 0,
+            max_attempts: int | None = None) -> Job:
+    """
+    Add job to session, changes are not committed
+    Job is committed together with changes of caller, so it exists only if changes that need it were saved
+    :param db: session of caller
+    :param name: name of handler
+    :param payload: keyword arguments of handler, has to be serializable to JSON
+    :param delay_seconds: job is not started before this delay
+    :param max_attempts: JOBS_MAX_ATTEMPTS by default
+    :return: added job
+    """
+    job = Job(name=name, payload=payload, max_attempts=max_attempts or config.JOBS_MAX_ATTEMPTS,
+              run_at=utcnow() + datetime.timedelta(seconds=delay_seconds))
+    db.add(job)
+    return job
+
+
+def due(now: datetime.datetime):
+    """
+    Condition of jobs that can be started: pending jobs whose time came and running jobs whose lease ended
+    """
+    return or_(and_(Job.status == JobStatus.pending, Job.run_at <= now),
+               and_(Job.status == JobStatus.running, Job.locked_until <= now))
+
+
+async def claim(db: AsyncSession, names: list[str], lease_seconds: float) -> Job | None:
+    """
+    Lease the oldest due job of handlers with one UPDATE
+    Candidate is locked with SKIP LOCKED where database supports it and UPDATE checks that it is still due,
+    so the same job is not leased by two workers
+    :param db: session to interact with db
+    :param names: names of handlers that can take job
+    :param lease_seconds: job can be started again by other worker after lease
+    :return: leased job or None if there are no due jobs
+    """
+    now = utcnow()
+    candidate = (select(Job.id)
+                 .where(Job.name.in_(names), due(now))
+                 .order_by(Job.run_at)
+                 .limit(1)
+                 .with_for_update(skip_locked=True)
+                 .scalar_subquery())
+    job = await db.scalar(
+        update(Job)
+        .where(Job.id == candidate, due(now))
+        .values(status=JobStatus.running, attempts=Job.attempts + 1,
+                locked_until=now + datetime.timedelta(seconds=lease_seconds))
+        .returning(Job)
+    )
+    await db.commit()
+    return job
+
+
+async def complete(db: AsyncSession, job_id: int):
+    await db.execute(delete(Job).filter_by(id=job_id))
+    await db.commit()
+
+
+def backoff(attempts: int, base_seconds: float, max_seconds: float) -> float:
+    """
+    Delay before the next attempt, it doubles with every failed attempt
+    """
+    return min(base_seconds * 2 ** (attempts - 1), max_seconds)
+
+
+async def retry(db: AsyncSession, job: Job, error: str, base_seconds: float, max_seconds: float):
+    """
+    Schedule the next attempt of failed job with backoff, job fails if it has no attempts left
+    """
+    values = dict(last_error=error, locked_until=None)
+    if job.attempts >= job.max_attempts:
+        values.update(status=JobStatus.failed)
+    else:
+        delay = backoff(job.attempts, base_seconds, max_seconds)
+        values.update(status=JobStatus.pending, run_at=utcnow() + datetime.timedelta(seconds=delay))
+    await db.execute(update(Job).filter_by(id=job.id).values(**values))
+    await db.commit()
+
+
+async def count_by_status(db: AsyncSession) -> dict[str, int]:
+    rows = await db.execute(select(Job.status, func.count()).group_by(Job.status))
+    return {status.value: count for status, count in rows}
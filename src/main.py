@@ -1,12 +1,25 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from src import config
+from src import config, password_hasher, request_metrics
 from src.applications import router as applications
 from src.users import router as users
 from src.auth import router as auth
 from src.reviews import router as reviews
 from src.comments import router as comments
+from src.votes import router as votes
+from src.internal import router as internal
+from src.auth.tasks import purge_refresh_tokens_periodically
+# handlers of jobs are registered when their modules are imported
+from src.applications import tasks as application_tasks
+from src.database.core import SessionLocal
+from src.jobs.runner import job_runner
+from src.responses import ORJSONResponse
+from src.database.replica import ReadYourWritesMiddleware
+from src.metrics import MetricsMiddleware
 
 
 tags_metadata = [
@@ -29,9 +42,26 @@ tags_metadata = [
     {
         "name": "Comments",
         "description": "Router for operations with comments"
+    },
+    {
+        "name": "Votes",
+        "description": "Routes for voting on reviews and comments in batches"
     }
 ]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    purge_task = asyncio.create_task(purge_refresh_tokens_periodically())
+    job_runner.start(SessionLocal, workers=config.JOBS_WORKERS)
+    yield
+    await job_runner.stop()
+    purge_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await purge_task
+    password_hasher.shutdown()
+
+
 app = FastAPI(
     title=config.API_NAME,
     contact={
@@ -41,7 +71,9 @@ app = FastAPI(
     },
     root_path="/api/v1",
     openapi_tags=tags_metadata,
-    openapi_url="/docs/" if config.SHOW_DOCUMENTATION else None
+    openapi_url="/docs/" if config.SHOW_DOCUMENTATION else None,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -52,8 +84,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=config.REPLICA_STICKY_SECONDS)
+# the last added middleware is the outermost, so it measures the whole stack
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(applications.router)
 app.include_router(reviews.router)
 app.include_router(comments.router)
+app.include_router(votes.router)
+app.include_router(internal.router)
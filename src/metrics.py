@@ -0,0 +1,334 @@
+"""
+Metrics of requests in Prometheus text format
+
+MetricsMiddleware measures latency, in-flight requests and status codes of every route,
+SQL statements of request are counted by events of engines that are passed to instrument_engine.
+Metrics are kept in process, so every worker exposes its own metrics.
+
+Every request also has SQL budget: amount of statements it can execute and amount of times it can execute
+the same statement, which usually means N+1 queries. Route can change its budget with sql_budget dependency.
+Request that exceeds budget is logged or fails, depending on budget mode.
+"""
+import bisect
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Literal
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# seconds, the same buckets are used for all durations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# label of requests that didn't match any route, so unknown paths don't make new series
+UNMATCHED_ROUTE = "<unmatched>"
+
+BudgetMode = Literal["off", "log", "raise"]
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """
+    Histogram of observed values with fixed buckets, like histogram of Prometheus
+    :param buckets: upper bounds of buckets, bucket for values above the last bound is added
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """
+        Amount of values that are less or equal to every bound, the last bound is '+Inf'
+        """
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        total = 0
+        result = []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self) -> dict:
+        return {"buckets": dict(self.cumulative()), "count": self.count, "sum": self.sum}
+
+
+class SQLBudgetExceeded(RuntimeError):
+    pass
+
+
+_PLACEHOLDER = r"(?:\?|\$\d+|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Statement without amount of parameters, so IN lists and multi-row VALUES of any length have the same shape
+    """
+    return _ROW_LIST.sub("(?)", _PLACEHOLDER_LIST.sub("(?)", statement))
+
+
+class RequestStats:
+    """
+    SQL statements executed while one request is handled
+    :param route: route of request
+    :param budget: max amount of statements, None if it is not limited
+    :param repeated_limit: max amount of executions of statement with the same shape, None if it is not limited
+    :param mode: 'off' doesn't check budget, 'log' logs when request ends, 'raise' fails statement that exceeds it
+    """
+    __slots__ = ("route", "statements", "sql_seconds", "shapes", "budget", "repeated_limit", "mode")
+
+    def __init__(self, route: str = UNMATCHED_ROUTE, budget: int | None = None, repeated_limit: int | None = None,
+                 mode: BudgetMode = "off"):
+        self.route = route
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.shapes: dict[str, int] = {}
+        self.budget = budget
+        self.repeated_limit = repeated_limit
+        self.mode = mode
+
+    def record(self, statement: str, seconds: float):
+        self.statements += 1
+        self.sql_seconds += seconds
+        if self.mode == "off":
+            return
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        if self.mode == "raise" and ((self.budget is not None and self.statements > self.budget)
+                                     or (self.repeated_limit is not None and self.shapes[shape] > self.repeated_limit)):
+            raise SQLBudgetExceeded(self.problems())
+
+    def repeated(self) -> dict[str, int]:
+        if self.repeated_limit is None:
+            return {}
+        return {shape: count for shape, count in self.shapes.items() if count > self.repeated_limit}
+
+    def problems(self) -> str | None:
+        """
+        Description of exceeded budget or None if request is within budget
+        """
+        messages = []
+        if self.budget is not None and self.statements > self.budget:
+            messages.append(f"{self.route} executed {self.statements} SQL statements, budget is {self.budget}")
+        for shape, count in self.repeated().items():
+            messages.append(f"{self.route} executed the same statement {count} times, "
+                            f"limit is {self.repeated_limit}: {shape}")
+        return "\n".join(messages) or None
+
+
+# stats of request that is handled in current task, None outside of requests
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start_time"].pop()
+    stats = current_request.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    Count statements and time of SQL of requests that are executed by engine
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.in_flight = 0
+        self.statuses: dict[int, int] = {}
+        self.sql_statements = Histogram(STATEMENT_BUCKETS)
+        self.sql_seconds = Histogram()
+
+    def observe(self, status: int, seconds: float, request: RequestStats):
+        self.latency.observe(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.sql_statements.observe(request.statements)
+        self.sql_seconds.observe(request.sql_seconds)
+
+
+def labels(**values) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(values, escaped)) + "}"
+
+
+def histogram_lines(name: str, snapshot: dict, **label_values) -> list[str]:
+    """
+    Lines of histogram series from Histogram.snapshot
+    """
+    lines = [f"{name}_bucket{labels(**label_values, le=bound)} {count}" for bound, count in snapshot["buckets"].items()]
+    lines.append(f"{name}_sum{labels(**label_values)} {snapshot['sum']}")
+    lines.append(f"{name}_count{labels(**label_values)} {snapshot['count']}")
+    return lines
+
+
+def metric_lines(name: str, metric_type: str, description: str, series: list[str]) -> list[str]:
+    return [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}", *series]
+
+
+def sql_budget(statements: int | None = None, repeated: int | None = None):
+    """
+    Make dependency that replaces default SQL budget of route
+    :param statements: max amount of statements, None keeps default
+    :param repeated: max amount of executions of the same statement, None keeps default
+    """
+    async def dependency():
+        request = current_request.get()
+        if request is None:
+            return
+        if statements is not None:
+            request.budget = statements
+        if repeated is not None:
+            request.repeated_limit = repeated
+    return dependency
+
+
+class SQLRecorder:
+    """
+    Collect SQL stats of requests that end while recorder is active, for example in tests
+    """
+
+    def __init__(self, metrics: "RequestMetrics"):
+        self.metrics = metrics
+        self.requests: list[RequestStats] = []
+
+    def __enter__(self) -> "SQLRecorder":
+        self.metrics.recorders.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.recorders.remove(self)
+
+
+class RequestMetrics:
+    """
+    Registry of stats of routes, routes are identified by method and path template
+    :param statement_budget: default max amount of SQL statements of request
+    :param repeated_statement_limit: default max amount of executions of the same statement by request
+    :param budget_mode: what to do with request that exceeds budget
+    """
+
+    def __init__(self, statement_budget: int | None = None, repeated_statement_limit: int | None = None,
+                 budget_mode: BudgetMode = "off"):
+        self.routes: dict[tuple[str, str], RouteStats] = {}
+        self.statement_budget = statement_budget
+        self.repeated_statement_limit = repeated_statement_limit
+        self.budget_mode = budget_mode
+        self.recorders: list[SQLRecorder] = []
+
+    def request(self, route: str) -> RequestStats:
+        return RequestStats(route, self.statement_budget, self.repeated_statement_limit, self.budget_mode)
+
+    def finish(self, request: RequestStats):
+        if request.mode == "log" and (problems := request.problems()):
+            logger.warning(problems)
+        for recorder in self.recorders:
+            recorder.requests.append(request)
+
+    def route(self, method: str, path: str) -> RouteStats:
+        stats = self.routes.get((method, path))
+        if stats is None:
+            stats = self.routes[(method, path)] = RouteStats()
+        return stats
+
+    def clear(self):
+        self.routes.clear()
+
+    def render(self) -> str:
+        latency, in_flight, responses, statements, sql_seconds = [], [], [], [], []
+        for (method, route), stats in sorted(self.routes.items()):
+            latency += histogram_lines("http_request_duration_seconds", stats.latency.snapshot(), method=method, route=route)
+            in_flight.append(f"http_requests_in_flight{labels(method=method, route=route)} {stats.in_flight}")
+            responses += [f"http_responses_total{labels(method=method, route=route, status=status)} {count}"
+                          for status, count in sorted(stats.statuses.items())]
+            statements += histogram_lines("http_request_sql_statements", stats.sql_statements.snapshot(),
+                                          method=method, route=route)
+            sql_seconds += histogram_lines("http_request_sql_duration_seconds", stats.sql_seconds.snapshot(),
+                                           method=method, route=route)
+        return "\n".join([
+            *metric_lines("http_request_duration_seconds", "histogram", "Latency of requests", latency),
+            *metric_lines("http_requests_in_flight", "gauge", "Requests that are being handled", in_flight),
+            *metric_lines("http_responses_total", "counter", "Responses by status code", responses),
+            *metric_lines("http_request_sql_statements", "histogram", "SQL statements per request", statements),
+            *metric_lines("http_request_sql_duration_seconds", "histogram", "Time of SQL per request", sql_seconds),
+        ]) + "\n"
+
+
+def route_of(scope: Scope) -> str:
+    """
+    Path template of route that will handle request, matched the same way as router of application does
+    """
+    partial = None
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Measure every http request and collect its SQL stats
+    :param metrics: registry where stats are saved
+    """
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = route_of(scope)
+        stats = self.metrics.route(scope["method"], route)
+        request = self.metrics.request(route)
+        token = current_request.set(request)
+        # status stays 500 if application fails before response is started
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            stats.in_flight -= 1
+            current_request.reset(token)
+            stats.observe(status, time.perf_counter() - start, request)
+            self.metrics.finish(request)
@@ -0,0 +1,83 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import Select, or_, and_
+
+from src import config
+
+
+def encode_cursor(**position) -> str:
+    """
+    Make opaque cursor that points to the last item of page
+    :param position: values of ordering columns of the last item on page
+    :return: urlsafe string that can be passed back as 'after'
+    """
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, ranked: bool = False) -> dict:
+    """
+    Get position of the last seen item from cursor
+    :param cursor: string created by encode_cursor
+    :param ranked: if true cursor has to contain rank of the last seen item
+    :return: dict with id and optionally rank of the last seen item
+    """
+    invalid_cursor = HTTPException(400, detail="Invalid cursor")
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        raise invalid_cursor
+    if not isinstance(position, dict) or not isinstance(position.get("id"), int):
+        raise invalid_cursor
+    if ranked and not isinstance(position.get("rank"), (int, float)):
+        raise invalid_cursor
+    return position
+
+
+def page_size(limit: int | None) -> int:
+    if not limit:
+        return config.DEFAULT_PAGE_SIZE
+    return min(limit, config.MAX_PAGE_SIZE)
+
+
+def paginate(query: Select, id_column, limit: int | None, after: str | None, rank=None) -> Select:
+    """
+    Apply keyset pagination to query
+    Rows are ordered by id, so the next page starts right after the last seen id and uses primary key index
+    If rank is passed rows are ordered by rank from the most relevant and id is used to break ties
+    One extra row is requested to know if there is next page
+    :param query: select statement
+    :param id_column: column that is used for ordering, usually primary key
+    :param limit: requested page size, it is limited by MAX_PAGE_SIZE
+    :param after: cursor from previous page
+    :param rank: expression of relevance, query has to select it right after item
+    :return: select statement for one page
+    """
+    if rank is None:
+        if after:
+            query = query.filter(id_column > decode_cursor(after)["id"])
+        return query.order_by(id_column).limit(page_size(limit) + 1)
+    if after:
+        position = decode_cursor(after, ranked=True)
+        query = query.filter(or_(rank < position["rank"], and_(rank == position["rank"], id_column > position["id"])))
+    return query.order_by(rank.desc(), id_column).limit(page_size(limit) + 1)
+
+
+def split_page(items: list, limit: int | None, ranked: bool = False) -> tuple[list, str | None]:
+    """
+    Cut extra row requested by paginate
+    :param items: rows of query, for ranked query it is pairs of item and its rank
+    :param limit: requested page size
+    :param ranked: if true query was paginated with rank
+    :return: items of page and cursor for the next page or None if it is the last page
+    """
+    size = page_size(limit)
+    has_next = len(items) > size
+    items = items[:size]
+    if ranked:
+        next_cursor = encode_cursor(id=items[-1][0].id, rank=items[-1][1]) if has_next else None
+        return [item for item, rank in items], next_cursor
+    return items, encode_cursor(id=items[-1].id) if has_next else None
@@ -0,0 +1,42 @@
+"""
+Fast path of JSON responses
+
+By default FastAPI validates returned objects against response_model, converts them to python objects
+and encodes them with json module. For big lists most of the time is spent there,
+so list routes validate and dump content with TypeAdapter that is compiled once and writes JSON bytes directly.
+Other routes use orjson instead of json module.
+"""
+from functools import lru_cache
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+__all__ = ["ORJSONResponse", "JSONBytesResponse", "serializer", "dump", "json_response"]
+
+
+class JSONBytesResponse(Response):
+    """
+    Response with content that is already serialized to JSON
+    """
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=256)
+def serializer(annotation) -> TypeAdapter:
+    """
+    Compile TypeAdapter for response type once, it is reused by every request
+    :param annotation: type of response, for example list[ApplicationFull]
+    """
+    return TypeAdapter(annotation)
+
+
+def dump(adapter: TypeAdapter, content) -> bytes:
+    """
+    Validate ORM objects against response type and dump them to JSON bytes
+    """
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def json_response(adapter: TypeAdapter, content, headers: dict | None = None) -> JSONBytesResponse:
+    return JSONBytesResponse(content=dump(adapter, content), headers=headers)
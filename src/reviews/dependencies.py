@@ -1,35 +1,75 @@
 from typing import Annotated
 
-from fastapi import Depends, Path, HTTPException, Body
-from sqlalchemy.orm import Session
-from src.dependencies import get_db
+from fastapi import Depends, Path, HTTPException, Body, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.dependencies import get_db, get_read_db
 from src.reviews import service, models
 from src.comments.schemas import VoteCreate
+from src.fields import Selection, sparse_fields, loading_plan
+from src import conditional
+from src.reviews.schemas import ReviewFull
 from src.users import service as user_service
 
 
-async def get_review_by_id(db: Annotated[Session, Depends(get_db)], review_id: Annotated[int, Path()]):
-    review = service.get(db, review_id)
+async def get_review_by_id(db: Annotated[AsyncSession, Depends(get_db)], review_id: Annotated[int, Path()]):
+    review = await service.get(db, review_id)
+    if not review:
+        raise HTTPException(404, detail=f"There is no review with id {review_id}")
+    return review
+
+
+async def get_existing_review_id(db: Annotated[AsyncSession, Depends(get_db)],
+                                 review_id: Annotated[int, Path()]) -> int:
+    """
+    Id of review that is not deleted, for routes that only need review to exist
+    """
+    if not await service.exists(db, review_id):
+        raise HTTPException(404, detail=f"There is no review with id {review_id}")
+    return review_id
+
+
+review_fields = sparse_fields(ReviewFull)
+
+
+async def check_review_modified(
+        request: Request,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        review_id: Annotated[int, Path()]) -> dict:
+    version = await service.get_version(db, review_id)
+    if not version:
+        raise HTTPException(404, detail=f"There is no review with id {review_id}")
+    return conditional.check(request, tuple(version))
+
+
+async def get_sparse_review_by_id(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        review_id: Annotated[int, Path()],
+        selection: Annotated[Selection | None, Depends(review_fields)],
+        validators: Annotated[dict, Depends(check_review_modified)]):
+    """
+    Load review with selected fields, unchanged review is answered with 304 before it is loaded
+    """
+    review = await service.get(db, review_id, loading_plan(models.Review, selection))
     if not review:
         raise HTTPException(404, detail=f"There is no review with id {review_id}")
     return review
 
 
 async def vote_review(
-        db: Annotated[Session, Depends(get_db)],
-        review: Annotated[models.Review, Depends(get_review_by_id)],
+        db: Annotated[AsyncSession, Depends(get_db)],
+        review_id: Annotated[int, Depends(get_existing_review_id)],
         votes_data: Annotated[VoteCreate, Body()]):
-    user = user_service.get(db, votes_data.user_id)
+    user = await user_service.get(db, votes_data.user_id)
     if not user:
         raise HTTPException(404, detail=f"User with id {votes_data.user_id} is not found")
-    return service.vote(db, votes_data, review.id)
+    return await service.vote(db, votes_data, review_id)
     
 
 async def unvote_review(
-        db: Annotated[Session, Depends(get_db)],
-        comment: Annotated[models.Comment, Depends(get_review_by_id)],
+        db: Annotated[AsyncSession, Depends(get_db)],
+        review_id: Annotated[int, Depends(get_existing_review_id)],
         votes_data: Annotated[VoteCreate, Body()]):
-    user = user_service.get(db, votes_data.user_id)
+    user = await user_service.get(db, votes_data.user_id)
     if not user:
         raise HTTPException(404, detail=f"User with id {votes_data.user_id} is not found")
-    return service.unvote(db, votes_data, comment.id)
+    return await service.unvote(db, votes_data, review_id)
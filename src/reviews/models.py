@@ -1,19 +1,21 @@
 import datetime
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, String, UniqueConstraint
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
 from src.comments.models import Comment
-from src.database.core import Base
+from src.database.core import Base, Versioned
 
 
-class Review(Base):
+class Review(Versioned, Base):
     """
     Review from user that tested application
     After tests users can write review where describe what did satisfy them and what not
     :param title: Summarized info about review
     :param body: main content of review
     :param date_created: date when review was created
+    :param votes_positive: amount of positive votes, maintained by vote and unvote services
+    :param votes_negative: amount of negative votes, maintained by vote and unvote services
     """
     __tablename__ = "reviews"
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -21,6 +23,8 @@ class Review(Base):
     body: Mapped[str] = mapped_column(String(1000))
     date_created: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now())
     deleted: Mapped[bool] = mapped_column(default=False)
+    votes_positive: Mapped[int] = mapped_column(default=0, server_default="0")
+    votes_negative: Mapped[int] = mapped_column(default=0, server_default="0")
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     user: Mapped["User"] = relationship(back_populates="reviews")
 
@@ -28,14 +32,6 @@ class Review(Base):
     reviews_votes: Mapped[list["ReviewVotes"]] = relationship(back_populates="review")
     comments: Mapped[list["Comment"]] = relationship(back_populates="review")
 
-    @property
-    def votes_positive(self):
-        return len([vote for vote in self.reviews_votes if vote.vote_type is True])
-
-    @property
-    def votes_negative(self):
-        return len([vote for vote in self.reviews_votes if vote.vote_type is False])
-
 
 class ReviewVotes(Base):
     """
@@ -44,6 +40,10 @@ class ReviewVotes(Base):
     :param vote_type: if true user supports review
     """
     __tablename__ = "review_votes"
+    __table_args__ = (
+        # user can vote only once for review, index is also used for counting votes of review
+        UniqueConstraint("review_id", "user_id", name="uq_review_votes_review_id_user_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     vote_type: Mapped[bool] = mapped_column()
 
@@ -1,70 +1,108 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Security, Body
+from fastapi import APIRouter, Depends, HTTPException, Security, Body, Path, Request
 
 from src.comments.schemas import CommentFull
-from sqlalchemy.orm import Session
-from src.dependencies import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import response_cache
+from src.cache import row_tags
+from src.dependencies import get_db, get_read_db, tree_sql_budget
 from src.reviews import models, service
-from src.reviews.dependencies import get_review_by_id, vote_review, unvote_review
-from src.users import models as user_models
+from src.reviews.dependencies import (get_review_by_id, get_sparse_review_by_id, vote_review, unvote_review,
+                                      review_fields, check_review_modified)
+from src.batch import BatchItem, batch_ids, respond_batch
+from src.fields import Selection, loading_plan, respond
+from src.responses import serializer, json_response
 from src.auth.dependencies import get_current_user
+from src.auth.schemas import Principal
 from src.reviews.schemas import ReviewFull, ReviewBase, ReviewUpdate
 from src.comments.schemas import VoteCreate
 from src.comments.dependencies import create_comment, get_comment_by_id
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
-
-@router.get("/{review_id}", response_model=ReviewFull)
-async def get_review_by_id(
-        review: Annotated[models.Review, Depends(get_review_by_id)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
-    return review
+comments_serializer = serializer(list[CommentFull])
+
+
+@router.get("/batch", response_model=list[BatchItem[ReviewFull]], dependencies=[Depends(tree_sql_budget)])
+async def get_reviews_by_ids(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        ids: Annotated[list[int], Depends(batch_ids)],
+        selection: Annotated[Selection | None, Depends(review_fields)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Get reviews by comma separated ids with one query, items are returned in requested order
+    Fields of response can be limited with 'fields' and 'expand' parameters
+    """
+    reviews = await service.get_many(db, ids, loading_plan(models.Review, selection))
+    return respond_batch(ReviewFull, selection, ids, reviews)
+
+
+@router.get("/{review_id}", response_model=ReviewFull, dependencies=[Depends(tree_sql_budget)])
+async def get_review(
+        review: Annotated[models.Review, Depends(get_sparse_review_by_id)],
+        selection: Annotated[Selection | None, Depends(review_fields)],
+        validators: Annotated[dict, Depends(check_review_modified)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Fields of response can be limited with 'fields' and 'expand' parameters
+    Response has ETag and Last-Modified, request with If-None-Match or If-Modified-Since is answered with 304
+    if review and its comments didn't change
+    """
+    return respond(ReviewFull, selection, review, headers=validators)
 
 
 @router.patch("/{review_id}", response_model=ReviewFull)
 async def update_review(
-        db: Annotated[Session, Depends(get_db)],
+        db: Annotated[AsyncSession, Depends(get_db)],
         review: Annotated[models.Review, Depends(get_review_by_id)],
         review_data: Annotated[ReviewUpdate, Body()],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     if review.user_id != current_user.id:
         raise HTTPException(status_code=401, detail="Review was created by another user")
-    return service.update(db, review_data, review.id)
+    return await service.update(db, review_data, review.id)
 
 
-@router.get("/{review_id}/comments", response_model=list[CommentFull])
+@router.get("/{review_id}/comments", response_model=list[CommentFull], dependencies=[Depends(tree_sql_budget)])
 async def get_review_comments(
-        db: Annotated[Session, Depends(get_db)],
-        review: Annotated[models.Review, Depends(get_review_by_id)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
-    return review.comments
+        request: Request,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        review_id: Annotated[int, Path()],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    """
+    Responses are cached until review or any of its comments is changed
+    """
+    entry = response_cache.entry(request, current_user.account_type.value)
+    if cached := await entry.get():
+        return cached
+    review = await get_review_by_id(db, review_id)
+    tags = [*row_tags(models.Review, [review.id]), *row_tags(models.Comment, [comment.id for comment in review.comments])]
+    return await entry.store(json_response(comments_serializer, review.comments), tags)
 
 
 @router.post("/{review_id}/comments", response_model=CommentFull, status_code=201)
 async def create_comment(
         comment: Annotated[models.Comment, Depends(create_comment)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     return comment
 
 
 @router.get("/{comment_id}/", response_model=CommentFull)
 async def get_comment_by_id(
     comment: Annotated[CommentFull, Depends(get_comment_by_id)],
-    current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+    current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     return comment
 
 
 @router.post("/{review_id}/votes", response_model=VoteCreate, status_code=201)
 async def create_vote_on_review(
         vote: Annotated[models.ReviewVotes, Depends(vote_review)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     return vote
 
 
 @router.delete("/{review_id}/votes", status_code=204)
 async def delete_vote_on_review(
         vote: Annotated[None, Depends(unvote_review)],
-        current_user: Annotated[user_models.User, Security(get_current_user, scopes=["read-applications"])]):
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
     return None
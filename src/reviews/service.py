@@ -1,43 +1,91 @@
-from src.database.core import SessionLocal
+from sqlalchemy import select, func, false
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, raiseload
+
+from src import response_cache
 from src.reviews import models
+from src.comments.models import Comment
 from src.reviews.schemas import ReviewBase
+from src.comments.service import comment_full_options
+from src.votes.counters import write_vote, delete_vote, reconcile_counters
 from src.comments.schemas import VoteCreate
 
-from sqlalchemy.orm import Session
+
+def review_full_options():
+    """
+    Loading plan of ReviewFull
+    AsyncSession can't load relationships lazily, so comments are loaded with the query
+    Relationships that are not in plan raise on access instead of emitting lazy query
+    """
+    return (
+        selectinload(models.Review.comments).options(*comment_full_options()),
+        raiseload("*", sql_only=True)
+    )
+
+
+async def get(db: AsyncSession, review_id: int, options: tuple | None = None):
+    query = select(models.Review).filter_by(id=review_id).options(*(options or review_full_options()))
+    return await db.scalar(query)
+
+
+async def exists(db: AsyncSession, review_id: int) -> bool:
+    """
+    Check that review is not deleted without loading it and its comments
+    """
+    query = select(models.Review.id).where(models.Review.id == review_id, models.Review.deleted == false())
+    return await db.scalar(query) is not None
+
+
+async def get_many(db: AsyncSession, review_ids: list[int], options: tuple | None = None) -> list[models.Review]:
+    """
+    Select reviews by ids with one query, order of ids is not kept
+    """
+    query = select(models.Review).filter(models.Review.id.in_(set(review_ids))).options(*(options or review_full_options()))
+    return (await db.scalars(query)).all()
+
+
+def comments_version_columns():
+    """
+    Aggregates of versions of comments joined to review
+    Versions only grow and comments are never removed, so aggregates change with every change of comments
+    """
+    return (func.count(Comment.id), func.sum(Comment.version), func.max(Comment.updated_at))
 
 
-def get(db: Session, review_id: int):
-    return db.query(models.Review).filter_by(id=review_id).first()
+async def get_version(db: AsyncSession, review_id: int) -> tuple | None:
+    """
+    Select versions of review and its comments without loading them
+    :return: versions and times of change or None if review doesn't exist
+    """
+    query = (select(models.Review.version, models.Review.updated_at, *comments_version_columns())
+             .outerjoin(Comment, Comment.review_id == models.Review.id)
+             .where(models.Review.id == review_id)
+             .group_by(models.Review.id))
+    return (await db.execute(query)).first()
 
 
-def update(db: Session, review_data: ReviewBase, review_id: int):
-    review = get(db, review_id)
+async def update(db: AsyncSession, review_data: ReviewBase, review_id: int):
+    review = await get(db, review_id)
     if review_data.title:
         review.title = review_data.title
     if review_data.body:
         review.body = review_data.body
+    review.bump_version()
     db.add(review)
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate_rows(models.Review, review_id)
     return review
 
 
-def vote_exist(db: Session, votes_data: VoteCreate, review_id: int) -> bool:
-    vote = db.query(models.ReviewVotes).filter_by(user_id=votes_data.user_id, review_id=review_id).first()
-    return vote
+async def vote(db: AsyncSession, votes_data: VoteCreate, review_id: int):
+    return await write_vote(db, models.Review, models.ReviewVotes, models.ReviewVotes.review_id,
+                            review_id, votes_data)
 
 
-def vote(db: Session, votes_data: VoteCreate, review_id: int):
-    vote = vote_exist(db, votes_data, review_id)
-    if vote:
-        vote.vote_type = votes_data.vote_type
-    else:
-        vote = models.ReviewVotes(vote_type=votes_data.vote_type, review_id=review_id, user_id=votes_data.user_id)
-    db.add(vote)
-    db.commit()
-    return vote
+async def unvote(db: AsyncSession, votes_data: VoteCreate, review_id: int):
+    await delete_vote(db, models.Review, models.ReviewVotes, models.ReviewVotes.review_id,
+                      review_id, votes_data.user_id)
 
 
-def unvote(db: Session, votes_data: VoteCreate, review_id: int):
-    vote = vote_exist(db, votes_data, review_id)
-    db.delete(vote)
-    db.commit()
+async def reconcile_votes(db: AsyncSession) -> int:
+    return await reconcile_counters(db, models.Review, models.ReviewVotes, models.ReviewVotes.review_id)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -8,9 +10,48 @@ class BaseConfig(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
     SQLALCHEMY_DATABASE_URI: str
+    # GET requests read from replica if it is set
+    SQLALCHEMY_REPLICA_DATABASE_URI: str | None = None
+    REPLICA_STICKY_SECONDS: int = 10
     ACCESS_TOKEN_TYPE: str = "access"
     REFRESH_TOKEN_TYPE: str = "refresh"
     SHOW_DOCUMENTATION: bool = False
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 100
+    PASSWORD_HASHER_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHER_WORKERS: int = 4
+    PASSWORD_HASHER_QUEUE_SIZE: int = 64
+    REFRESH_TOKEN_PURGE_INTERVAL_SECONDS: int = 3600
+    REFRESH_TOKEN_PURGE_BATCH_SIZE: int = 1000
+    REFRESH_TOKEN_PURGE_MAX_ROWS_PER_SECOND: int = 5000
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: Literal["memory", "shared"] = "memory"
+    RESPONSE_CACHE_URL: str | None = None
+    RESPONSE_CACHE_TTL_SECONDS: int = 30
+    RESPONSE_CACHE_SIZE: int = 10000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SQL_STATEMENT_BUDGET: int = 20
+    SQL_REPEATED_STATEMENT_LIMIT: int = 5
+    SQL_BUDGET_MODE: Literal["off", "log", "raise"] = "log"
+    EXPORT_CHUNK_SIZE: int = 1000
+    IMPORT_CHUNK_SIZE: int = 500
+    MAX_BATCH_SIZE: int = 100
+    # votes are written with bulk statements, so batch of votes can be larger than batch of ids
+    VOTE_BATCH_SIZE: int = 1000
+    # 0 workers disables running of jobs in this process, jobs stay in the table for other processes
+    JOBS_WORKERS: int = 2
+    JOBS_POLL_INTERVAL_SECONDS: float = 1
+    JOBS_LEASE_SECONDS: int = 300
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: float = 5
+    JOBS_RETRY_MAX_SECONDS: float = 600
     model_config = SettingsConfigDict(env_file="../.env", extra="allow")
 
 
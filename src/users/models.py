@@ -1,11 +1,11 @@
-from sqlalchemy import String, Enum
+from sqlalchemy import String, Enum, Index, false
 from sqlalchemy.orm import mapped_column, Mapped, relationship
-from src import pwd_context
-from src.database.core import Base
+from src import password_hasher
+from src.database.core import Base, Versioned
 from src.enums import AccountType
 
 
-class User(Base):
+class User(Versioned, Base):
     """
     User if person who use forum
     There are two types of account: for startup and for testers
@@ -15,10 +15,11 @@ class User(Base):
     :param description: some words about user
     :param deleted: If True, user have deleted account
     :param account_type: can be startup or tester
+    Version of user is a part of versions of applications that embed their owner
     """
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(primary_key=True)
-    email: Mapped[str] = mapped_column(nullable=False)
+    email: Mapped[str] = mapped_column(nullable=False, index=True)
     username: Mapped[str] = mapped_column(unique=True, nullable=False)
     password: Mapped[str] = mapped_column(nullable=False)
     description: Mapped[str] = mapped_column(String(200), nullable=True)
@@ -33,5 +34,9 @@ class User(Base):
     comments_votes: Mapped[list["CommentVotes"]] = relationship(back_populates="user")
     ratings: Mapped[list["Rating"]] = relationship(back_populates="user")
 
-    def check_password_hash(self, password: str):
-        return pwd_context.verify(password, self.password)
+    async def check_password_hash(self, password: str):
+        return await password_hasher.verify(password, self.password)
+
+
+# keyset pagination of users that are not deleted
+Index("ix_users_active_id", User.id, postgresql_where=User.deleted == false(), sqlite_where=User.deleted == false())
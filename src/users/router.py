@@ -1,18 +1,29 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Security, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src import config
 from src.database.core import SessionLocal
 from src.users import models
+from src.applications import models as application_models
 from src.applications.schemas import ApplicationFull
-from src.users.dependencies import get_user_by_id, get_db, create_user as create_user_in_db, update_user
+from src.applications.dependencies import application_fields
+from src.fields import Selection, loading_plan, respond
+from src.responses import serializer, json_response
+from src.users.dependencies import get_user_by_id, get_db, create_user as create_user_in_db, update_user, \
+    get_current_user_from_db
+from src.dependencies import get_read_db, tree_sql_budget
 from src.auth.dependencies import get_current_user
+from src.auth.schemas import Principal
 from src.users.schemas import UserFull, UserUpdate, BaseUser, UserSearch
 from src.users import service
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+users_serializer = serializer(list[UserFull])
+
 
 @router.post("/", response_model=BaseUser, status_code=201)
 async def create_user(user: Annotated[models.User, Depends(create_user_in_db)]):
@@ -25,49 +36,78 @@ async def create_user(user: Annotated[models.User, Depends(create_user_in_db)]):
 
 
 @router.get("/", response_model=list[UserFull])
-async def get_all_users(current_user: Annotated[models.User, Security(get_current_user, scopes=["users"])],
-                        db: Annotated[Session, Depends(get_db)],
+async def get_all_users(current_user: Annotated[Principal, Security(get_current_user, scopes=["users"])],
+                        db: Annotated[AsyncSession, Depends(get_read_db)],
                         search_pattern: Annotated[UserSearch, Query()]):
-    return service.get_all(db, search_pattern)
+    """
+    Get page of users, cursor for the next page is returned in 'X-Next-Cursor' header
+    """
+    users, next_cursor = await service.get_all(db, search_pattern)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(users_serializer, users, headers)
 
 
 @router.get("/{user_id}", response_model=UserFull | None)
 async def get_user(
-        current_user: Annotated[models.User, Security(get_current_user, scopes=["users"])], 
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["users"])], 
         requested_user: Annotated[models.User, Depends(get_user_by_id)]):
     return requested_user
 
 
-@router.get("/me/applications/", response_model=list[ApplicationFull])
+@router.get("/me/applications/", response_model=list[ApplicationFull], dependencies=[Depends(tree_sql_budget)])
 async def get_applications_of_current_user(
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[models.User, Security(get_current_user, scopes=["users", "read-applications"])]):
-    return current_user.applications
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        selection: Annotated[Selection | None, Depends(application_fields)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["users", "read-applications"])]):
+    """
+    Fields of response can be limited with 'fields' and 'expand' parameters
+    """
+    applications = await service.get_applications(
+        db, current_user.id, loading_plan(application_models.Application, selection))
+    return respond(ApplicationFull, selection, applications, many=True)
+
+
+@router.get("/me/applications/export", response_class=StreamingResponse)
+async def export_applications_of_current_user(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["users", "read-applications"])]):
+    """
+    Export applications of current user with their ratings, reviews and comments as NDJSON
+    Every line is one record: application, rating, review or comment, they are linked by ids.
+    Response is streamed, so export of any size uses the same amount of memory
+    """
+    return StreamingResponse(service.export_applications(db, current_user.id, config.EXPORT_CHUNK_SIZE),
+                             media_type="application/x-ndjson")
 
 
-@router.get("/{user_id}/applications/", response_model=list[ApplicationFull])
+@router.get("/{user_id}/applications/", response_model=list[ApplicationFull], dependencies=[Depends(tree_sql_budget)])
 async def get_applications_of_specific_user(
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[models.User, Security(get_current_user, scopes=["users", "read-applications"])],
-        requested_user: Annotated[models.User, Depends(get_user_by_id)]):
-    return requested_user.applications
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["users", "read-applications"])],
+        requested_user: Annotated[models.User, Depends(get_user_by_id)],
+        selection: Annotated[Selection | None, Depends(application_fields)]):
+    """
+    Fields of response can be limited with 'fields' and 'expand' parameters
+    """
+    applications = await service.get_applications(
+        db, requested_user.id, loading_plan(application_models.Application, selection))
+    return respond(ApplicationFull, selection, applications, many=True)
 
 
 @router.get("/me/", response_model=UserFull)
-async def get_me(
-        current_user: Annotated[models.User, Security(get_current_user, scopes=["me"])]):
+async def get_me(current_user: Annotated[models.User, Depends(get_current_user_from_db)]):
     return current_user
 
 
 @router.delete("/me/", status_code=204)
 async def delete_user(
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[models.User, Security(get_current_user, scopes=["me"])]):
-    service.delete(db, current_user.id)
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["me"])]):
+    await service.delete(db, current_user.id)
 
 
 @router.patch("/me/", response_model=UserFull)
 async def update_user_route(
-        db: Annotated[Session, Depends(get_db)],
+        db: Annotated[AsyncSession, Depends(get_db)],
         updated_user: Annotated[models.User, Depends(update_user)]):
     return updated_user
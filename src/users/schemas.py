@@ -1,4 +1,4 @@
-from pydantic import BaseModel, constr, EmailStr
+from pydantic import BaseModel, constr, conint, EmailStr
 
 from src.enums import AccountType
 
@@ -22,6 +22,8 @@ class UserSearch(BaseUser):
     username: str | None = None
     email: str | None = None
     account_type: AccountType | None = None
+    limit: conint(ge=1) | None = None
+    after: str | None = None
 
 
 class UserUpdate(BaseModel):
@@ -1,12 +1,29 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from collections.abc import AsyncIterator
 
-from src import pwd_context
+import orjson
+from sqlalchemy import Select, or_, select, false
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+
+from src import password_hasher, principal_cache, response_cache
+from src.pagination import paginate, split_page
 from src.users import models
+from src.applications import models as application_models
+from src.applications.service import application_full_options
+from src.comments.models import Comment
+from src.reviews.models import Review
 from src.users.schemas import UserUpdate, UserSearch, UserCreate
 
 
-def create(db: Session, user: UserCreate):
+def user_full_options():
+    """
+    Loading plan of UserFull
+    UserFull has no relationships, so all of them raise on access instead of emitting lazy query
+    """
+    return (raiseload("*", sql_only=True),)
+
+
+async def create(db: AsyncSession, user: UserCreate):
     """
     Create user and save it to base
     :param db: session to interact with db
@@ -15,50 +32,124 @@ def create(db: Session, user: UserCreate):
     """
     user = models.User(
         username=user.username,
-        password=pwd_context.hash(user.password),
+        password=await password_hasher.hash(user.password),
         email=user.email,
         account_type=user.account_type
     )
     db.add(user)
-    db.commit()
+    await db.commit()
     return user
 
 
-def get_all(db: Session, queryset: UserSearch):
-    query = db.query(models.User).filter_by(deleted=False)
+async def get_all(db: AsyncSession, queryset: UserSearch):
+    """
+    Get one page of users that match search
+    :param db: session to interact with db
+    :param queryset: search filters and pagination parameters
+    :return: users of page and cursor for the next page
+    """
+    # literal false matches predicate of partial index ix_users_active_id
+    query = select(models.User).filter(models.User.deleted == false()).options(*user_full_options())
     if queryset.username:
         query = query.filter(models.User.username.like(f"%{queryset.username}%"))
     if queryset.email:
         query = query.filter(models.User.email.like(f"%{queryset.email}%"))
     if queryset.account_type:
         query = query.filter(models.User.account_type == queryset.account_type)
-    return query.all()
+    query = paginate(query, models.User.id, queryset.limit, queryset.after)
+    return split_page((await db.scalars(query)).all(), queryset.limit)
 
 
-def exists(db: Session, username, email):
-    user = db.query(models.User).filter(or_(models.User.username==username, models.User.email==email)).all()
+async def exists(db: AsyncSession, username, email):
+    query = select(models.User).filter(or_(models.User.username==username, models.User.email==email))
+    user = (await db.scalars(query)).all()
     return bool(user)
 
 
-def get(db: Session, user_id: int) -> models.User:
-    return db.query(models.User).filter_by(id=user_id, deleted=False).first()
+async def get(db: AsyncSession, user_id: int) -> models.User:
+    query = select(models.User).filter_by(id=user_id, deleted=False).options(*user_full_options())
+    return (await db.scalars(query)).first()
+
+
+async def get_applications(db: AsyncSession, user_id: int, options: tuple | None = None):
+    query = (select(application_models.Application)
+             .filter_by(user_id=user_id, deleted=False)
+             .options(*(options or application_full_options())))
+    return (await db.scalars(query)).all()
+
+
+def export_queries(user_id: int) -> list[tuple[str, Select]]:
+    """
+    Queries of export of user's applications, one per type of exported record
+    Every query selects plain columns, so rows are not kept in identity map of session
+    """
+    Application, Rating = application_models.Application, application_models.Rating
+    applications = (select(Application.id, Application.name, Application.description, Application.date_created,
+                           Application.hide_reviews, Application.rating_count, Application.rating_sum,
+                           Application.updated_at)
+                    .where(Application.user_id == user_id, Application.deleted == false())
+                    .order_by(Application.id))
+    ratings = (select(Rating.id, Rating.application_id, Rating.grade, Rating.user_id, Rating.review_id)
+               .join(Application, Application.id == Rating.application_id)
+               .where(Application.user_id == user_id, Application.deleted == false(), Rating.deleted == false())
+               .order_by(Rating.application_id, Rating.id))
+    reviews = (select(Review.id, Rating.id.label("rating_id"), Rating.application_id, Review.title, Review.body,
+                      Review.date_created, Review.user_id, Review.votes_positive, Review.votes_negative,
+                      Review.updated_at)
+               .join(Rating, Rating.review_id == Review.id)
+               .join(Application, Application.id == Rating.application_id)
+               .where(Application.user_id == user_id, Application.deleted == false(), Rating.deleted == false(),
+                      Review.deleted == false())
+               .order_by(Rating.application_id, Review.id))
+    comments = (select(Comment.id, Comment.review_id, Comment.text, Comment.user_id, Comment.votes_positive,
+                       Comment.votes_negative, Comment.updated_at)
+                .join(Rating, Rating.review_id == Comment.review_id)
+                .join(Application, Application.id == Rating.application_id)
+                .where(Application.user_id == user_id, Application.deleted == false(), Rating.deleted == false(),
+                       Comment.deleted == false())
+                .order_by(Comment.review_id, Comment.id))
+    return [("application", applications), ("rating", ratings), ("review", reviews), ("comment", comments)]
+
+
+async def export_applications(db: AsyncSession, user_id: int, chunk_size: int) -> AsyncIterator[bytes]:
+    """
+    Stream applications of user with their ratings, reviews and comments as NDJSON
+    Every line is one record with 'type' key, records reference each other by ids.
+    Rows are fetched with server-side cursor, so memory doesn't depend on amount of exported rows
+    :param db: session to interact with db, it is closed when stream ends
+    :param user_id: id of owner of applications
+    :param chunk_size: amount of rows that are fetched and sent at once
+    :return: chunks of NDJSON
+    """
+    # session of request is closed before streaming response is sent, so the stream keeps session open by itself
+    async with db:
+        for record_type, query in export_queries(user_id):
+            result = await db.stream(query.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                yield b"".join(orjson.dumps({"type": record_type, **row._mapping}) + b"\n" for row in rows)
 
 
-def delete(db: Session, user_id: int) -> None:
-    user = get(db, user_id)
+async def delete(db: AsyncSession, user_id: int) -> None:
+    user = await get(db, user_id)
     user.deleted = True
+    user.bump_version()
     db.add(user)
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
+    await response_cache.invalidate_rows(models.User, user_id)
 
 
-def update(db: Session, user_id: int, update_scheme: UserUpdate) -> models.User:
-    user = get(db, user_id)
+async def update(db: AsyncSession, user_id: int, update_scheme: UserUpdate) -> models.User:
+    user = await get(db, user_id)
     if update_scheme.username:
         user.username = update_scheme.username
     if update_scheme.email:
         user.email = update_scheme.email
     if update_scheme.description:
         user.description = update_scheme.description
+    user.bump_version()
     db.add(user)
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
+    await response_cache.invalidate_rows(models.User, user_id)
     return user
@@ -0,0 +1,135 @@
+"""
+Vote counters of reviews and comments
+
+Votes of both are stored the same way: vote model with foreign key to voted row and unique vote per user,
+counters of positive and negative votes on voted row, so helpers take models as arguments.
+"""
+from sqlalchemy import select, func, or_, delete as sql_delete, update as sql_update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import response_cache
+from src.cache import table_tag
+from src.comments.schemas import VoteCreate
+
+
+DIALECT_INSERT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def vote_counter_changes(model, old_vote_type: bool | None, new_vote_type: bool | None) -> dict:
+    """
+    Values for UPDATE of vote counters, counters are changed by database, so concurrent votes are not lost
+    :param model: Comment or Review
+    :param old_vote_type: type of vote before change, None if user didn't vote
+    :param new_vote_type: type of vote after change, None if vote was removed
+    :return: dict with changed counters, empty if vote type didn't change
+    """
+    changes = {}
+    if old_vote_type == new_vote_type:
+        return changes
+    for vote_type, delta in ((old_vote_type, -1), (new_vote_type, 1)):
+        if vote_type is None:
+            continue
+        column = model.votes_positive if vote_type else model.votes_negative
+        changes[column.key] = column + delta
+    return changes
+
+
+async def count_vote(db: AsyncSession, model, target_id: int,
+                     old_vote_type: bool | None, new_vote_type: bool | None):
+    changes = vote_counter_changes(model, old_vote_type, new_vote_type)
+    if changes:
+        await db.execute(sql_update(model).filter_by(id=target_id).values(**changes, **model.bump()))
+
+
+async def write_vote(db: AsyncSession, model, vote_model, vote_target_column, target_id: int,
+                     votes_data: VoteCreate):
+    """
+    Write vote of user and change counters of target in one transaction without reading vote first
+    New vote is written by INSERT ... ON CONFLICT DO NOTHING, if user already voted
+    the vote is flipped by UPDATE that matches only vote of another type
+    Unique constraint of vote model keeps concurrent votes of the same user from creating duplicates,
+    and statements that changed nothing don't change counters, so vote is never counted twice
+    :param model: Comment or Review
+    :param vote_model: CommentVotes or ReviewVotes
+    :param vote_target_column: foreign key of vote model that points to model
+    :param target_id: id of voted comment or review
+    :param votes_data: type of vote and id of user
+    :return: vote that is stored
+    """
+    values = {"vote_type": votes_data.vote_type, "user_id": votes_data.user_id, vote_target_column.key: target_id}
+    insert = DIALECT_INSERT[db.get_bind().dialect.name]
+    inserted = await db.scalar(
+        insert(vote_model)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[vote_target_column.key, "user_id"])
+        .returning(vote_model.id)
+    )
+    if inserted is not None:
+        await count_vote(db, model, target_id, None, votes_data.vote_type)
+    else:
+        flipped = await db.scalar(
+            sql_update(vote_model)
+            .where(vote_target_column == target_id,
+                   vote_model.user_id == votes_data.user_id,
+                   vote_model.vote_type != votes_data.vote_type)
+            .values(vote_type=votes_data.vote_type)
+            .returning(vote_model.id)
+            .execution_options(synchronize_session=False)
+        )
+        if flipped is not None:
+            await count_vote(db, model, target_id, not votes_data.vote_type, votes_data.vote_type)
+    await db.commit()
+    await response_cache.invalidate_rows(model, target_id)
+    return vote_model(**values)
+
+
+async def delete_vote(db: AsyncSession, model, vote_model, vote_target_column, target_id: int, user_id: int):
+    """
+    Remove vote of user with single DELETE ... RETURNING and change counters by type of removed vote
+    :param model: Comment or Review
+    :param vote_model: CommentVotes or ReviewVotes
+    :param vote_target_column: foreign key of vote model that points to model
+    :param target_id: id of voted comment or review
+    :param user_id: id of user that voted
+    """
+    vote_type = await db.scalar(
+        sql_delete(vote_model)
+        .where(vote_target_column == target_id, vote_model.user_id == user_id)
+        .returning(vote_model.vote_type)
+        .execution_options(synchronize_session=False)
+    )
+    if vote_type is not None:
+        await count_vote(db, model, target_id, vote_type, None)
+    await db.commit()
+    await response_cache.invalidate_rows(model, target_id)
+
+
+def votes_count_query(vote_model, target_column, target_id_column, vote_type: bool):
+    return (select(func.count(vote_model.id))
+            .where(target_column == target_id_column, vote_model.vote_type.is_(vote_type))
+            .scalar_subquery())
+
+
+async def reconcile_counters(db: AsyncSession, model, vote_model, vote_target_column) -> int:
+    """
+    Recount vote counters from votes and fix rows where they drifted
+    :param model: Comment or Review
+    :param vote_model: CommentVotes or ReviewVotes
+    :param vote_target_column: foreign key of vote model that points to model
+    :return: amount of fixed rows
+    """
+    positive = votes_count_query(vote_model, vote_target_column, model.id, True)
+    negative = votes_count_query(vote_model, vote_target_column, model.id, False)
+    result = await db.execute(
+        sql_update(model)
+        .where(or_(model.votes_positive != positive, model.votes_negative != negative))
+        .values(votes_positive=positive, votes_negative=negative, **model.bump())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await response_cache.invalidate(table_tag(model))
+    return result.rowcount
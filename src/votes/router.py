@@ -0,0 +1,20 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Security, Body
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.dependencies import get_db
+from src.auth.dependencies import get_current_user
+from src.auth.schemas import Principal
+from src.votes import service
+from src.votes.schemas import VoteBatch, VoteBatchResult
+
+router = APIRouter(prefix="/votes", tags=["Votes"])
+
+
+@router.post("/batch", response_model=list[VoteBatchResult])
+async def create_votes_batch(
+        db: Annotated[AsyncSession, Depends(get_db)],
+        batch: Annotated[VoteBatch, Body()],
+        current_user: Annotated[Principal, Security(get_current_user, scopes=["read-applications"])]):
+    return await service.vote_batch(db, batch.votes)
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, conlist
+
+from src import config
+from src.comments.schemas import VoteCreate
+from src.enums import VoteAction, VoteStatus, VoteTarget
+
+
+class VoteBatchItem(VoteCreate):
+    target: VoteTarget
+    target_id: int
+    action: VoteAction = VoteAction.vote
+
+
+class VoteBatch(BaseModel):
+    votes: conlist(VoteBatchItem, min_length=1, max_length=config.VOTE_BATCH_SIZE)
+
+
+class VoteBatchResult(BaseModel):
+    index: int
+    status: VoteStatus
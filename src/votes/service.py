@@ -0,0 +1,168 @@
+from collections import defaultdict
+
+from sqlalchemy import bindparam, delete as sql_delete, false, select, tuple_, update as sql_update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import response_cache
+from src.comments.models import Comment, CommentVotes
+from src.enums import VoteAction, VoteStatus, VoteTarget
+from src.reviews.models import Review, ReviewVotes
+from src.users.models import User
+from src.votes.counters import DIALECT_INSERT
+from src.votes.schemas import VoteBatchItem, VoteBatchResult
+
+# model, vote model, foreign key of vote model and criteria of targets that can be voted
+TARGETS = {
+    VoteTarget.review: (Review, ReviewVotes, ReviewVotes.review_id, (Review.deleted == false(),)),
+    VoteTarget.comment: (Comment, CommentVotes, CommentVotes.comment_id, (Comment.deleted == false(),)),
+}
+
+
+async def existing_ids(db: AsyncSession, id_column, ids: set[int], *criteria) -> set[int]:
+    """
+    Find which of ids exist with one IN query
+    """
+    if not ids:
+        return set()
+    return set(await db.scalars(select(id_column).where(id_column.in_(ids), *criteria)))
+
+
+def replay(items: list[VoteBatchItem], initial: dict[tuple[int, int], bool]) -> tuple[list[VoteStatus], dict]:
+    """
+    Apply votes to state of votes in order they were sent, so later vote of the same user overrides earlier one
+    :param items: valid votes of one target type
+    :param initial: stored vote type by target id and user id
+    :return: status of every item and final state of votes
+    """
+    state = dict(initial)
+    statuses = []
+    for item in items:
+        pair = (item.target_id, item.user_id)
+        current = state.get(pair)
+        if item.action == VoteAction.unvote:
+            statuses.append(VoteStatus.unchanged if current is None else VoteStatus.deleted)
+            state.pop(pair, None)
+        else:
+            if current is None:
+                statuses.append(VoteStatus.created)
+            else:
+                statuses.append(VoteStatus.unchanged if current == item.vote_type else VoteStatus.updated)
+            state[pair] = item.vote_type
+    return statuses, state
+
+
+async def write_votes(db: AsyncSession, model, vote_model, vote_target_column,
+                      items: list[VoteBatchItem]) -> list[VoteStatus]:
+    """
+    Write votes of one target type with a fixed amount of statements, whatever size of batch is
+    Only difference between stored and final state is written, counters are changed by rows
+    that statements really changed, so votes written concurrently by other requests are not counted twice
+    :param model: Comment or Review
+    :param vote_model: CommentVotes or ReviewVotes
+    :param vote_target_column: foreign key of vote model that points to model
+    :param items: votes for existing targets from existing users
+    :return: status of every item
+    """
+    if not items:
+        return []
+    votes = vote_model.__table__
+    target_column = votes.c[vote_target_column.key]
+    pairs = {(item.target_id, item.user_id) for item in items}
+    stored = await db.execute(
+        select(votes.c.id, target_column, votes.c.user_id, votes.c.vote_type)
+        .where(tuple_(target_column, votes.c.user_id).in_(pairs))
+    )
+    stored_ids = {}
+    initial = {}
+    for vote_id, target_id, user_id, vote_type in stored:
+        stored_ids[(target_id, user_id)] = vote_id
+        initial[(target_id, user_id)] = vote_type
+    statuses, final = replay(items, initial)
+
+    # (target id, old vote type, new vote type) of every changed vote
+    changes = []
+    created = [{target_column.key: target_id, "user_id": user_id, "vote_type": vote_type}
+               for (target_id, user_id), vote_type in final.items() if (target_id, user_id) not in initial]
+    if created:
+        insert = DIALECT_INSERT[db.get_bind().dialect.name]
+        result = await db.execute(
+            insert(votes).values(created)
+            .on_conflict_do_nothing(index_elements=[target_column.key, "user_id"])
+            .returning(target_column, votes.c.vote_type)
+        )
+        changes.extend((target_id, None, vote_type) for target_id, vote_type in result)
+    for vote_type in (True, False):
+        flipped = [stored_ids[pair] for pair, new_type in final.items()
+                   if initial.get(pair) is not None and initial[pair] != new_type == vote_type]
+        if flipped:
+            result = await db.execute(
+                sql_update(votes)
+                .where(votes.c.id.in_(flipped), votes.c.vote_type != vote_type)
+                .values(vote_type=vote_type)
+                .returning(target_column)
+            )
+            changes.extend((target_id, not vote_type, vote_type) for target_id, in result)
+    removed = [stored_ids[pair] for pair in initial if pair not in final]
+    if removed:
+        result = await db.execute(
+            sql_delete(votes).where(votes.c.id.in_(removed)).returning(target_column, votes.c.vote_type)
+        )
+        changes.extend((target_id, vote_type, None) for target_id, vote_type in result)
+    await count_votes(db, model, changes)
+    return statuses
+
+
+async def count_votes(db: AsyncSession, model, changes: list[tuple[int, bool | None, bool | None]]):
+    """
+    Change vote counters of many targets with one executemany UPDATE
+    :param model: Comment or Review
+    :param changes: target id, type of vote before and after change, None if there was no vote
+    """
+    deltas = defaultdict(lambda: {"votes_positive": 0, "votes_negative": 0})
+    for target_id, old_vote_type, new_vote_type in changes:
+        for vote_type, delta in ((old_vote_type, -1), (new_vote_type, 1)):
+            if vote_type is not None:
+                deltas[target_id]["votes_positive" if vote_type else "votes_negative"] += delta
+    if not deltas:
+        return
+    table = model.__table__
+    await db.execute(
+        sql_update(table)
+        .where(table.c.id == bindparam("target_id"))
+        .values(votes_positive=table.c.votes_positive + bindparam("positive"),
+                votes_negative=table.c.votes_negative + bindparam("negative"),
+                **model.bump()),
+        [{"target_id": target_id, "positive": delta["votes_positive"], "negative": delta["votes_negative"]}
+         for target_id, delta in deltas.items()]
+    )
+
+
+async def vote_batch(db: AsyncSession, items: list[VoteBatchItem]) -> list[VoteBatchResult]:
+    """
+    Write votes for reviews and comments in one transaction
+    Users and targets of all votes are checked with one query per type, votes with unknown user
+    or target are skipped and reported, others are written
+    :param db: session to interact with db
+    :param items: votes in order they were made
+    :return: result of every vote in the same order
+    """
+    statuses: list[VoteStatus | None] = [None] * len(items)
+    users = await existing_ids(db, User.id, {item.user_id for item in items}, User.deleted == false())
+    for target, (model, vote_model, vote_target_column, criteria) in TARGETS.items():
+        indexed = [(index, item) for index, item in enumerate(items) if item.target == target]
+        targets = await existing_ids(db, model.id, {item.target_id for _, item in indexed}, *criteria)
+        valid = []
+        for index, item in indexed:
+            if item.user_id not in users:
+                statuses[index] = VoteStatus.user_not_found
+            elif item.target_id not in targets:
+                statuses[index] = VoteStatus.target_not_found
+            else:
+                valid.append((index, item))
+        written = await write_votes(db, model, vote_model, vote_target_column, [item for _, item in valid])
+        for (index, _), status in zip(valid, written):
+            statuses[index] = status
+    await db.commit()
+    for target, (model, *_) in TARGETS.items():
+        await response_cache.invalidate_rows(model, *{item.target_id for item in items if item.target == target})
+    return [VoteBatchResult(index=index, status=status) for index, status in enumerate(statuses)]
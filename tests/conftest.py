@@ -1,10 +1,15 @@
+import asyncio
 import datetime
 import logging
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from src.auth.service import create_refresh_token, create_token_set, save_refresh_token
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from src.auth.service import create_refresh_token, create_access_token, hash_token
 from src.database.core import Base
 
 from src.applications.models import Application, Rating
@@ -15,11 +20,14 @@ from src.comments.models import Comment, CommentVotes
 from src.reviews.models import Review, ReviewVotes
 from src.main import app
 from src.dependencies import get_db
-from src import pwd_context, config
+from src.metrics import instrument_engine
+from src import pwd_context, config, principal_cache, response_cache, request_metrics
+from src.metrics import SQLRecorder
+from src.jobs.runner import job_runner
 
 
 SQLALCHEMY_DATABASE_URI =  "sqlite:///test.db"
-
+ASYNC_SQLALCHEMY_DATABASE_URI = "sqlite+aiosqlite:///test.db"
 
 
 @pytest.fixture(scope="module")
@@ -41,14 +49,27 @@ def session(database_engine):
     session.close()
 
 
+@pytest.fixture(scope="module")
+def async_session_maker(database_engine):
+    # Every TestClient runs its own event loop, so connections must not be shared between tests
+    engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URI, poolclass=NullPool)
+    instrument_engine(engine)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+
+
 @pytest.fixture(scope="function")
-def client(session):
-    def overrided_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+def client(async_session_maker, monkeypatch):
+    async def overrided_get_db():
+        async with async_session_maker() as db:
+            yield db
     app.dependency_overrides[get_db] = overrided_get_db
+    # users are changed directly in db by fixtures, so cached users can't be trusted
+    principal_cache.clear()
+    asyncio.run(response_cache.clear())
+    # request that exceeds SQL budget of its route fails the test
+    monkeypatch.setattr(request_metrics, "budget_mode", "raise")
+    # workers would use database of config, tests run jobs with run_jobs
+    monkeypatch.setattr(config, "JOBS_WORKERS", 0)
     with TestClient(app) as test_client:
         yield test_client
 
@@ -56,17 +77,55 @@ def client(session):
 
 
 @pytest.fixture
-def access_token(session, user):
-    token_set = create_token_set(session, user, scopes=["users", "manage-applications", "read-applications", "me"])
-    return token_set.access_token
+def assert_max_queries():
+    """
+    Check amount of SQL statements of every request made in block:
+
+        with assert_max_queries(3):
+            client_with_auth.get("/applications/")
+    """
+    @contextmanager
+    def check(statements: int):
+        with SQLRecorder(request_metrics) as recorder:
+            yield recorder
+        assert recorder.requests, "No requests were made"
+        for request in recorder.requests:
+            shapes = "\n".join(f"{count} x {shape}" for shape, count in request.shapes.items())
+            assert request.statements <= statements, \
+                f"{request.route} executed {request.statements} SQL statements, expected at most {statements}:\n{shapes}"
+    return check
+
+
+@pytest.fixture
+def run_jobs(async_session_maker):
+    """
+    Run due jobs on test database, returns amount of started jobs
+    """
+    def run() -> int:
+        return asyncio.run(job_runner.run_pending(async_session_maker))
+    return run
+
+
+@pytest.fixture
+def access_token(user):
+    return create_access_token(
+        dict(token_type=config.ACCESS_TOKEN_TYPE, user_id=user.id, scopes=["users", "manage-applications", "read-applications", "me"])
+    )
 
 
 @pytest.fixture(scope="function")
-def client_with_auth(session, access_token: str, refresh_token):
-    def override_get_db():
-        yield session
+def client_with_auth(async_session_maker, access_token: str, refresh_token, monkeypatch):
+    async def override_get_db():
+        async with async_session_maker() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    principal_cache.clear()
+    asyncio.run(response_cache.clear())
+    # request that exceeds SQL budget of its route fails the test
+    monkeypatch.setattr(request_metrics, "budget_mode", "raise")
+    # workers would use database of config, tests run jobs with run_jobs
+    monkeypatch.setattr(config, "JOBS_WORKERS", 0)
 
     with TestClient(app) as test_client:
         test_client.headers.update({"Authorization": f"Bearer {access_token}"})
@@ -88,7 +147,7 @@ def user(session):
 
 @pytest.fixture
 def application(session, user: User):
-    app = session.query(Application).filter_by(name="Test App").first()
+    app = session.query(Application).filter_by(name="Test App", deleted=False).first()
     if not app:
         app = Application(name="Test App", description="stringstringstringstringstringstringstringstringklklkklklstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringstringst", user_id=user.id, hide_reviews=False)
         session.add(app)
@@ -101,7 +160,13 @@ def refresh_token(session, user):
     refresh_token = create_refresh_token(
         dict(token_type=config.REFRESH_TOKEN_TYPE, user_id=user.id, scopes="applications users me")
     )
-    save_refresh_token(session, refresh_token, user, datetime.timedelta(config.REFRESH_TOKEN_EXPIRE_DAYS))
+    session.add(RefreshToken(
+        token_hash=hash_token(refresh_token),
+        created_at=datetime.datetime.now(datetime.timezone.utc),
+        expires_at=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(config.REFRESH_TOKEN_EXPIRE_DAYS),
+        user_id=user.id
+    ))
+    session.commit()
     yield refresh_token
 
 
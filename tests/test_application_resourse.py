@@ -1,4 +1,19 @@
+import asyncio
+import io
+import json
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from src import response_cache
+from src.applications import search, service, upload
+from src.applications.models import Application
+from src.cache import (CacheEntry, LocalStore, ResponseCache, ResponseCacheBackend, SharedStoreBackend,
+                       TaggedCache)
 from src.enums import RatingGrade
+from src.responses import JSONBytesResponse
 
 
 def test_get_applications(client_with_auth):
@@ -45,3 +60,292 @@ def test_delete_application(client_with_auth, application):
     assert response.status_code == 204
     response = client_with_auth.get(f"/applications/{application.id}")
     assert response.status_code == 404
+
+
+def test_get_applications_paginated(client_with_auth, application):
+    data = {"name": "Paginated App", "description": "a" * 200}
+    client_with_auth.post("/applications/", json=data)
+    response = client_with_auth.get("/applications/", params={"limit": 1})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    first_id = response.json()[0]["id"]
+    next_cursor = response.headers["X-Next-Cursor"]
+
+    response = client_with_auth.get("/applications/", params={"limit": 1, "after": next_cursor})
+    assert response.status_code == 200
+    assert response.json()[0]["id"] > first_id
+
+
+def test_get_applications_with_invalid_cursor(client_with_auth):
+    response = client_with_auth.get("/applications/", params={"after": "invalid"})
+    assert response.status_code == 400
+
+
+def test_full_text_search_of_applications(client_with_auth):
+    client_with_auth.post("/applications/", json={"name": "Weather forecast", "description": "b" * 200})
+    client_with_auth.post("/applications/", json={"name": "Calendar", "description": "Planner with weather widget " + "c" * 200})
+    response = client_with_auth.get("/applications/", params={"search": "weather"})
+    assert response.status_code == 200
+    names = [application["name"] for application in response.json()]
+    assert names == ["Weather forecast", "Calendar"]
+
+
+def test_unplanned_lazy_load_raises(async_session_maker, application):
+    async def load_application():
+        async with async_session_maker() as db:
+            loaded_application = await service.get(db, application.id)
+            assert loaded_application.user.id == application.user_id
+            with pytest.raises(InvalidRequestError, match="lazy='raise"):
+                loaded_application.user.applications
+    asyncio.run(load_application())
+
+
+def test_rating_aggregates(client_with_auth, user):
+    response = client_with_auth.post("/applications/", json={"name": "Rated App", "description": "r" * 200})
+    application_id = response.json()["id"]
+    assert response.json()["rating_count"] == 0
+    assert response.json()["rating_average"] is None
+
+    for grade in (RatingGrade.grade_5, RatingGrade.grade_4, RatingGrade.grade_4):
+        client_with_auth.post(f"/applications/{application_id}/rating", json={"grade": grade.value, "user_id": user.id})
+    response = client_with_auth.get(f"/applications/{application_id}")
+    assert response.json()["rating_count"] == 3
+    assert response.json()["rating_average"] == 13 / 3
+    assert response.json()["rating_histogram"] == {"1": 0, "2": 0, "3": 0, "4": 2, "5": 1}
+
+
+def test_reconcile_ratings(session, async_session_maker, application):
+    application.rating_count = 100
+    session.commit()
+
+    async def reconcile():
+        async with async_session_maker() as db:
+            return await service.reconcile_ratings(db)
+    assert asyncio.run(reconcile()) >= 1
+
+    session.refresh(application)
+    assert application.rating_count == len([rating for rating in application.ratings if not rating.deleted])
+
+
+def test_sparse_fields_of_applications(client_with_auth, application):
+    response = client_with_auth.get("/applications/", params={"fields": "name,rating_average", "expand": ""})
+    assert response.status_code == 200
+    assert all(set(item) == {"id", "name", "rating_average"} for item in response.json())
+
+    response = client_with_auth.get(f"/applications/{application.id}",
+                                    params={"fields": "name,user.username", "expand": "user"})
+    assert response.json() == {"id": application.id, "name": "Test App",
+                               "user": {"id": application.user_id, "username": "testusername"}}
+
+    response = client_with_auth.get(f"/applications/{application.id}", params={"expand": "ratings"})
+    assert "user" not in response.json()
+    assert all("review" not in rating for rating in response.json()["ratings"])
+
+
+def test_sparse_fields_with_unknown_field(client_with_auth, application):
+    response = client_with_auth.get(f"/applications/{application.id}", params={"fields": "name,password"})
+    assert response.status_code == 400
+
+
+def test_sparse_fields_with_nested_path_of_scalar_field(client_with_auth, application):
+    for params in ({"fields": "name.x"}, {"fields": "user.username.x"}, {"expand": "name.x"}):
+        response = client_with_auth.get(f"/applications/{application.id}", params=params)
+        assert response.status_code == 400
+    response = client_with_auth.get(f"/applications/{application.id}", params={"fields": "name,user.username"})
+    assert response.status_code == 200
+
+
+def test_conditional_get_of_application(client_with_auth, application, user):
+    response = client_with_auth.get(f"/applications/{application.id}")
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+
+    response = client_with_auth.get(f"/applications/{application.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    response = client_with_auth.get(f"/applications/{application.id}", params={"fields": "name"},
+                                    headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    client_with_auth.post(f"/applications/{application.id}/rating",
+                          json={"grade": RatingGrade.grade_4.value, "user_id": user.id,
+                                "review": {"title": "title", "body": "body"}})
+    response = client_with_auth.get(f"/applications/{application.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_conditional_get_of_application_depends_on_owner(client_with_auth, application, user):
+    etag = client_with_auth.get(f"/applications/{application.id}").headers["ETag"]
+    assert client_with_auth.patch("/users/me/", json={"username": "renamedowner"}).status_code == 200
+    response = client_with_auth.get(f"/applications/{application.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["user"]["username"] == "renamedowner"
+    client_with_auth.patch("/users/me/", json={"username": user.username})
+
+
+def test_applications_are_cached_until_application_is_changed(client_with_auth, user):
+    hits = response_cache.hits
+    client_with_auth.get("/applications/", params={"name": "Cached App"})
+    response = client_with_auth.get("/applications/", params={"name": "Cached App"})
+    assert response_cache.hits == hits + 1
+    assert response.json() == []
+    client_with_auth.post("/applications/", json={"name": "Cached App", "description": "c" * 200})
+    response = client_with_auth.get("/applications/", params={"name": "Cached App"})
+    assert [application["name"] for application in response.json()] == ["Cached App"]
+
+
+def test_ratings_are_cached_until_review_is_voted(client_with_auth, user):
+    response = client_with_auth.post("/applications/", json={"name": "Voted App", "description": "v" * 200})
+    application_id = response.json()["id"]
+    rating_data = {"grade": RatingGrade.grade_3.value, "user_id": user.id, "review": {"title": "title", "body": "body"}}
+    review_id = client_with_auth.post(f"/applications/{application_id}/rating", json=rating_data).json()["review"]["id"]
+    hits = response_cache.hits
+    client_with_auth.get(f"/applications/{application_id}/rating")
+    client_with_auth.get(f"/applications/{application_id}/rating")
+    assert response_cache.hits == hits + 1
+    client_with_auth.post(f"/reviews/{review_id}/votes", json={"vote_type": True, "user_id": user.id})
+    response = client_with_auth.get(f"/applications/{application_id}/rating")
+    assert response.json()[0]["review"]["votes_positive"] == 1
+
+
+def test_tagged_cache_is_limited_by_bytes():
+    cache = TaggedCache(max_size=10, ttl=60, max_bytes=10)
+    cache.set("first", b"12345", ["applications"])
+    cache.set("second", b"12345", ["reviews"])
+    cache.get("first")
+    cache.set("third", b"12345", ["reviews"])
+    assert cache.get("second") is None
+    assert cache.size_in_bytes == 10
+    cache.invalidate(["reviews"])
+    assert cache.get("third") is None
+    assert cache.get("first") == b"12345"
+
+
+def test_shared_store_backend_invalidates_by_tags():
+    async def run():
+        backend = SharedStoreBackend(LocalStore(), ttl=60)
+        await backend.set("first", b"1", ["applications", "applications:1"])
+        await backend.set("second", b"2", ["applications:2"])
+        await backend.invalidate(["applications:1"])
+        return await backend.get("first"), await backend.get("second")
+
+    assert asyncio.run(run()) == (None, b"2")
+
+
+def test_shared_store_backend_clears_only_its_prefix():
+    async def run():
+        store = LocalStore()
+        await store.set("other", b"kept")
+        backend = SharedStoreBackend(store, ttl=60)
+        await backend.set("first", b"1", ["applications:1"])
+        await backend.set("second", b"2", ["applications:2"])
+        await backend.clear()
+        return await backend.get("first"), await backend.get("second"), await store.get("other")
+
+    assert asyncio.run(run()) == (None, None, b"kept")
+
+
+def test_response_is_not_stored_after_invalidation_by_other_worker():
+    async def run():
+        store = LocalStore()
+        first = ResponseCache(SharedStoreBackend(store, ttl=60))
+        second = ResponseCache(SharedStoreBackend(store, ttl=60))
+        entry = CacheEntry(first, "key")
+        assert await entry.get() is None
+        await second.invalidate("applications")
+        await entry.store(JSONBytesResponse(content=b"[]"), ["applications"])
+        stale = await first.backend.get("key")
+        entry = CacheEntry(first, "key")
+        await entry.get()
+        await entry.store(JSONBytesResponse(content=b"[]"), ["applications"])
+        return stale, await second.backend.get("key")
+
+    stale, fresh = asyncio.run(run())
+    assert stale is None
+    assert fresh is not None
+
+
+def test_response_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        ResponseCacheBackend()
+
+
+def test_get_applications_by_ids(client_with_auth, application):
+    response = client_with_auth.get("/applications/batch", params={"ids": f"0,{application.id}", "fields": "name"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": 0, "found": False, "item": None},
+        {"id": application.id, "found": True, "item": {"id": application.id, "name": application.name}},
+    ]
+
+
+def test_get_applications_by_invalid_ids(client_with_auth):
+    assert client_with_auth.get("/applications/batch", params={"ids": "1,a"}).status_code == 400
+    assert client_with_auth.get("/applications/batch", params={"ids": ",".join(["1"] * 101)}).status_code == 400
+
+
+def test_import_applications_from_json(client_with_auth):
+    description = "imported " * 30
+    existing = client_with_auth.post("/applications/", json={"name": "Imported Existing", "description": description})
+    assert existing.status_code == 201
+    rows = [
+        {"name": "Imported JSON", "description": description},
+        {"name": "Imported Invalid", "description": "short"},
+        {"name": "Imported JSON", "description": description},
+        {"name": "Imported Existing", "description": description},
+    ]
+    files = {"file": ("applications.json", json.dumps(rows), "application/json")}
+    response = client_with_auth.post("/applications/import", files=files)
+    assert response.status_code == 200
+    report = response.json()
+    assert [result["status"] for result in report] == ["created", "invalid", "duplicate", "exists"]
+    assert report[1]["errors"][0].startswith("description:")
+    created = client_with_auth.get(f"/applications/{report[0]['id']}")
+    assert created.json()["name"] == "Imported JSON"
+
+
+def test_import_applications_from_csv(client_with_auth):
+    description = "csv " * 60
+    content = f'name,description,hide_reviews\n"Imported, CSV","{description}\nwith line break",true\nbroken row\n'
+    files = {"file": ("applications.csv", content.encode(), "text/csv")}
+    response = client_with_auth.post("/applications/import", files=files)
+    assert response.status_code == 200
+    report = response.json()
+    assert [result["status"] for result in report] == ["created", "invalid"]
+    created = client_with_auth.get(f"/applications/{report[0]['id']}").json()
+    assert created["name"] == "Imported, CSV"
+    assert created["description"] == f"{description}\nwith line break"
+    assert created["hide_reviews"] is True
+
+
+def test_import_applications_of_unsupported_type(client_with_auth):
+    files = {"file": ("applications.xml", b"<applications/>", "application/xml")}
+    assert client_with_auth.post("/applications/import", files=files).status_code == 415
+    files = {"file": ("applications.json", b'{"name": "App"}', "application/json")}
+    assert client_with_auth.post("/applications/import", files=files).status_code == 400
+
+
+def test_upload_stops_at_malformed_row(monkeypatch):
+    monkeypatch.setattr(upload, "CHUNK_SIZE", 50)
+    monkeypatch.setattr(upload, "MAX_ROW_SIZE", 400)
+    item = json.dumps({"name": "App", "description": "malformed " * 25})
+    content = f'[{item}, {{"name": oops}}, {", ".join([item] * 50)}]'.encode()
+    file = UploadFile(io.BytesIO(content), filename="applications.json")
+
+    async def parse():
+        return [row async for row in upload.upload_rows(file)]
+
+    rows = asyncio.run(parse())
+    assert len(rows) == 2
+    assert isinstance(rows[1], upload.RowError)
+    # the rest of upload is not read
+    assert file.file.tell() < len(content) // 2
+
+
+def test_search_falls_back_to_like_for_other_databases(session, application):
+    query, rank = search.apply(select(Application.id), "mysql", "klklkklkl STRING")
+    rows = session.execute(query.add_columns(rank.label("rank"))).all()
+    assert (application.id, 0) in rows
+    query, _ = search.apply(select(Application.id), "mysql", "klklkklkl missingterm")
+    assert application.id not in session.scalars(query).all()
@@ -1,3 +1,10 @@
+import asyncio
+import datetime
+import uuid
+
+from src import password_hasher
+from src.auth.models import RefreshToken
+from src.auth.service import hash_token, purge_refresh_tokens
 from src.enums import AccountType
 
 
@@ -34,6 +41,43 @@ def test_refresh_token(client_with_auth, refresh_token):
     result = client_with_auth.post("/auth/refresh/")
     assert result.status_code == 200
     assert result.json().get("refresh_token")
-    
 
 
+def test_login_rejected_when_hasher_queue_is_full(client, user):
+    password_hasher.in_flight = password_hasher.max_workers + password_hasher.max_queue_size
+    try:
+        result = client.post("/auth/login/", data={"username": user.username, "password": "testpassword"})
+    finally:
+        password_hasher.in_flight = 0
+    assert result.status_code == 503
+    assert password_hasher.stats()["rejected"] >= 1
+
+
+def test_refresh_token_is_stored_hashed(session, refresh_token):
+    token = session.query(RefreshToken).filter_by(token_hash=hash_token(refresh_token)).first()
+    assert token is not None
+    assert token.token_hash != refresh_token
+
+
+def test_purge_refresh_tokens(session, async_session_maker, user):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for revoked, expires_at in ((True, now + datetime.timedelta(days=1)), (False, now - datetime.timedelta(days=1))):
+        session.add(RefreshToken(token_hash=uuid.uuid4().hex, created_at=now, expires_at=expires_at,
+                                 revoked=revoked, user_id=user.id))
+    session.commit()
+
+    async def purge():
+        async with async_session_maker() as db:
+            return await purge_refresh_tokens(db, batch_size=1, max_rows_per_second=1000)
+    assert asyncio.run(purge()) >= 2
+    assert session.query(RefreshToken).filter_by(revoked=True).count() == 0
+
+
+def test_refreshed_token_is_revoked_at_once(client_with_auth, refresh_token, session):
+    result = client_with_auth.post("/auth/refresh/")
+    assert result.status_code == 200
+    assert session.query(RefreshToken).filter_by(token_hash=hash_token(refresh_token)).one().revoked is True
+
+    client_with_auth.cookies.clear()
+    client_with_auth.cookies.set("refresh_token", refresh_token)
+    assert client_with_auth.post("/auth/refresh/").status_code == 401
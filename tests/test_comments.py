@@ -31,3 +31,27 @@ def test_delete_comment(client_with_auth, comment, user):
 
     response = client_with_auth.get(f"/comments/{comment.id}")
     assert response.status_code == 404
+
+
+def test_conditional_get_of_comment(session, client_with_auth, review, user):
+    comment = Comment(text="conditional", review_id=review.id, user_id=user.id)
+    session.add(comment)
+    session.commit()
+    response = client_with_auth.get(f"/comments/{comment.id}")
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+    assert client_with_auth.get(f"/comments/{comment.id}", headers={"If-None-Match": etag}).status_code == 304
+    response = client_with_auth.get(f"/comments/{comment.id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    client_with_auth.patch(f"/comments/{comment.id}", json={"text": "changed text"})
+    assert client_with_auth.get(f"/comments/{comment.id}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_get_comments_by_ids_skips_deleted(session, client_with_auth, review, user):
+    comments = [Comment(text="batch", review_id=review.id, user_id=user.id, deleted=deleted) for deleted in (False, True)]
+    session.add_all(comments)
+    session.commit()
+    response = client_with_auth.get("/comments/batch", params={"ids": ",".join(str(comment.id) for comment in comments)})
+    assert response.status_code == 200
+    assert [item["found"] for item in response.json()] == [True, False]
+    assert response.json()[0]["item"]["text"] == "batch"
@@ -0,0 +1,105 @@
+import asyncio
+import datetime
+
+from src.applications.models import Application, Rating
+from src.comments.models import Comment, CommentVotes
+from src.database.core import utcnow
+from src.enums import JobStatus, RatingGrade
+from src.jobs import service
+from src.jobs.models import Job
+from src.jobs.runner import JobHandler, job_runner
+from src.reviews.models import Review, ReviewVotes
+
+
+def test_deleted_application_is_purged_by_job(client_with_auth, user, review, session, run_jobs):
+    response = client_with_auth.post("/applications/", json={"name": "Purged App", "description": "p" * 200})
+    application_id = response.json()["id"]
+    response = client_with_auth.post(f"/applications/{application_id}/rating", json={
+        "grade": RatingGrade.grade_4.value, "user_id": user.id, "review": {"title": "purged", "body": "purged"}})
+    review_id = response.json()["review"]["id"]
+    comment = Comment(text="purged", review_id=review_id, user_id=user.id)
+    session.add_all([comment, ReviewVotes(vote_type=True, review_id=review_id, user_id=user.id)])
+    session.flush()
+    session.add(CommentVotes(vote_type=True, comment_id=comment.id, user_id=user.id))
+    session.commit()
+    comment_id = comment.id
+
+    assert client_with_auth.delete(f"/applications/{application_id}").status_code == 204
+    assert client_with_auth.get(f"/applications/{application_id}").status_code == 404
+    assert session.get(Application, application_id).deleted is True
+
+    run_jobs()
+    session.expire_all()
+    assert session.get(Application, application_id) is None
+    assert session.query(Rating).filter_by(application_id=application_id).count() == 0
+    assert session.get(Review, review_id) is None
+    assert session.query(Comment).filter_by(review_id=review_id).count() == 0
+    assert session.query(ReviewVotes).filter_by(review_id=review_id).count() == 0
+    assert session.query(CommentVotes).filter_by(comment_id=comment_id).count() == 0
+    # reviews of other applications are kept
+    assert session.get(Review, review.id) is not None
+
+
+def test_failed_job_is_retried_with_backoff(session, async_session_maker, run_jobs, monkeypatch):
+    calls = []
+
+    async def flaky(db, value):
+        calls.append(value)
+        raise ValueError("flaky")
+
+    monkeypatch.setitem(job_runner.handlers, "tests.flaky", JobHandler(flaky))
+    job = Job(name="tests.flaky", payload={"value": 1}, max_attempts=2, run_at=utcnow())
+    session.add(job)
+    session.commit()
+
+    run_jobs()
+    session.refresh(job)
+    assert calls == [1]
+    assert job.status == JobStatus.pending
+    assert job.attempts == 1
+    assert "flaky" in job.last_error
+    assert job.run_at > utcnow()
+
+    job.run_at = utcnow() - datetime.timedelta(seconds=1)
+    session.commit()
+    run_jobs()
+    session.refresh(job)
+    assert calls == [1, 1]
+    assert job.status == JobStatus.failed
+    assert job.attempts == 2
+
+
+def test_busy_handler_and_leased_job_are_not_claimed(session, async_session_maker, monkeypatch):
+    async def handle(db):
+        pass
+
+    handler = JobHandler(handle, concurrency=1)
+    monkeypatch.setitem(job_runner.handlers, "tests.limited", handler)
+    job = Job(name="tests.limited", payload={}, max_attempts=1, run_at=utcnow())
+    session.add(job)
+    session.commit()
+
+    handler.running = 1
+    assert asyncio.run(job_runner.claim(async_session_maker)) is None
+    handler.running = 0
+
+    async def claim():
+        async with async_session_maker() as db:
+            return await service.claim(db, ["tests.limited"], lease_seconds=60)
+    assert asyncio.run(claim()).id == job.id
+    # job is leased, so it is not claimed again until lease ends
+    assert asyncio.run(claim()) is None
+    session.delete(job)
+    session.commit()
+
+
+def test_backoff_doubles_until_limit():
+    assert [service.backoff(attempt, 5, 30) for attempt in range(1, 6)] == [5, 10, 20, 30, 30]
+
+
+def test_job_stats(client, session):
+    session.add(Job(name="tests.unknown", payload={}, max_attempts=1, status=JobStatus.failed))
+    session.commit()
+    response = client.get("/internal/jobs")
+    assert response.status_code == 200
+    assert response.json()["failed"] >= 1
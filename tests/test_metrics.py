@@ -0,0 +1,82 @@
+import pytest
+
+from src import request_metrics
+from src.applications.models import Application, Rating
+from src.comments.models import Comment
+from src.enums import RatingGrade
+from src.metrics import Histogram, RequestStats, SQLBudgetExceeded, UNMATCHED_ROUTE, statement_shape
+from src.reviews.models import Review
+
+
+def metric_value(text: str, series: str) -> float:
+    return next(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(series + " "))
+
+
+def test_histogram_is_cumulative():
+    histogram = Histogram((1, 2))
+    for value in (0.5, 1, 1.5, 3):
+        histogram.observe(value)
+    assert histogram.cumulative() == [("1", 2), ("2", 3), ("+Inf", 4)]
+    assert histogram.sum == 6
+
+
+def test_metrics_of_route(client_with_auth, application):
+    request_metrics.clear()
+    client_with_auth.get(f"/applications/{application.id}")
+    client_with_auth.get("/unknown/path/1")
+    response = client_with_auth.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    route = 'method="GET",route="/applications/{application_id}"'
+    assert metric_value(response.text, f"http_responses_total{{{route},status=\"200\"}}") == 1
+    assert metric_value(response.text, f"http_request_duration_seconds_count{{{route}}}") == 1
+    # user, versions and application with its ratings
+    assert metric_value(response.text, f"http_request_sql_statements_sum{{{route}}}") >= 3
+    assert metric_value(response.text, f"http_request_sql_duration_seconds_sum{{{route}}}") > 0
+    assert metric_value(response.text, 'http_requests_in_flight{method="GET",route="/metrics"}') == 1
+    assert metric_value(response.text,
+                        f'http_responses_total{{method="GET",route="{UNMATCHED_ROUTE}",status="404"}}') == 1
+    assert 'db_pool_checked_out{database="primary"}' in response.text
+
+
+def test_metrics_of_hasher_and_caches(client_with_auth, application):
+    client_with_auth.get("/applications/")
+    client_with_auth.get("/applications/")
+    response = client_with_auth.get("/metrics")
+    assert metric_value(response.text, 'cache_hits_total{cache="response"}') >= 1
+    assert metric_value(response.text, 'cache_misses_total{cache="response"}') >= 1
+    assert 'cache_bytes{cache="response"}' in response.text
+    assert metric_value(response.text, 'cache_hits_total{cache="principal"}') >= 1
+    assert metric_value(response.text, "password_hasher_queued") == 0
+    assert "password_hasher_rejected_total" in response.text
+    assert "# TYPE password_hasher_wait_seconds histogram" in response.text
+    assert 'password_hasher_wait_seconds_bucket{le="+Inf"}' in response.text
+
+
+def test_statement_shape_ignores_amount_of_parameters():
+    assert statement_shape("SELECT * FROM reviews WHERE id IN (?, ?, ?)") == statement_shape(
+        "SELECT * FROM reviews WHERE id IN (?)")
+    assert statement_shape("INSERT INTO votes VALUES ($1, $2), ($3, $4)") == "INSERT INTO votes VALUES (?)"
+
+
+def test_repeated_statement_exceeds_budget():
+    request = RequestStats("/reviews/{review_id}", budget=10, repeated_limit=2, mode="raise")
+    request.record("SELECT * FROM comments WHERE id = ?", 0.001)
+    request.record("SELECT * FROM comments WHERE id = ?", 0.001)
+    with pytest.raises(SQLBudgetExceeded, match="the same statement 3 times"):
+        request.record("SELECT * FROM comments WHERE id = ?", 0.001)
+
+
+def test_application_tree_has_constant_amount_of_queries(session, client_with_auth, assert_max_queries, user):
+    application = Application(name="Budget App", description="b" * 200, user_id=user.id, hide_reviews=False)
+    for _ in range(10):
+        review = Review(title="title", body="body", user_id=user.id,
+                        comments=[Comment(text="text", user_id=user.id) for _ in range(3)])
+        application.ratings.append(Rating(grade=RatingGrade.grade_5, user_id=user.id, review=review))
+    session.add(application)
+    session.commit()
+    # user, versions, application, ratings, reviews and comments
+    with assert_max_queries(6):
+        client_with_auth.get(f"/applications/{application.id}")
+        client_with_auth.get(f"/applications/{application.id}/rating")
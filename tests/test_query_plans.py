@@ -0,0 +1,16 @@
+import asyncio
+
+from src.database.explain import check_query_plans, is_sequential_scan
+
+
+def test_sequential_scan_detection():
+    assert is_sequential_scan("sqlite", "SCAN users")
+    assert not is_sequential_scan("sqlite", "SCAN users USING INDEX ix_users_active_id")
+    assert not is_sequential_scan("sqlite", "SEARCH users USING INTEGER PRIMARY KEY (rowid=?)")
+    assert is_sequential_scan("postgresql", "Seq Scan on users  (cost=10000000000.00..10000000001.01 rows=1 width=4)")
+
+
+def test_service_queries_use_indexes():
+    failures = asyncio.run(check_query_plans("sqlite://", users=50, applications=100, ratings=300,
+                                             comments=300, votes=500))
+    assert failures == []
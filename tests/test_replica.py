@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src import config
+from src.applications.models import Application
+from src.database.core import Base
+from src.database.replica import READ_PRIMARY_COOKIE
+from src.dependencies import get_replica_db
+from src.main import app
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """
+    Empty database that stands in for replica which didn't receive any writes yet
+    """
+    uri = f"sqlite:///{tmp_path / 'replica.db'}"
+    Base.metadata.create_all(bind=create_engine(uri))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", poolclass=NullPool)
+    replica_session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_replica_db():
+        async with replica_session_maker() as db:
+            yield db
+
+    monkeypatch.setattr(config, "SQLALCHEMY_REPLICA_DATABASE_URI", uri)
+    app.dependency_overrides[get_replica_db] = override_get_replica_db
+    yield
+    app.dependency_overrides.pop(get_replica_db, None)
+
+
+def test_reads_go_to_replica_until_client_writes(replica, session, client_with_auth, user):
+    application = Application(name="Primary App", description="p" * 200, user_id=user.id, hide_reviews=False)
+    session.add(application)
+    session.commit()
+    assert client_with_auth.get(f"/applications/{application.id}").status_code == 404
+
+    response = client_with_auth.post("/applications/", json={"name": "Sticky App", "description": "s" * 200})
+    assert response.status_code == 201
+    assert READ_PRIMARY_COOKIE in response.cookies
+    assert client_with_auth.get(f"/applications/{application.id}").status_code == 200
+
+
+def test_failed_write_doesnt_stick_to_primary(replica, client_with_auth):
+    response = client_with_auth.patch("/applications/0", json={"name": "Missing App"})
+    assert response.status_code == 404
+    assert READ_PRIMARY_COOKIE not in response.cookies
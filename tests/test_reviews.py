@@ -1,6 +1,11 @@
+import asyncio
+
+from src import response_cache
 from src.reviews.models import Review, ReviewVotes
 from src.comments.models import Comment
 from src.users.models import User
+from src.reviews import service
+from src.comments.schemas import VoteCreate
 
 
 def test_get_review(client_with_auth, review, user):
@@ -44,3 +49,114 @@ def test_create_vote_on_review(session, client_with_auth, review, user):
     vote = session.query(ReviewVotes).filter_by(review_id=review.id, user_id=user.id).first()
     assert vote is not None
 
+
+
+def test_votes_on_deleted_review_are_rejected(session, client_with_auth, user):
+    deleted_review = Review(title="deleted", body="deleted", user_id=user.id, deleted=True)
+    session.add(deleted_review)
+    session.commit()
+    vote = {"user_id": user.id, "vote_type": True}
+    response = client_with_auth.post(f"/reviews/{deleted_review.id}/votes", json=vote)
+    assert response.status_code == 404
+    response = client_with_auth.request("DELETE", f"/reviews/{deleted_review.id}/votes", json=vote)
+    assert response.status_code == 404
+    assert session.query(ReviewVotes).filter_by(review_id=deleted_review.id).count() == 0
+
+
+def test_vote_counters_of_review(session, client_with_auth, review, user):
+    client_with_auth.post(f"/reviews/{review.id}/votes", json={"user_id": user.id, "vote_type": True})
+    response = client_with_auth.get(f"/reviews/{review.id}")
+    assert response.json()["votes_positive"] == 1
+    assert response.json()["votes_negative"] == 0
+
+    # changed mind
+    client_with_auth.post(f"/reviews/{review.id}/votes", json={"user_id": user.id, "vote_type": False})
+    response = client_with_auth.get(f"/reviews/{review.id}")
+    assert response.json()["votes_positive"] == 0
+    assert response.json()["votes_negative"] == 1
+
+    client_with_auth.request("DELETE", f"/reviews/{review.id}/votes", json={"user_id": user.id, "vote_type": False})
+    response = client_with_auth.get(f"/reviews/{review.id}")
+    assert response.json()["votes_positive"] == 0
+    assert response.json()["votes_negative"] == 0
+
+
+def test_repeated_votes_are_counted_once(session, async_session_maker, review, user):
+    async def vote(vote_type):
+        async with async_session_maker() as db:
+            return await service.vote(db, VoteCreate(user_id=user.id, vote_type=vote_type), review.id)
+
+    async def vote_concurrently():
+        await asyncio.gather(*(vote(True) for _ in range(5)))
+        await vote(False)
+    asyncio.run(vote_concurrently())
+
+    assert session.query(ReviewVotes).filter_by(review_id=review.id, user_id=user.id).count() == 1
+    session.refresh(review)
+    assert review.votes_positive == 0
+    assert review.votes_negative == 1
+
+    async def unvote():
+        async with async_session_maker() as db:
+            await service.unvote(db, VoteCreate(user_id=user.id, vote_type=False), review.id)
+    asyncio.run(unvote())
+    asyncio.run(unvote())
+    session.refresh(review)
+    assert review.votes_negative == 0
+
+
+def test_reconcile_review_votes(session, async_session_maker, review, user):
+    session.add(ReviewVotes(review_id=review.id, user_id=user.id, vote_type=True))
+    session.commit()
+
+    async def reconcile():
+        async with async_session_maker() as db:
+            return await service.reconcile_votes(db)
+    assert asyncio.run(reconcile()) == 1
+
+    session.refresh(review)
+    assert review.votes_positive == 1
+
+
+def test_sparse_fields_of_review(client_with_auth, review, comment):
+    response = client_with_auth.get(f"/reviews/{review.id}", params={"expand": ""})
+    assert response.status_code == 200
+    assert "comments" not in response.json()
+    assert response.json()["title"] == review.title
+
+    response = client_with_auth.get(f"/reviews/{review.id}", params={"fields": "comments.text"})
+    assert {"id": comment.id, "text": comment.text} in response.json()["comments"]
+    assert all(set(item) == {"id", "text"} for item in response.json()["comments"])
+
+
+def test_conditional_get_of_review(client_with_auth, review, user):
+    etag = client_with_auth.get(f"/reviews/{review.id}").headers["ETag"]
+    response = client_with_auth.get(f"/reviews/{review.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client_with_auth.post(f"/reviews/{review.id}/votes", json={"user_id": user.id, "vote_type": True})
+    client_with_auth.post(f"/reviews/{review.id}/votes", json={"user_id": user.id, "vote_type": False})
+    response = client_with_auth.get(f"/reviews/{review.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    client_with_auth.post(f"/reviews/{review.id}/comments", json={"text": "new comment", "user_id": user.id})
+    response = client_with_auth.get(f"/reviews/{review.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_review_comments_are_cached_until_comment_is_created(client_with_auth, review, user):
+    hits = response_cache.hits
+    client_with_auth.get(f"/reviews/{review.id}/comments")
+    client_with_auth.get(f"/reviews/{review.id}/comments")
+    assert response_cache.hits == hits + 1
+    client_with_auth.post(f"/reviews/{review.id}/comments", json={"text": "not cached comment", "user_id": user.id})
+    response = client_with_auth.get(f"/reviews/{review.id}/comments")
+    assert "not cached comment" in [comment["text"] for comment in response.json()]
+
+
+def test_get_reviews_by_ids(client_with_auth, review):
+    response = client_with_auth.get("/reviews/batch", params={"ids": f"{review.id},0,{review.id}"})
+    assert response.status_code == 200
+    assert [(item["id"], item["found"]) for item in response.json()] == [(review.id, True), (0, False), (review.id, True)]
+    assert response.json()[0]["item"]["title"] == review.title
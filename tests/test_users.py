@@ -1,4 +1,14 @@
-from src.enums import AccountType
+import json
+import time
+
+import jwt
+import pytest
+from pydantic import ValidationError
+
+from src import config, principal_cache
+from src.auth.schemas import Principal
+from src.auth.service import create_access_token
+from src.enums import AccountType, RatingGrade
 from src.users.models import User
 from src.applications.models import Application
 
@@ -46,6 +56,84 @@ def test_get_specific_user_applications(client_with_auth, user, application):
     assert isinstance(response.json(), list)
 
 
+def test_deleted_applications_are_not_listed(client_with_auth, user):
+    application_id = client_with_auth.post("/applications/", json={"name": "Listed App", "description": "l" * 200}).json()["id"]
+    assert client_with_auth.delete(f"/applications/{application_id}").status_code == 204
+    for path in ("/users/me/applications/", f"/users/{user.id}/applications/"):
+        response = client_with_auth.get(path)
+        assert response.status_code == 200
+        assert application_id not in [application["id"] for application in response.json()]
+
+
+def test_export_applications_of_current_user(client_with_auth, user):
+    application_id = client_with_auth.post("/applications/", json={"name": "Exported App", "description": "e" * 200}).json()["id"]
+    rating_data = {"grade": RatingGrade.grade_4.value, "user_id": user.id, "review": {"title": "title", "body": "body"}}
+    review_id = client_with_auth.post(f"/applications/{application_id}/rating", json=rating_data).json()["review"]["id"]
+    client_with_auth.post(f"/reviews/{review_id}/comments", json={"text": "exported comment", "user_id": user.id})
+
+    response = client_with_auth.get("/users/me/applications/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    application = next(record for record in records if record["type"] == "application" and record["id"] == application_id)
+    assert application["name"] == "Exported App"
+    review = next(record for record in records if record["type"] == "review" and record["id"] == review_id)
+    assert review["application_id"] == application_id
+    assert any(record["type"] == "rating" and record["review_id"] == review_id and record["grade"] == "4"
+               for record in records)
+    assert any(record["type"] == "comment" and record["review_id"] == review_id and record["text"] == "exported comment"
+               for record in records)
+
+
+def test_current_user_is_cached(client_with_auth, user):
+    hits = principal_cache.hits
+    client_with_auth.get("/users/me/")
+    client_with_auth.get("/users/me/")
+    assert principal_cache.hits == hits + 1
+
+
+def test_cached_principal_is_immutable_snapshot(client_with_auth, user):
+    principal_cache.clear()
+    client_with_auth.get("/users/me/")
+    principal = next(iter(principal_cache._entries.values()))[1]
+    assert isinstance(principal, Principal)
+    assert (principal.id, principal.account_type, principal.deleted) == (user.id, AccountType.tester, False)
+    with pytest.raises(ValidationError):
+        principal.deleted = True
+
+
+def test_deleted_user_is_rejected(client, session):
+    deleted = User(email="deleted@gmail.com", username="deleted_principal", password="x", deleted=True)
+    session.add(deleted)
+    session.commit()
+    token = create_access_token(dict(token_type=config.ACCESS_TOKEN_TYPE, user_id=deleted.id, scopes=["me"]))
+    response = client.get("/users/me/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_scopes_are_checked_for_every_token_of_cached_user(client, user):
+    issued_at = int(time.time())
+
+    def token(scopes):
+        return jwt.encode({"token_type": config.ACCESS_TOKEN_TYPE, "user_id": user.id, "scopes": scopes,
+                           "iat": issued_at, "exp": issued_at + 60}, config.SECRET_KEY, algorithm=config.JWT_ALGORITHM)
+
+    narrow = {"Authorization": f"Bearer {token(['me'])}"}
+    broad = {"Authorization": f"Bearer {token(['me', 'users'])}"}
+    for first, second in ((broad, narrow), (narrow, broad)):
+        principal_cache.clear()
+        client.get("/users/me/", headers=first)
+        assert client.get("/users/", headers=broad).status_code == 200
+        assert client.get("/users/", headers=narrow).status_code == 401
+
+
+def test_update_user_invalidates_cache(client_with_auth, user):
+    client_with_auth.get("/users/me/")
+    client_with_auth.patch("/users/me/", json={"description": "cached description"})
+    response = client_with_auth.get("/users/me/")
+    assert response.json()["description"] == "cached description"
+
+
 def test_update_user(client_with_auth, user):
     update_data = {"username": "updateduser"}
     response = client_with_auth.patch("/users/me/", json=update_data)
@@ -59,3 +147,5 @@ def test_delete_user(client_with_auth, user):
     response = client_with_auth.get(f"/users/{user.id}")
     # because of user was logged in
     assert response.status_code == 401
+
+
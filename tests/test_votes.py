@@ -0,0 +1,71 @@
+from src import config
+from src.comments.models import CommentVotes
+from src.reviews.models import Review, ReviewVotes
+
+
+def reset_votes(session, review, comment):
+    session.query(ReviewVotes).filter_by(review_id=review.id).delete()
+    session.query(CommentVotes).filter_by(comment_id=comment.id).delete()
+    review.votes_positive = review.votes_negative = comment.votes_positive = comment.votes_negative = 0
+    session.commit()
+
+
+def test_vote_batch(session, client_with_auth, review, comment, user):
+    reset_votes(session, review, comment)
+    session.add(ReviewVotes(review_id=review.id, user_id=user.id, vote_type=False))
+    review.votes_negative = 1
+    session.commit()
+    votes = [
+        {"target": "review", "target_id": review.id, "user_id": user.id, "vote_type": True},
+        {"target": "comment", "target_id": comment.id, "user_id": user.id, "vote_type": True},
+        {"target": "comment", "target_id": comment.id, "user_id": user.id, "vote_type": False},
+        {"target": "comment", "target_id": comment.id, "user_id": user.id, "vote_type": False},
+        {"target": "review", "target_id": 10 ** 6, "user_id": user.id, "vote_type": True},
+        {"target": "comment", "target_id": comment.id, "user_id": 10 ** 6, "vote_type": True},
+    ]
+    response = client_with_auth.post("/votes/batch", json={"votes": votes})
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()] == [
+        "updated", "created", "updated", "unchanged", "target_not_found", "user_not_found"
+    ]
+
+    session.refresh(review)
+    session.refresh(comment)
+    assert (review.votes_positive, review.votes_negative) == (1, 0)
+    assert (comment.votes_positive, comment.votes_negative) == (0, 1)
+    assert session.query(CommentVotes).filter_by(comment_id=comment.id).one().vote_type is False
+
+
+def test_unvote_batch(session, client_with_auth, review, comment, user):
+    reset_votes(session, review, comment)
+    votes = [
+        {"target": "review", "target_id": review.id, "user_id": user.id, "vote_type": True},
+        {"target": "review", "target_id": review.id, "user_id": user.id, "vote_type": True, "action": "unvote"},
+        {"target": "review", "target_id": review.id, "user_id": user.id, "vote_type": True, "action": "unvote"},
+    ]
+    response = client_with_auth.post("/votes/batch", json={"votes": votes})
+    assert [result["status"] for result in response.json()] == ["created", "deleted", "unchanged"]
+
+    session.refresh(review)
+    assert (review.votes_positive, review.votes_negative) == (0, 0)
+    assert session.query(ReviewVotes).filter_by(review_id=review.id).count() == 0
+
+
+def test_vote_batch_skips_deleted_reviews(session, client_with_auth, user):
+    review = Review(title="deleted", body="deleted", user_id=user.id, deleted=True)
+    session.add(review)
+    session.commit()
+    votes = [{"target": "review", "target_id": review.id, "user_id": user.id, "vote_type": True}]
+    response = client_with_auth.post("/votes/batch", json={"votes": votes})
+    assert [result["status"] for result in response.json()] == ["target_not_found"]
+    assert session.query(ReviewVotes).filter_by(review_id=review.id).count() == 0
+
+
+def test_vote_batch_is_limited_by_vote_batch_size(client_with_auth, review, user):
+    votes = [{"target": "review", "target_id": review.id, "user_id": user.id, "vote_type": True}]
+    assert config.VOTE_BATCH_SIZE == 1000
+    response = client_with_auth.post("/votes/batch", json={"votes": votes * config.VOTE_BATCH_SIZE})
+    assert response.status_code == 200
+    assert len(response.json()) == config.VOTE_BATCH_SIZE
+    response = client_with_auth.post("/votes/batch", json={"votes": votes * (config.VOTE_BATCH_SIZE + 1)})
+    assert response.status_code == 422